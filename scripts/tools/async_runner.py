@@ -0,0 +1,85 @@
+import asyncio
+import atexit
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """
+    在后台线程中常驻运行的事件循环
+
+    同步代码（包括多个线程同时调用）通过 submit/run 把协程提交到这个循环并等待结果，
+    浏览器等异步资源因此可以跨调用复用。进程退出时依次执行注册的关闭钩子，再停止循环。
+    """
+
+    def __init__(self, name: str = "background-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._shutdown_hooks: List[Callable[[], Awaitable]] = []
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    @property
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def add_shutdown_hook(self, hook: Callable[[], Awaitable]):
+        """注册退出时在循环内执行的异步清理函数（同一函数只注册一次）"""
+        if hook not in self._shutdown_hooks:
+            self._shutdown_hooks.append(hook)
+
+    def submit(self, coro: Awaitable) -> Future:
+        """提交协程，返回 concurrent.futures.Future"""
+        if self._stopped:
+            raise RuntimeError("后台事件循环已关闭")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None):
+        """提交协程并阻塞等待结果；不能在循环线程内调用，否则会死锁"""
+        if self.in_loop_thread:
+            raise RuntimeError("不能在后台事件循环线程内同步等待协程")
+        return self.submit(coro).result(timeout)
+
+    def shutdown(self, timeout: float = 30):
+        if self._stopped:
+            return
+        for hook in self._shutdown_hooks:
+            try:
+                asyncio.run_coroutine_threadsafe(hook(), self.loop).result(timeout)
+            except Exception as e:
+                logger.warning(f"执行关闭钩子 {getattr(hook, '__name__', hook)} 失败: {e}")
+        self._stopped = True
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        if not self.loop.is_running():
+            self.loop.close()
+
+
+_background_loop: Optional[BackgroundLoop] = None
+_background_lock = threading.Lock()
+
+
+def get_background_loop() -> BackgroundLoop:
+    """获取进程内共享的后台事件循环，首次调用时启动并注册退出清理"""
+    global _background_loop
+    with _background_lock:
+        if _background_loop is None or _background_loop._stopped:
+            _background_loop = BackgroundLoop()
+            atexit.register(_background_loop.shutdown)
+        return _background_loop
+
+
+def shutdown_background_loop():
+    """关闭共享后台事件循环（未启动时不做任何事）"""
+    with _background_lock:
+        loop = _background_loop
+    if loop is not None:
+        loop.shutdown()
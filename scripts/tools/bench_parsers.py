@@ -0,0 +1,135 @@
+import os
+import glob
+import time
+import argparse
+import statistics
+from typing import Callable, Dict, List
+
+from fixture_store import FixtureStore
+from get_em_listpage_url import parse_mapping, parse_mapping_bs4
+from get_em_calendar_image import extract_calendar_image
+
+#列表页解析器的测试夹具（tests/test_listpage_parsers.py 用同一批页面检查两个解析器的等价性）
+LISTPAGE_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    "..", "..", "tests", "fixtures", "listpages")
+
+
+def classify_fixture(meta: dict, body: bytes) -> str:
+    """按URL和内容判断夹具对应的解析器，无法识别时返回空字符串"""
+    url = meta.get("url", "")
+    if b"newsListContent" in body:
+        return "listpage"
+    if "finance.eastmoney.com/a/" in url:
+        return "calendar"
+    if "/search?" in url and "google." in url:
+        return "google"
+    return ""
+
+
+def load_listpage_fixtures(fixture_dir: str = LISTPAGE_FIXTURE_DIR) -> List[str]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.html"))):
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+def load_pages(store: FixtureStore) -> Dict[str, List[str]]:
+    """测试夹具中的列表页，加上录制夹具中按类型识别出的页面"""
+    pages: Dict[str, List[str]] = {"listpage": load_listpage_fixtures(), "calendar": [], "google": []}
+    for meta, body in store.iter_fixtures():
+        if meta.get("status") != 200:
+            continue
+        kind = classify_fixture(meta, body)
+        if kind:
+            pages[kind].append(body.decode("utf-8", errors="replace"))
+    return pages
+
+
+def time_parser(parse: Callable[[str], object], pages: List[str], repeat: int) -> dict:
+    """逐页计时，返回页数、总耗时、单页耗时中位数与吞吐量"""
+    durations = []
+    for _ in range(repeat):
+        for html in pages:
+            start = time.perf_counter()
+            parse(html)
+            durations.append(time.perf_counter() - start)
+    total = sum(durations)
+    return {
+        "pages": len(pages),
+        "runs": len(durations),
+        "total_s": total,
+        "median_ms": statistics.median(durations) * 1000 if durations else 0.0,
+        "pages_per_s": len(durations) / total if total else 0.0,
+    }
+
+
+def bench_google_results(pages: List[str], repeat: int, limit: int = 10) -> dict:
+    """在无网络的页面中 set_content 后执行 EXTRACT_RESULTS_JS，计时只包含提取脚本"""
+    from playwright.sync_api import sync_playwright
+    from web_search import EXTRACT_RESULTS_JS
+
+    durations = []
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True)
+        page = browser.new_page(java_script_enabled=True)
+        page.route("**/*", lambda route: route.abort())
+        try:
+            for _ in range(repeat):
+                for html in pages:
+                    page.set_content(html, wait_until="domcontentloaded")
+                    start = time.perf_counter()
+                    page.evaluate(EXTRACT_RESULTS_JS, limit)
+                    durations.append(time.perf_counter() - start)
+        finally:
+            browser.close()
+    total = sum(durations)
+    return {
+        "pages": len(pages),
+        "runs": len(durations),
+        "total_s": total,
+        "median_ms": statistics.median(durations) * 1000 if durations else 0.0,
+        "pages_per_s": len(durations) / total if total else 0.0,
+    }
+
+
+def print_report(results: Dict[str, dict]):
+    print(f"{'解析器':<24}{'页数':>6}{'次数':>8}{'总耗时(s)':>12}{'中位数(ms)':>12}{'页/秒':>10}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['pages']:>6}{r['runs']:>8}{r['total_s']:>12.3f}"
+              f"{r['median_ms']:>12.3f}{r['pages_per_s']:>10.1f}")
+
+
+def run_benchmarks(fixture_dir: str = None, repeat: int = 5, with_browser: bool = True) -> Dict[str, dict]:
+    """
+    用录制好的夹具离线测量各解析器的耗时
+
+    列表页使用 tests/fixtures/listpages 中的测试夹具；其余页面需先以 FIXTURE_MODE=record
+    运行一次爬虫录制，再运行本脚本。
+
+    Args:
+        fixture_dir: 夹具目录，默认取环境变量 FIXTURE_DIR 或 cache/fixtures
+        repeat: 每页重复解析的次数
+        with_browser: 是否测量需要浏览器的 Google 结果提取脚本
+    """
+    pages = load_pages(FixtureStore(fixture_dir))
+    results = {}
+    if pages["listpage"]:
+        results["parse_mapping"] = time_parser(parse_mapping, pages["listpage"], repeat)
+        results["parse_mapping_bs4"] = time_parser(parse_mapping_bs4, pages["listpage"], repeat)
+    if pages["calendar"]:
+        results["extract_calendar_image"] = time_parser(extract_calendar_image, pages["calendar"], repeat)
+    if with_browser and pages["google"]:
+        results["EXTRACT_RESULTS_JS"] = bench_google_results(pages["google"], repeat)
+    if not results:
+        print("没有找到可用的夹具，请先以 FIXTURE_MODE=record 运行爬虫录制页面")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="基于录制夹具的解析器基准测试")
+    parser.add_argument("--fixture-dir", default=None, help="夹具目录")
+    parser.add_argument("--repeat", type=int, default=5, help="每页重复解析次数")
+    parser.add_argument("--no-browser", action="store_true", help="跳过需要浏览器的 Google 结果提取")
+    args = parser.parse_args()
+    print_report(run_benchmarks(args.fixture_dir, args.repeat, not args.no_browser))
@@ -0,0 +1,304 @@
+import os
+import re
+import json
+import hashlib
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+import requests
+from lxml import etree, html as lxml_html
+
+from scripts.logging_config import setup_logger
+from rate_limiter import acquire, get_limiter, set_rate_limit
+
+logger = setup_logger("breakfast_extractor")
+
+article_cache_path = os.path.join("cache", "news", "eastmoney_breakfast", "articles.db")
+
+#解析规则变化时递增，缓存中旧版本的结果会被重新解析
+PARSER_VERSION = 1
+
+SECTION_MARKET = "market"
+SECTION_CALENDAR = "calendar"
+SECTION_NEWS = "news"
+
+MARKET_KEYWORDS = ("市场", "行情", "收盘", "指数", "外盘", "美股", "港股", "A股", "商品", "汇率", "期货", "债市", "数据")
+CALENDAR_KEYWORDS = ("日历", "前瞻", "提示", "本周", "事件", "公布")
+
+BRACKET_HEADING = re.compile(r"^【([^】]{1,20})】$")
+ITEM_NUMBER = re.compile(r"^\s*(?:\d{1,2}|[一二三四五六七八九十]{1,3})\s*[、.．]\s*")
+ITEM_LABEL = re.compile(r"^【([^】]{1,20})】\s*(.+)$", re.S)
+PUBLISH_TIME = re.compile(r"(\d{4})年(\d{2})月(\d{2})日\s*(\d{2}):(\d{2})")
+WHITESPACE = re.compile(r"\s+")
+
+
+CONTENT_BODY = etree.XPath("//div[@id='ContentBody']")
+
+
+def content_hash(html: str) -> str:
+    """
+    正文 div#ContentBody 序列化后的 SHA-256
+
+    页面其它部分（广告、阅读数、相关文章）每次请求都会变化，只对正文取哈希；
+    找不到正文时对整页取哈希。
+    """
+    try:
+        body = CONTENT_BODY(lxml_html.fromstring(html))
+    except (etree.ParserError, ValueError):
+        body = []
+    content = etree.tostring(body[0], encoding="unicode", method="html") if body else html
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def classify_section(heading: str) -> str:
+    if any(k in heading for k in CALENDAR_KEYWORDS):
+        return SECTION_CALENDAR
+    if any(k in heading for k in MARKET_KEYWORDS):
+        return SECTION_MARKET
+    return SECTION_NEWS
+
+
+def _block_text(block) -> str:
+    return WHITESPACE.sub(" ", block.text_content()).strip()
+
+
+def _is_heading(block, text: str) -> bool:
+    if block.tag in ("h2", "h3", "h4"):
+        return True
+    if BRACKET_HEADING.match(text):
+        return True
+    if len(text) <= 20:
+        bold = " ".join(_block_text(b) for b in block.iter("strong", "b"))
+        return bold.strip() == text
+    return False
+
+
+def parse_breakfast_article(html: str, url: str = "") -> dict:
+    """
+    把财经早餐文章解析为结构化内容
+
+    正文 div#ContentBody 中，整段加粗的短段落、【】括起的段落或 h2-h4 视为小节标题，
+    其后的段落为该小节的条目；小节按标题关键词归为 news / market / calendar。
+
+    Args:
+        html: 文章页面HTML
+        url: 文章链接
+
+    Returns:
+        {"url", "title", "publish_time", "calendar_image", "sections": [{"heading", "category", "items"}]}
+    """
+    tree = lxml_html.fromstring(html)
+    title = " ".join(t.strip() for t in tree.xpath("//h1//text()") if t.strip())
+    time_match = PUBLISH_TIME.search(" ".join(tree.xpath("//div[contains(@class,'infos')]//text()")) or html)
+    publish_time = None
+    if time_match:
+        year, month, day, hour, minute = time_match.groups()
+        publish_time = f"{year}-{month}-{day} {hour}:{minute}:00"
+
+    content = CONTENT_BODY(tree)
+    sections: List[dict] = []
+    calendar_image = None
+    if content:
+        body = content[0]
+        images = body.xpath(".//center//img/@src | .//img[contains(@src,'np-newspic.dfcfw.com')]/@src")
+        calendar_image = images[0] if images else None
+
+        current = {"heading": "", "category": SECTION_NEWS, "items": []}
+        for block in body.iter("p", "h2", "h3", "h4"):
+            text = _block_text(block)
+            if not text:
+                continue
+            if _is_heading(block, text):
+                if current["items"] or current["heading"]:
+                    sections.append(current)
+                heading = BRACKET_HEADING.sub(r"\1", text)
+                current = {"heading": heading, "category": classify_section(heading), "items": []}
+                continue
+            text = ITEM_NUMBER.sub("", text)
+            label_match = ITEM_LABEL.match(text)
+            if label_match:
+                current["items"].append({"label": label_match.group(1), "text": label_match.group(2).strip()})
+            else:
+                current["items"].append({"label": None, "text": text})
+        if current["items"] or current["heading"]:
+            sections.append(current)
+
+    if calendar_image:
+        calendar_sections = [s for s in sections if s["category"] == SECTION_CALENDAR]
+        if not calendar_sections:
+            sections.append({"heading": "财经日历", "category": SECTION_CALENDAR, "items": []})
+
+    return {
+        "url": url,
+        "title": title,
+        "publish_time": publish_time,
+        "calendar_image": calendar_image,
+        "sections": sections,
+    }
+
+
+def _parse_worker(args):
+    url, html = args
+    try:
+        return url, parse_breakfast_article(html, url), None
+    except (etree.ParserError, ValueError) as e:
+        return url, None, str(e)
+
+
+class ArticleCache:
+    """
+    已解析文章的缓存（SQLite），按 URL 保存内容哈希、解析器版本和解析结果
+
+    Args:
+        db_path: 数据库路径
+    """
+
+    def __init__(self, db_path: str = article_cache_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                content_hash TEXT NOT NULL,
+                parser_version INTEGER NOT NULL,
+                parsed TEXT NOT NULL,
+                parsed_at TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def get(self, url: str) -> Optional[dict]:
+        """返回当前解析器版本的缓存结果，包含 content_hash 字段"""
+        row = self.conn.execute(
+            "SELECT content_hash, parsed FROM articles WHERE url = ? AND parser_version = ?",
+            (url, PARSER_VERSION)).fetchone()
+        if row is None:
+            return None
+        parsed = json.loads(row[1])
+        parsed["content_hash"] = row[0]
+        return parsed
+
+    def put(self, url: str, digest: str, parsed: dict):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO articles(url, content_hash, parser_version, parsed, parsed_at) VALUES (?, ?, ?, ?, ?)",
+            (url, digest, PARSER_VERSION, json.dumps(parsed, ensure_ascii=False), datetime.now().isoformat()))
+        self.conn.commit()
+
+
+def _fetch_and_hash(url: str, session: requests.Session):
+    """下载线程中同时计算正文哈希，返回 (HTML, 哈希)，失败时为 (None, None)"""
+    html = fetch_article_html(url, session)
+    return (html, content_hash(html)) if html is not None else (None, None)
+
+
+def fetch_article_html(url: str, session: requests.Session, timeout: int = 15) -> Optional[str]:
+    acquire(urlparse(url).hostname or "")
+    try:
+        response = session.get(url, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"请求 {url} 失败: {e}")
+        return None
+    if response.status_code != 200:
+        logger.warning(f"请求 {url} 失败，状态码 {response.status_code}")
+        return None
+    response.encoding = "utf-8"
+    return response.text
+
+
+def extract_articles(urls: Iterable[str], workers: int = 4, refresh: bool = False,
+                     rate_per_host: Optional[float] = 2.0, cache: Optional[ArticleCache] = None) -> Dict[str, dict]:
+    """
+    批量抽取财经早餐文章
+
+    已缓存的文章直接返回；其余文章用线程池并发下载，再交给进程池解析。
+    refresh 为 True 时重新下载，正文哈希未变的文章不重复解析。
+
+    Args:
+        urls: 文章链接
+        workers: 下载线程数与解析进程数
+        refresh: 是否重新下载已缓存的文章
+        rate_per_host: 每个主机每秒请求数，该主机已设置限速时不覆盖
+        cache: 解析结果缓存
+
+    Returns:
+        {url: 解析结果}，下载或解析失败的文章不包含在内
+    """
+    from get_em_calendar_image import get_batch_session
+
+    own_cache = cache is None
+    cache = cache or ArticleCache()
+    results: Dict[str, dict] = {}
+    try:
+        urls = [u for u in dict.fromkeys(urls) if u]
+        pending = []
+        for url in urls:
+            cached = cache.get(url)
+            if cached is not None and not refresh:
+                results[url] = cached
+            else:
+                pending.append(url)
+        logger.info(f"共 {len(urls)} 篇文章，缓存命中 {len(results)} 篇，待抽取 {len(pending)} 篇")
+        if not pending:
+            return results
+
+        for host in {urlparse(u).hostname or "" for u in pending}:
+            if rate_per_host and get_limiter(host) is None:
+                set_rate_limit(host, rate_per_host)
+
+        session = get_batch_session(pool_size=workers)
+        parsed_count = 0
+        with ThreadPoolExecutor(max_workers=workers) as fetchers, ProcessPoolExecutor(max_workers=workers) as parsers:
+            fetch_futures = {fetchers.submit(_fetch_and_hash, url, session): url for url in pending}
+            parse_futures = {}
+            for future in as_completed(fetch_futures):
+                url = fetch_futures[future]
+                html, digest = future.result()
+                if html is None:
+                    continue
+                cached = cache.get(url)
+                if cached is not None and cached["content_hash"] == digest:
+                    results[url] = cached
+                    continue
+                parse_futures[parsers.submit(_parse_worker, (url, html))] = digest
+
+            for future in as_completed(parse_futures):
+                url, parsed, error = future.result()
+                if parsed is None:
+                    logger.warning(f"解析 {url} 失败: {error}")
+                    continue
+                cache.put(url, parse_futures[future], parsed)
+                parsed["content_hash"] = parse_futures[future]
+                results[url] = parsed
+                parsed_count += 1
+        logger.info(f"新解析 {parsed_count} 篇文章")
+        return results
+    finally:
+        if own_cache:
+            cache.close()
+
+
+def extract_breakfast_archive(workers: int = 4, refresh: bool = False) -> Dict[str, dict]:
+    """
+    抽取财经早餐索引中全部日期的文章
+
+    Returns:
+        {"YYYY-MM-DD": 解析结果}
+    """
+    from eastmoney_breakfast import BreakfastIndex
+
+    index = BreakfastIndex()
+    date_urls = {d: e["page_url"] for d, e in sorted(index.entries.items()) if e.get("page_url")}
+    articles = extract_articles(date_urls.values(), workers=workers, refresh=refresh)
+    return {d: articles[url] for d, url in date_urls.items() if url in articles}
+
+
+if __name__ == "__main__":
+    start = datetime.now()
+    archive = extract_breakfast_archive()
+    print(f"共抽取 {len(archive)} 天的财经早餐，耗时 {datetime.now() - start}")
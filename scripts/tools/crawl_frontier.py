@@ -0,0 +1,223 @@
+import os
+import json
+import argparse
+from datetime import date, datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from scripts.logging_config import setup_logger
+from rate_limiter import get_limiter, set_rate_limit
+from job_queue import JobQueue, DONE, FAILED
+
+logger = setup_logger("crawl_frontier")
+
+frontier_db_path = os.path.join("cache", "news", "eastmoney_breakfast", "frontier.db")
+
+LISTPAGE = "listpage"
+ARTICLE = "article"
+
+
+class CrawlFrontier(JobQueue):
+    """
+    持久化的财经早餐抓取队列（SQLite）
+
+    每个任务为一个URL，分为列表页（listpage）和文章页（article）两类，记录状态、尝试次数、
+    最近抓取时间与结果（JSON）。重复加入同一URL不会产生新任务，重启后已完成的任务会被跳过。
+
+    列表页内容随新文章发布而后移，任务的 key 记录其所属的截止日期；以更晚的截止日期
+    重新加入时，已完成的列表页会被重新置为pending。文章页的 key 为日期，内容固定，只抓取一次。
+    """
+
+    TABLE = "frontier_jobs"
+    KEY_COLUMNS = ("url",)
+    EXTRA_COLUMNS = ("kind TEXT NOT NULL", "key TEXT", "last_fetched_at TEXT", "result TEXT")
+    INDEXES = (("idx_frontier_kind_state", "kind, state, key"),)
+
+    def __init__(self, db_path: str = frontier_db_path):
+        super().__init__(db_path)
+
+    def enqueue(self, kind: str, jobs: Iterable[Tuple[str, str]], refresh_older: bool = False) -> int:
+        """
+        批量加入(url, key)任务，返回新增或重新置为pending的任务数
+
+        Args:
+            kind: 任务类型，listpage 或 article
+            jobs: (url, key) 列表
+            refresh_older: 已存在的任务 key 更小时重置为pending（用于列表页）
+        """
+        now = datetime.now().isoformat()
+        before = self.conn.total_changes
+        if refresh_older:
+            self.conn.executemany(
+                "INSERT INTO frontier_jobs(url, kind, key, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET key=excluded.key, state='pending', attempts=0, "
+                "updated_at=excluded.updated_at WHERE frontier_jobs.key < excluded.key",
+                ((url, kind, key, now) for url, key in jobs))
+        else:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO frontier_jobs(url, kind, key, updated_at) VALUES (?, ?, ?, ?)",
+                ((url, kind, key, now) for url, key in jobs))
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def claim(self, kind: str, limit: int = 1) -> List[tuple]:
+        """领取指定类型的待执行任务并标记为running，文章页按日期从新到旧，返回 (url, key)"""
+        order = "key DESC" if kind == ARTICLE else "rowid"
+        return self._claim(limit, order=order, where="kind=?", params=(kind,), columns=("key",))
+
+    def mark_done(self, url: str, result):
+        self._finish((url,), DONE, result=json.dumps(result, ensure_ascii=False), error=None,
+                     last_fetched_at=datetime.now().isoformat())
+
+    def mark_failed(self, url: str, error: str):
+        self._finish((url,), FAILED, error=error, last_fetched_at=datetime.now().isoformat())
+
+    def results(self, kind: str) -> Dict[str, tuple]:
+        """已完成任务的 {url: (key, 结果)}"""
+        rows = self.conn.execute(
+            "SELECT url, key, result FROM frontier_jobs WHERE kind=? AND state=?", (kind, DONE)).fetchall()
+        return {url: (key, json.loads(result)) for url, key, result in rows}
+
+    def stats(self) -> dict:
+        """按任务类型分组的各状态任务数"""
+        rows = self.conn.execute(
+            "SELECT kind, state, COUNT(*) FROM frontier_jobs GROUP BY kind, state").fetchall()
+        stats: Dict[str, dict] = {}
+        for kind, state, count in rows:
+            stats.setdefault(kind, {})[state] = count
+        return stats
+
+
+def _crawl_listpages(frontier: CrawlFrontier, concurrency: int):
+    from eastmoney_breakfast import parse_cn_date
+    from get_em_listpage_url import get_em_listpages
+
+    while True:
+        jobs = frontier.claim(LISTPAGE, concurrency)
+        if not jobs:
+            break
+        try:
+            pages = get_em_listpages([url for url, _ in jobs], concurrency=concurrency)
+        except Exception as e:
+            logger.error(f"爬取列表页失败: {e}")
+            pages = {}
+        for url, _ in jobs:
+            mapping = pages.get(url)
+            if not mapping:
+                frontier.mark_failed(url, "未解析到财经早餐")
+                logger.warning(f"列表页 {url} 未解析到财经早餐")
+                continue
+            frontier.mark_done(url, mapping)
+            added = frontier.enqueue(ARTICLE, ((href, parse_cn_date(d).isoformat()) for d, href in mapping.items()))
+            logger.info(f"完成列表页 {url}，新增文章页 {added} 个")
+
+
+def _fetch_calendar(url: str, session) -> dict:
+    """页面取不到时抛出异常（记为失败）；页面中没有日历图片时结果为 {"calendar_url": None}（记为完成）"""
+    from get_em_calendar_image import fetch_calendar_image
+
+    return {"calendar_url": fetch_calendar_image(url, session, raise_on_failure=True)}
+
+
+def _crawl_articles(frontier: CrawlFrontier, concurrency: int, rate_per_host: Optional[float]):
+    from get_em_calendar_image import get_batch_session
+
+    session = get_batch_session(pool_size=concurrency)
+    running = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            # 补足并发槽位，日期新的文章优先
+            free = concurrency - len(running)
+            if free > 0:
+                for url, day in frontier.claim(ARTICLE, free):
+                    host = urlparse(url).hostname or ""
+                    if rate_per_host and get_limiter(host) is None:
+                        set_rate_limit(host, rate_per_host)
+                    running[executor.submit(_fetch_calendar, url, session)] = (url, day)
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                url, day = running.pop(future)
+                try:
+                    frontier.mark_done(url, future.result())
+                except Exception as e:
+                    frontier.mark_failed(url, str(e))
+                    logger.error(f"抓取 {day} 的文章页 {url} 失败: {e}")
+
+
+def sync_breakfast_index(frontier: CrawlFrontier):
+    """把已完成的列表页和文章页结果写入 BreakfastIndex"""
+    from eastmoney_breakfast import BreakfastIndex
+
+    index = BreakfastIndex()
+    added = 0
+    for _, mapping in frontier.results(LISTPAGE).values():
+        added += index.merge(mapping)
+    for day, result in frontier.results(ARTICLE).values():
+        if result.get("calendar_url"):
+            index.set_calendar_url(date.fromisoformat(day), result["calendar_url"])
+    index.save()
+    logger.info(f"财经早餐索引新增 {added} 天，共 {len(index.entries)} 天")
+
+
+def crawl_breakfast_archive(end_date=None, concurrency: int = 4, max_attempts: int = 3,
+                            with_articles: bool = True, rate_per_host: Optional[float] = 2.0,
+                            db_path: str = frontier_db_path) -> dict:
+    """
+    抓取截至 end_date 的全部财经早餐列表页与文章页，进度保存在 frontier.db，可随时中断后续跑
+
+    Args:
+        end_date: 截止日期，None表示最近的交易日
+        concurrency: 同时抓取的页面数
+        max_attempts: 单个任务最大尝试次数
+        with_articles: 是否抓取文章页中的日历图片链接
+        rate_per_host: 文章页每个主机每秒请求数，该主机已设置限速时不覆盖
+        db_path: 抓取队列数据库路径
+
+    Returns:
+        各类型、各状态的任务数量统计
+    """
+    from eastmoney_breakfast import EM_START_DATE, em_list_page_url, get_adjusted_workday
+    from trading_calendar import get_trading_calendar
+
+    end_date = get_adjusted_workday(end_date)
+    total_pages = (get_trading_calendar().count_sessions(EM_START_DATE, end_date) + 19) // 20
+
+    frontier = CrawlFrontier(db_path)
+    try:
+        added = frontier.enqueue(
+            LISTPAGE, ((em_list_page_url(i), end_date.isoformat()) for i in range(1, total_pages + 1)),
+            refresh_older=True)
+        resumed = frontier.reset_interrupted()
+        retried = frontier.retry_failed(max_attempts)
+        logger.info(f"新增或刷新列表页 {added} 个，恢复中断任务 {resumed} 个，重试失败任务 {retried} 个")
+
+        _crawl_listpages(frontier, concurrency)
+        if with_articles:
+            _crawl_articles(frontier, concurrency, rate_per_host)
+        sync_breakfast_index(frontier)
+
+        stats = frontier.stats()
+        logger.info(f"抓取结束: {stats}")
+        return stats
+    finally:
+        frontier.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="财经早餐全量抓取（可断点续跑）")
+    parser.add_argument("--end", default=None, help="截止日期 YYYY-MM-DD")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--no-articles", action="store_true", help="只抓取列表页")
+    args = parser.parse_args()
+
+    crawl_breakfast_archive(
+        end_date=date.fromisoformat(args.end) if args.end else None,
+        concurrency=args.concurrency,
+        max_attempts=args.max_attempts,
+        with_articles=not args.no_articles,
+    )
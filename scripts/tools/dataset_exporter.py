@@ -0,0 +1,192 @@
+import os
+import csv
+import glob
+import json
+import argparse
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from scripts.logging_config import setup_logger
+from news_crawler import iter_news_files, news_article_id
+from shard_writer import ShardWriter, SHARD_FORMATS
+
+logger = setup_logger("dataset_exporter")
+
+price_cache_dir = os.path.join("cache", "stock_price_data")
+dataset_dir = os.path.join("cache", "datasets")
+
+SPLITS = ("train", "val", "test")
+
+
+def assign_split(date_str: str, val_start: str, test_start: str) -> str:
+    """按时间切分：val_start之前为train，[val_start, test_start)为val，之后为test"""
+    if date_str < val_start:
+        return "train"
+    if date_str < test_start:
+        return "val"
+    return "test"
+
+
+def iter_price_files() -> Iterator[Tuple[str, str]]:
+    """每只股票只取最新的一份价格分析文件，避免不同日期导出的文件重复"""
+    if not os.path.isdir(price_cache_dir):
+        return
+    for symbol in sorted(os.listdir(price_cache_dir)):
+        files = sorted(glob.glob(os.path.join(price_cache_dir, symbol, "*.csv")))
+        if files:
+            yield symbol, files[-1]
+
+
+def _to_float(value: str) -> Optional[float]:
+    try:
+        return float(value) if value != "" else None
+    except ValueError:
+        return None
+
+
+def iter_news_records(path: str, ticker: str) -> Iterator[Tuple[str, dict]]:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    cache_date = data.get("date", "")
+    for item in data.get("news", []):
+        publish_time = item.get("publish_time") or ""
+        yield (publish_time[:10] or cache_date), {
+            "article_id": news_article_id(item),
+            "ticker": ticker,
+            "cache_date": cache_date,
+            "publish_time": publish_time,
+            "title": item.get("title", ""),
+            "content": item.get("content", ""),
+            "source": item.get("source", ""),
+            "url": item.get("url", ""),
+        }
+
+
+def iter_price_records(path: str, ticker: str) -> Iterator[Tuple[str, dict]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, escapechar="\\"):
+            record = {"ticker": ticker, "date": row.pop("date", "")}
+            row.pop("stock_id", None)
+            for key, value in row.items():
+                record[key] = _to_float(value)
+            yield record["date"], record
+
+
+def _export_worker(worker_id: int, units: List[Tuple[str, str, str]], output_dir: str, fmt: str,
+                   max_records: Optional[int], max_bytes: Optional[int],
+                   val_start: str, test_start: str) -> List[dict]:
+    """单个进程按顺序处理分配到的文件，每个(kind, split)各自写一组分片"""
+    writers = {}
+    try:
+        for kind, ticker, path in units:
+            reader = iter_news_records if kind == "news" else iter_price_records
+            try:
+                for date_str, record in reader(path, ticker):
+                    split = assign_split(date_str, val_start, test_start)
+                    writer = writers.get((kind, split))
+                    if writer is None:
+                        writer = ShardWriter(output_dir, prefix=f"{kind}-{split}-w{worker_id:02d}",
+                                             max_records=max_records, max_bytes=max_bytes, fmt=fmt)
+                        writers[(kind, split)] = writer
+                    writer.write(record)
+            except Exception as e:
+                logger.error(f"导出 {path} 失败: {e}")
+    finally:
+        shards = []
+        for (kind, split), writer in writers.items():
+            for shard in writer.close():
+                shards.append(dict(shard, kind=kind, split=split))
+    return shards
+
+
+def export_dataset(name: str, val_start: str, test_start: str, fmt: str = "jsonl.zst",
+                   max_records: Optional[int] = None, max_mb: Optional[float] = 64,
+                   workers: int = 1, tickers: Optional[List[str]] = None,
+                   include_prices: bool = True) -> dict:
+    """
+    将新闻缓存和价格缓存导出为分片训练集，并生成manifest
+
+    Args:
+        name: 数据集名称，输出到 cache/datasets/{name}
+        val_start: 验证集起始日期 "YYYY-MM-DD"
+        test_start: 测试集起始日期 "YYYY-MM-DD"
+        fmt: 分片格式，"jsonl"、"jsonl.zst" 或 "parquet"
+        max_records: 每个分片的最大记录数
+        max_mb: 每个分片的最大MB数
+        workers: 并行写分片的进程数
+        tickers: 股票代码列表，None表示全部
+        include_prices: 是否导出价格数据
+
+    Returns:
+        manifest字典
+    """
+    if fmt not in SHARD_FORMATS:
+        raise ValueError(f"不支持的分片格式: {fmt}，可选 {SHARD_FORMATS}")
+    if not val_start <= test_start:
+        raise ValueError("val_start 不能晚于 test_start")
+
+    output_dir = os.path.join(dataset_dir, name)
+    os.makedirs(output_dir, exist_ok=True)
+    # 清理同名数据集上一次导出的分片
+    for old in glob.glob(os.path.join(output_dir, "*-w[0-9][0-9]-*")):
+        os.remove(old)
+
+    units = [("news", ticker, path) for ticker, path in iter_news_files(tickers)]
+    if include_prices:
+        units += [("price", symbol, path) for symbol, path in iter_price_files()
+                  if not tickers or symbol in tickers]
+    logger.info(f"待导出文件 {len(units)} 个，使用 {workers} 个进程")
+
+    max_bytes = int(max_mb * 1024 * 1024) if max_mb else None
+    workers = max(1, min(workers, len(units) or 1))
+    # 按固定顺序轮流分配文件，保证相同输入得到相同分片
+    assignments = [units[i::workers] for i in range(workers)]
+    args = (output_dir, fmt, max_records, max_bytes, val_start, test_start)
+
+    shards = []
+    if workers == 1:
+        shards = _export_worker(0, assignments[0], *args)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_export_worker, i, part, *args)
+                       for i, part in enumerate(assignments)]
+            for future in futures:
+                shards.extend(future.result())
+    shards.sort(key=lambda s: s["file"])
+
+    totals = {}
+    for shard in shards:
+        key = f"{shard['kind']}/{shard['split']}"
+        totals[key] = totals.get(key, 0) + shard["count"]
+
+    manifest = {
+        "name": name,
+        "created_at": datetime.now().isoformat(),
+        "format": fmt,
+        "splits": {"train": f"< {val_start}", "val": f"[{val_start}, {test_start})", "test": f">= {test_start}"},
+        "totals": totals,
+        "shards": shards,
+    }
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    logger.info(f"导出完成：{len(shards)} 个分片，{totals}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="导出新闻与价格训练集")
+    parser.add_argument("--name", required=True)
+    parser.add_argument("--val-start", required=True, help="验证集起始日期 YYYY-MM-DD")
+    parser.add_argument("--test-start", required=True, help="测试集起始日期 YYYY-MM-DD")
+    parser.add_argument("--format", default="jsonl.zst", choices=SHARD_FORMATS)
+    parser.add_argument("--max-records", type=int, default=None)
+    parser.add_argument("--max-mb", type=float, default=64)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    export_dataset(args.name, args.val_start, args.test_start, fmt=args.format,
+                   max_records=args.max_records, max_mb=args.max_mb, workers=args.workers)
@@ -1,19 +1,12 @@
 import os
 import json
 from os.path import exists
-import pandas as pd
-import time
-import random as rd
-from urllib.parse import urlparse
 from datetime import date,datetime, timedelta
+from typing import Dict, Optional
 from scripts.logging_config import setup_logger
-import requests
-from bs4 import BeautifulSoup
-import re
-import sys
-import subprocess
-from get_em_listpage_url import get_em_listpage_url
-from get_em_calendar_image import get_finance_calendar_image
+from get_em_listpage_url import get_em_listpages
+from get_em_calendar_image import get_finance_calendar_image, extract_calendar_images
+from trading_calendar import get_trading_calendar
 
 logger=setup_logger("eastmoney_breakfast")
 
@@ -21,6 +14,11 @@ em_dir=os.path.join("cache","news","eastmoney_breakfast")
 em_urls_path = os.path.join(em_dir, "urls_of_em.json")
 em_breakfast_path=os.path.join(em_dir, "breakfast.json")
 em_calendar_pic_path=os.path.join(em_dir, "calendar_pic_url.json")
+em_index_path=os.path.join(em_dir, "breakfast_index.json")
+
+#财经早餐列表页，第一页为最新
+EM_LIST_FIRST_PAGE = "https://stock.eastmoney.com/a/czpnc.html"
+EM_START_DATE = date(year=2022, month=11, day=2)
 
 # 确保目录存在
 os.makedirs(em_dir, exist_ok=True)
@@ -28,107 +26,14 @@ os.makedirs(em_dir, exist_ok=True)
 
 def is_a_stock_trading_day(check_date):
     """
-    判断2022年11月-2025年期间A股是否为交易日
+    判断A股是否为交易日（节假日数据见 data/a_share_holidays.json）
     :param check_date: 待判断日期（date或datetime对象）
-    :return: True为交易日，False为休市；超出范围返回None
+    :return: True为交易日，False为休市；超出节假日数据范围返回None
     """
-    if isinstance(check_date, datetime):
-        check_date = check_date.date()
-
-    start_date = date(2022, 11, 1)
-    end_date = date(2025, 12, 31)
-    if not (start_date <= check_date <= end_date):
+    calendar = get_trading_calendar()
+    if not calendar.covers(check_date):
         return None
-
-    weekday = check_date.weekday()  # 0=周一，5=周六，6=周日
-    if weekday in (5, 6):
-        return False
-
-    # 2. 各年份休市日期（整理自上交所/深交所公告）
-    # 2022年11-12月休市日期
-    closed_2022 = [
-        date(2022, 12, 31),  # 周六（周末休市）
-        # 注：2022年11-12月无额外法定节假日休市，仅周末休市
-    ]
-
-    # 2023年休市日期
-    closed_2023 = [
-        # 元旦：2023-01-01（周日）休市，1月2日补休休市
-        date(2023, 1, 1), date(2023, 1, 2),
-        # 春节：1月21日（除夕）-1月27日休市
-        date(2023, 1, 21), date(2023, 1, 22), date(2023, 1, 23),
-        date(2023, 1, 24), date(2023, 1, 25), date(2023, 1, 26), date(2023, 1, 27),
-        # 清明节：4月5日（周三）休市
-        date(2023, 4, 5),
-        # 劳动节：4月29日-5月3日休市
-        date(2023, 4, 29), date(2023, 4, 30), date(2023, 5, 1),
-        date(2023, 5, 2), date(2023, 5, 3),
-        # 端午节：6月22日-6月24日休市
-        date(2023, 6, 22), date(2023, 6, 23), date(2023, 6, 24),
-        # 中秋节+国庆节：9月29日-10月6日休市
-        date(2023, 9, 29), date(2023, 9, 30), date(2023, 10, 1),
-        date(2023, 10, 2), date(2023, 10, 3), date(2023, 10, 4),
-        date(2023, 10, 5), date(2023, 10, 6)
-    ]
-
-    # 2024年休市日期
-    closed_2024 = [
-        # 元旦：1月1日（周一）休市
-        date(2024, 1, 1),
-        # 春节：2月10日（除夕）-2月17日休市
-        date(2024, 2, 10), date(2024, 2, 11), date(2024, 2, 12),
-        date(2024, 2, 13), date(2024, 2, 14), date(2024, 2, 15),
-        date(2024, 2, 16), date(2024, 2, 17),
-        # 清明节：4月4日（周四）休市
-        date(2024, 4, 4),
-        # 劳动节：5月1日-5月5日休市
-        date(2024, 5, 1), date(2024, 5, 2), date(2024, 5, 3),
-        date(2024, 5, 4), date(2024, 5, 5),
-        # 端午节：6月10日（周一）休市
-        date(2024, 6, 10),
-        # 中秋节：9月17日（周二）休市
-        date(2024, 9, 17),
-        # 国庆节：10月1日-10月7日休市
-        date(2024, 10, 1), date(2024, 10, 2), date(2024, 10, 3),
-        date(2024, 10, 4), date(2024, 10, 5), date(2024, 10, 6), date(2024, 10, 7)
-    ]
-
-    # 2025年预估休市日期（以当年交易所公告为准）
-    closed_2025 = [
-        # 元旦：1月1日（周三）休市
-        date(2025, 1, 1),
-        # 春节：1月28日（除夕）-2月3日休市
-        date(2025, 1, 28), date(2025, 1, 29), date(2025, 1, 30),
-        date(2025, 1, 31), date(2025, 2, 1), date(2025, 2, 2), date(2025, 2, 3),
-        # 清明节：4月4日（周五）休市
-        date(2025, 4, 4),
-        # 劳动节：5月1日-5月5日休市
-        date(2025, 5, 1), date(2025, 5, 2), date(2025, 5, 3),
-        date(2025, 5, 4), date(2025, 5, 5),
-        # 端午节：6月1日（周日）+6月2日（周一）休市
-        date(2025, 6, 1), date(2025, 6, 2),
-        # 中秋节：9月8日（周二）休市
-        date(2025, 9, 8),
-        # 国庆节：10月1日-10月7日休市
-        date(2025, 10, 1), date(2025, 10, 2), date(2025, 10, 3),
-        date(2025, 10, 4), date(2025, 10, 5), date(2025, 10, 6), date(2025, 10, 7)
-    ]
-
-    # 3. 根据年份匹配休市列表
-    year = check_date.year
-    if year == 2022:
-        closed_days = closed_2022
-    elif year == 2023:
-        closed_days = closed_2023
-    elif year == 2024:
-        closed_days = closed_2024
-    elif year == 2025:
-        closed_days = closed_2025
-    else:
-        return None  # 超出范围
-
-    # 4. 最终判断：不在休市列表中则为交易日
-    return check_date not in closed_days
+    return calendar.is_session(check_date)
 
 def get_adjusted_workday(date_input = None) -> date:
     """
@@ -149,21 +54,14 @@ def get_adjusted_workday(date_input = None) -> date:
         else:
             base_date = input_date
 
-    if is_a_stock_trading_day(base_date):
-        return base_date
-    else:
-        current_date = base_date - timedelta(days=1)
-        while not is_a_stock_trading_day(current_date):
-            current_date -= timedelta(days=1)
-        return current_date
+    return get_trading_calendar().prev_session(base_date, inclusive=True)
 
 #返回东方财富财经早餐的列表网页链接
 def get_eastmoney_url(end_date = None) :
     end_date=get_adjusted_workday(end_date)
     start_date=date(year=2022,month=11,day=2)
     # 计算工作日总数
-    date_range = pd.date_range(start=start_date, end=end_date)
-    workday_count = sum(1 for d in date_range if is_a_stock_trading_day(d.date()))
+    workday_count = get_trading_calendar().count_sessions(start_date, end_date)
 
     # 生成URL列表（修复分页逻辑）
     urls = ["https://stock.eastmoney.com/a/czpnc.html"]  # 第一页
@@ -187,26 +85,22 @@ def get_eastmoney_url(end_date = None) :
 
 #读取列表网页链接，返回每个工作日的财经早餐网页链接
 def get_em_url_page(end_date = None) :
-    if not exists(em_urls_path):
-        get_eastmoney_url(end_date)
-
-    with open(em_urls_path, "r", encoding="utf-8") as f:
-        urls_dic = json.load(f)
-        last_date_str = urls_dic["end_date"]
-        urls = urls_dic["urls"]
-        last_date = datetime.fromisoformat(last_date_str).date()
-    if last_date < end_date:
-        get_eastmoney_url(end_date)
-        with open(em_urls_path, "r", encoding="utf-8") as f:
-            urls_dic = json.load(f)
-            last_date = urls_dic["end_date"]
-            urls = urls_dic["urls"]
-
-    date_and_urls={}
-    for url in urls:
-        time.sleep(rd.uniform(2, 5))
-        html=get_em_listpage_url(url)
-        date_and_urls.update(html)
+    """
+    抓取截至 end_date 的全部列表页，保存每日财经早餐的网页链接
+
+    列表页的抓取进度保存在 frontier.db，中途失败后重新运行只抓取未完成的列表页。
+    """
+    from crawl_frontier import CrawlFrontier, LISTPAGE, crawl_breakfast_archive
+
+    crawl_breakfast_archive(end_date, with_articles=False)
+    frontier = CrawlFrontier()
+    try:
+        date_and_urls = {}
+        for _, mapping in frontier.results(LISTPAGE).values():
+            for date_key, href in mapping.items():
+                date_and_urls.setdefault(date_key, href)
+    finally:
+        frontier.close()
 
     #保存每日财经早餐的网页链接
     with open(em_breakfast_path,"w",encoding="utf-8") as f:
@@ -215,44 +109,193 @@ def get_em_url_page(end_date = None) :
     return None
 
 #根据每日财经早餐的链接，找到里面的图片并保存
-def get_calendar_pic(end_date=None) :
-    if not exists(em_urls_path):
-        get_eastmoney_url(end_date)
-
-    with open(em_urls_path,"r",encoding="utf-8") as f:
-        data_dic=json.load(f)
-    last_date_str=max(data_dic.keys())
-    last_date = datetime.fromisoformat(last_date_str).date()
-
-    if last_date < end_date:
-        get_eastmoney_url(end_date)
-        with open(em_urls_path,"r",encoding="utf-8") as f:
-            data_dic=json.load(f)
-
-    calendar_dic={}
-    for date_url in data_dic.items():
-        date_calendar=date_url[0]
-        url=date_url[1]
-        calendar_url=get_finance_calendar_image(url)
-        calendar_dic[date_calendar]=calendar_url
-
-    with open(em_calendar_pic_path,"w",encoding="utf-8") as f:
-        json.dump(calendar_dic, f, ensure_ascii=False, indent=2)
+def get_calendar_pic(end_date=None, workers=4) :
+    """
+    并发提取截至 end_date 的全部财经早餐日历图片链接，写入 calendar_pic_url.json 并同步到索引
+
+    Args:
+        end_date: 截止日期，None表示最近的交易日
+        workers: 并发线程数
+    """
+    end_date = get_adjusted_workday(end_date)
+    index = BreakfastIndex()
+    newest_date = index.newest_date()
+    if newest_date is None or newest_date < end_date:
+        index.update()
+
+    date_urls = {}
+    known = {}
+    for iso_date, entry in index.entries.items():
+        day = date.fromisoformat(iso_date)
+        if not entry.get("page_url") or day > end_date:
+            continue
+        date_key = day.strftime("%Y年%m月%d日")
+        date_urls[date_key] = entry["page_url"]
+        if entry.get("calendar_url"):
+            known[date_key] = entry["calendar_url"]
+
+    calendar_dic = extract_calendar_images(date_urls, em_calendar_pic_path, known=known, workers=workers)
+    for date_key, calendar_url in calendar_dic.items():
+        if calendar_url:
+            index.set_calendar_url(parse_cn_date(date_key), calendar_url)
+    index.save()
     return None
 
+def download_calendar_pics(revalidate=False, workers=4):
+    """
+    把 calendar_pic_url.json 中的日历图片下载到按内容哈希命名的本地图片库
+
+    Args:
+        revalidate: 是否对已下载的图片发起条件请求，检查是否有更新
+        workers: 并发线程数
+
+    Returns:
+        {日期: 图片SHA-256}，下载失败为None
+    """
+    from image_store import ImageStore
+
+    if not exists(em_calendar_pic_path):
+        logger.warning(f"{em_calendar_pic_path} 不存在，请先运行 get_calendar_pic")
+        return {}
+    with open(em_calendar_pic_path, "r", encoding="utf-8") as f:
+        calendar_dic = json.load(f)
+
+    store = ImageStore()
+    try:
+        hashes = store.download_many(calendar_dic.values(), workers=workers, revalidate=revalidate)
+    finally:
+        store.close()
+    return {date_key: hashes.get(url) for date_key, url in calendar_dic.items() if url}
+
+
 def fetch_em_list_pages(urls):
-    """爬取指定的列表页URLs，返回日期到详情页链接的映射"""
+    """在共享浏览器中并发爬取指定的列表页URLs，返回日期到详情页链接的映射"""
     date_and_urls = {}
+    try:
+        pages = get_em_listpages(urls)
+    except Exception as e:
+        logger.error(f"爬取列表页 {urls} 失败: {e}")
+        return date_and_urls
     for url in urls:
-        time.sleep(rd.uniform(2, 5))
-        try:
-            page_data = get_em_listpage_url(url)
-            date_and_urls.update(page_data)
-        except Exception as e:
-            logger.error(f"爬取列表页 {url} 失败: {e}")
+        if not pages.get(url):
+            logger.warning(f"列表页 {url} 未解析到财经早餐")
+        for date_key, href in pages.get(url, {}).items():
+            date_and_urls.setdefault(date_key, href)
     return date_and_urls
 
 
+def _fetch_calendar_url(target_date_str: str, page_url: str) -> Optional[str]:
+    try:
+        return get_finance_calendar_image(page_url)
+    except Exception as e:
+        logger.error(f"获取 {target_date_str} 的日历图片链接失败: {e}")
+        return None
+
+
+def em_list_page_url(page_num: int) -> str:
+    """第 page_num 页列表页链接（从1开始）"""
+    if page_num == 1:
+        return EM_LIST_FIRST_PAGE
+    return f"https://stock.eastmoney.com/a/czpnc_{page_num}.html"
+
+
+def parse_cn_date(date_str: str) -> date:
+    """"YYYY年MM月DD日" -> date"""
+    return datetime.strptime(date_str, "%Y年%m月%d日").date()
+
+
+class BreakfastIndex:
+    """
+    财经早餐 日期 -> 网页链接/日历图片链接 的本地索引
+
+    以JSON保存在 breakfast_index.json，键为 "YYYY-MM-DD"。首次使用时导入已有的
+    breakfast.json 与 calendar_pic_url.json。page_url 为 None 表示已确认该日没有财经早餐。
+
+    Args:
+        path: 索引文件路径
+    """
+
+    def __init__(self, path: str = em_index_path):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        if exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f).get("dates", {})
+        else:
+            self._import_legacy()
+
+    def _import_legacy(self):
+        for legacy_path, field in ((em_breakfast_path, "page_url"), (em_calendar_pic_path, "calendar_url")):
+            if not exists(legacy_path):
+                continue
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+                for date_str, url in legacy.items():
+                    entry = self.entries.setdefault(parse_cn_date(date_str).isoformat(), {})
+                    entry.setdefault(field, url)
+            except Exception as e:
+                logger.warning(f"导入 {legacy_path} 失败: {e}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "dates": self.entries},
+                      f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def get(self, day: date) -> Optional[dict]:
+        return self.entries.get(day.isoformat())
+
+    def newest_date(self) -> Optional[date]:
+        dated = [d for d, entry in self.entries.items() if entry.get("page_url")]
+        return date.fromisoformat(max(dated)) if dated else None
+
+    def merge(self, date_and_urls: dict) -> int:
+        """合并列表页解析结果（键为 "YYYY年MM月DD日"），返回新增的日期数"""
+        added = 0
+        for date_str, url in date_and_urls.items():
+            entry = self.entries.setdefault(parse_cn_date(date_str).isoformat(), {})
+            if not entry.get("page_url"):
+                entry["page_url"] = url
+                added += 1
+        return added
+
+    def mark_missing(self, day: date):
+        """记录已确认没有财经早餐的日期（抓取范围覆盖了该日但未找到）"""
+        self.entries.setdefault(day.isoformat(), {})["page_url"] = None
+
+    def set_calendar_url(self, day: date, calendar_url: str):
+        self.entries.setdefault(day.isoformat(), {})["calendar_url"] = calendar_url
+
+    def update(self, max_pages: Optional[int] = None) -> int:
+        """
+        从最新的列表页开始逐页向后抓取，遇到已收录的日期即停止
+
+        Args:
+            max_pages: 最多抓取的页数，默认按交易日数估算的总页数
+
+        Returns:
+            新增的日期数
+        """
+        if max_pages is None:
+            max_pages = (get_trading_calendar().count_sessions(EM_START_DATE, get_adjusted_workday()) + 19) // 20
+        known = set(self.entries)
+        added = 0
+        for page_num in range(1, max_pages + 1):
+            date_and_urls = fetch_em_list_pages([em_list_page_url(page_num)])
+            if not date_and_urls:
+                logger.warning(f"第 {page_num} 页未解析到财经早餐，停止更新")
+                break
+            added += self.merge(date_and_urls)
+            if known & {parse_cn_date(d).isoformat() for d in date_and_urls}:
+                break
+        self.save()
+        logger.info(f"财经早餐索引新增 {added} 天，共 {len(self.entries)} 天")
+        return added
+
+
 def get_specific_date_breakfast(specific_date):
     """
     获取特定日期的财经早餐网页链接和图片链接
@@ -277,7 +320,7 @@ def get_specific_date_breakfast(specific_date):
         logger.error(f"日期格式错误: {e}")
         return None
 
-    start_date = date(year=2022, month=11, day=2)
+    start_date = EM_START_DATE
     # 检查特定日期是否在起始日期之前
     if specific_date < start_date:
         logger.error(f"特定日期 {specific_date} 早于起始日期 {start_date}，无数据")
@@ -286,37 +329,40 @@ def get_specific_date_breakfast(specific_date):
     # 转换为目标日期字符串（YYYY年MM月DD日）
     target_date_str = specific_date.strftime("%Y年%m月%d日")
 
-    # 计算从起始日期到特定日期的工作日数量，确定该日期是第几个工作日
-    date_range = pd.date_range(start=start_date, end=specific_date)
-    workdays = [d.date() for d in date_range if is_a_stock_trading_day(d.date())]
-    n = len(workdays)  # 第n个工作日（从1开始计数）
-    if n == 0:
+    # 优先从本地索引查找；日期比索引中最新的还新时，先增量更新索引
+    index = BreakfastIndex()
+    entry = index.get(specific_date)
+    newest_date = index.newest_date()
+    if (entry is None or "page_url" not in entry) and (newest_date is None or specific_date > newest_date):
+        index.update()
+        entry = index.get(specific_date)
+    if entry is not None and "page_url" in entry:
+        page_url = entry["page_url"]
+        if page_url is None:
+            logger.info(f"索引中记录 {target_date_str} 没有财经早餐")
+            return {"date": target_date_str, "page_url": None, "calendar_url": None}
+        calendar_url = entry.get("calendar_url")
+        if not calendar_url:
+            calendar_url = _fetch_calendar_url(target_date_str, page_url)
+            if calendar_url:
+                index.set_calendar_url(specific_date, calendar_url)
+                index.save()
+        return {"date": target_date_str, "page_url": page_url, "calendar_url": calendar_url}
+
+    # 索引中没有该日期时，由 PageLocator 根据已抓取列表页的日期范围定位所在页，并把结果写入索引
+    from page_locator import PageLocator, FAILED, MISSING
+
+    if get_trading_calendar().count_sessions(start_date, specific_date) == 0:
         logger.warning(f"特定日期 {specific_date} 及之前无工作日数据")
         return {"date": target_date_str, "page_url": None, "calendar_url": None}
-
-    # 计算特定日期所在的页码
-    page_num = (n - 1) // 20 + 1  # 每页20条，第1-20个在第1页，21-40在第2页等
-
-    # 计算总页数（到特定日期为止的总工作日对应的页数）
-    total_pages = (n + 19) // 20
-
-    # 确定需要爬取的页码（当前页及前后各一页，处理边界）
-    candidate_pages = [page_num - 1, page_num, page_num + 1]
-    valid_pages = [p for p in candidate_pages if p >= 1 and p <= total_pages]
-    valid_pages = list(set(valid_pages))  # 去重
-    valid_pages.sort()
-
-    # 生成需要爬取的列表页URLs
-    urls = []
-    for p in valid_pages:
-        if p == 1:
-            urls.append("https://stock.eastmoney.com/a/czpnc.html")
-        else:
-            urls.append(f"https://stock.eastmoney.com/a/czpnc_{p}.html")
-    logger.info(f"将爬取以下列表页: {urls}")
-
-    # 爬取这几页的列表数据，获取日期到详情页链接的映射
-    date_and_urls = fetch_em_list_pages(urls)
+    # 列表页页码相对最新一篇计算，定位前先把索引更新到最新
+    newest_date = index.newest_date()
+    if newest_date is not None and newest_date < get_adjusted_workday():
+        index.update()
+    date_and_urls, status = PageLocator(index).locate(specific_date)
+    if status == FAILED:
+        # 列表页抓取失败，不写入索引，下次查询时重新定位
+        return {"date": target_date_str, "page_url": None, "calendar_url": None}
 
     # 获取该日期的详情页链接
     page_url = date_and_urls.get(target_date_str)
@@ -324,10 +370,12 @@ def get_specific_date_breakfast(specific_date):
     # 获取图片链接
     calendar_url = None
     if page_url:
-        try:
-            calendar_url = get_finance_calendar_image(page_url)
-        except Exception as e:
-            logger.error(f"获取 {target_date_str} 的日历图片链接失败: {e}")
+        calendar_url = _fetch_calendar_url(target_date_str, page_url)
+        if calendar_url:
+            index.set_calendar_url(specific_date, calendar_url)
+    elif status == MISSING:
+        index.mark_missing(specific_date)
+    index.save()
 
     return {
         "date": target_date_str,
@@ -335,4 +383,5 @@ def get_specific_date_breakfast(specific_date):
         "calendar_url": calendar_url
     }
 
-get_eastmoney_url()
\ No newline at end of file
+if __name__ == "__main__":
+    get_eastmoney_url()
\ No newline at end of file
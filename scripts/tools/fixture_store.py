@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+#运行模式：off（默认，直接联网）、record（联网并保存响应）、replay（只从本地夹具返回）
+FIXTURE_MODE_ENV = "FIXTURE_MODE"
+FIXTURE_DIR_ENV = "FIXTURE_DIR"
+DEFAULT_FIXTURE_DIR = os.path.join("cache", "fixtures")
+
+#响应体已解码保存，回放时不能再带这些头
+_DROP_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+#浏览器中只录制/回放这些类型的请求，其余资源回放时直接拦截
+RECORDED_RESOURCE_TYPES = {"document", "xhr", "fetch"}
+
+
+def fixture_mode() -> str:
+    mode = os.environ.get(FIXTURE_MODE_ENV, "off").lower()
+    return mode if mode in ("record", "replay") else "off"
+
+
+class FixtureMissingError(requests.exceptions.ConnectionError):
+    """回放模式下没有找到对应的夹具"""
+
+
+class FixtureStore:
+    """
+    HTTP 响应夹具存储
+
+    按(请求方法, URL)的SHA-256存放，每个夹具包含一个元数据JSON和一个响应体文件。
+
+    Args:
+        root: 夹具目录，默认取环境变量 FIXTURE_DIR 或 cache/fixtures
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.environ.get(FIXTURE_DIR_ENV) or DEFAULT_FIXTURE_DIR
+
+    def _base(self, method: str, url: str) -> str:
+        digest = hashlib.sha256(f"{method.upper()} {url}".encode("utf-8")).hexdigest()
+        return os.path.join(self.root, digest[:2], digest)
+
+    def save(self, method: str, url: str, status: int, headers: dict, body: bytes, kind: str = "http"):
+        base = self._base(method, url)
+        os.makedirs(os.path.dirname(base), exist_ok=True)
+        with open(base + ".body.tmp", "wb") as f:
+            f.write(body)
+        os.replace(base + ".body.tmp", base + ".body")
+        meta = {
+            "method": method.upper(),
+            "url": url,
+            "status": status,
+            "headers": {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS},
+            "kind": kind,
+            "size": len(body),
+        }
+        with open(base + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        os.replace(base + ".json.tmp", base + ".json")
+
+    def load(self, method: str, url: str) -> Optional[tuple]:
+        """返回(元数据, 响应体)，不存在时返回None"""
+        base = self._base(method, url)
+        try:
+            with open(base + ".json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(base + ".body", "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        return meta, body
+
+    def iter_fixtures(self) -> Iterator[tuple]:
+        """遍历全部夹具，产出(元数据, 响应体)"""
+        if not os.path.isdir(self.root):
+            return
+        for sub in sorted(os.listdir(self.root)):
+            sub_dir = os.path.join(self.root, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for name in sorted(os.listdir(sub_dir)):
+                if name.endswith(".json"):
+                    with open(os.path.join(sub_dir, name), "r", encoding="utf-8") as f:
+                        meta = json.load(f)
+                    with open(os.path.join(sub_dir, name[:-5] + ".body"), "rb") as f:
+                        yield meta, f.read()
+
+
+class FixtureAdapter(HTTPAdapter):
+    """requests 传输适配器：record 模式联网后保存响应，replay 模式只从夹具返回"""
+
+    def __init__(self, store: FixtureStore, mode: str, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+        self.mode = mode
+
+    def send(self, request, **kwargs):
+        if self.mode == "replay":
+            fixture = self.store.load(request.method, request.url)
+            if fixture is None:
+                raise FixtureMissingError(f"没有找到夹具: {request.method} {request.url}", request=request)
+            meta, body = fixture
+            response = requests.Response()
+            response.status_code = meta["status"]
+            response.headers = CaseInsensitiveDict(meta["headers"])
+            response._content = body
+            response._content_consumed = True
+            response.encoding = get_encoding_from_headers(response.headers)
+            response.url = request.url
+            response.request = request
+            response.reason = "Replayed"
+            return response
+
+        response = super().send(request, **kwargs)
+        if self.mode == "record":
+            self.store.save(request.method, request.url, response.status_code,
+                            dict(response.headers), response.content)
+        return response
+
+
+def install_requests(session: requests.Session, store: Optional[FixtureStore] = None) -> requests.Session:
+    """按当前模式为 requests 会话挂载夹具适配器，off 模式下不做改动"""
+    mode = fixture_mode()
+    if mode != "off":
+        adapter = FixtureAdapter(store or FixtureStore(), mode)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    return session
+
+
+async def install_playwright_async(context, store: Optional[FixtureStore] = None):
+    """为 async API 的浏览器上下文安装夹具路由，off 模式下不做改动"""
+    mode = fixture_mode()
+    if mode == "off":
+        return
+    store = store or FixtureStore()
+
+    async def handler(route):
+        request = route.request
+        if request.resource_type not in RECORDED_RESOURCE_TYPES:
+            if mode == "replay":
+                await route.abort()
+            else:
+                await route.fallback()
+            return
+        if mode == "replay":
+            fixture = store.load(request.method, request.url)
+            if fixture is None:
+                await route.abort()
+                return
+            meta, body = fixture
+            await route.fulfill(status=meta["status"], headers=meta["headers"], body=body)
+            return
+        response = await route.fetch()
+        body = await response.body()
+        store.save(request.method, request.url, response.status, response.headers, body, kind="browser")
+        await route.fulfill(response=response, body=body)
+
+    await context.route("**/*", handler)
@@ -1,9 +1,91 @@
 
+import os
+import json
 import time
 import random
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from fake_useragent import UserAgent
+from fixture_store import install_requests
+from rate_limiter import acquire, get_limiter, set_rate_limit
+
+DEFAULT_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Referer': 'https://finance.eastmoney.com/',
+}
+
+
+def validate_image_url(url):
+    """验证图片URL有效性"""
+    if not url.startswith(('http://', 'https://')):
+        return False
+    valid_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+    if any(url.lower().endswith(ext) for ext in valid_extensions):
+        return True
+    if 'np-newspic.dfcfw.com' in url:  # 东方财富网图片域名
+        return True
+    return False
+
+
+def extract_calendar_image(html):
+    """
+    从财经早餐页面HTML中解析财经日历图片的URL
+
+    Args:
+        html: 财经早餐页面的HTML
+
+    Returns:
+        财经日历图片的URL，若未找到则返回None
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 策略1: 优先从正文区域查找可能的日历图片
+    content_body = soup.find('div', id='ContentBody')
+    if content_body:
+        # 查找中心对齐的图片（通常重要图片会居中）
+        center_tag = content_body.find('center')
+        if center_tag:
+            img_tag = center_tag.find('img')
+            if img_tag:
+                src = img_tag.get('src') or img_tag.get('original')
+                if src and validate_image_url(src):
+                    return src
+
+        # 查找正文区域内的大尺寸图片
+        large_images = []
+        for img in content_body.find_all('img', src=True):
+            src = img.get('src')
+            width = img.get('width', '0')
+            if src and width.isdigit() and int(width) > 500:  # 更大尺寸阈值
+                large_images.append((src, int(width)))
+
+        if large_images:
+            return max(large_images, key=lambda x: x[1])[0]
+
+    # 策略2: 查找特定图片域名（东方财富网专用图片域名）
+    target_img = soup.find('img', src=lambda s: s and 'np-newspic.dfcfw.com' in s)
+    if target_img:
+        src = target_img.get('src')
+        if validate_image_url(src):
+            return src
+
+    # 策略3: 查找包含"日历"关键词的图片
+    calendar_imgs = soup.find_all('img', alt=lambda s: s and '日历' in s)
+    if calendar_imgs:
+        for img in calendar_imgs:
+            src = img.get('src')
+            if src and validate_image_url(src):
+                return src
+
+    return None
 
 
 def get_finance_calendar_image(breakfast_url, max_retries=3, delay_range=(1, 3)):
@@ -26,17 +108,7 @@ def get_finance_calendar_image(breakfast_url, max_retries=3, delay_range=(1, 3))
         'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1',
     })
-
-    def validate_image_url(url):
-        """验证图片URL有效性"""
-        if not url.startswith(('http://', 'https://')):
-            return False
-        valid_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
-        if any(url.lower().endswith(ext) for ext in valid_extensions):
-            return True
-        if 'np-newspic.dfcfw.com' in url:  # 东方财富网图片域名
-            return True
-        return False
+    install_requests(session)
 
     def fetch_with_retry(retry_count=0):
         try:
@@ -59,45 +131,9 @@ def get_finance_calendar_image(breakfast_url, max_retries=3, delay_range=(1, 3))
                     return fetch_with_retry(retry_count + 1)
                 return None
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # 策略1: 优先从正文区域查找可能的日历图片
-            content_body = soup.find('div', id='ContentBody')
-            if content_body:
-                # 查找中心对齐的图片（通常重要图片会居中）
-                center_tag = content_body.find('center')
-                if center_tag:
-                    img_tag = center_tag.find('img')
-                    if img_tag:
-                        src = img_tag.get('src') or img_tag.get('original')
-                        if src and validate_image_url(src):
-                            return src
-
-                # 查找正文区域内的大尺寸图片
-                large_images = []
-                for img in content_body.find_all('img', src=True):
-                    src = img.get('src')
-                    width = img.get('width', '0')
-                    if src and width.isdigit() and int(width) > 500:  # 更大尺寸阈值
-                        large_images.append((src, int(width)))
-
-                if large_images:
-                    return max(large_images, key=lambda x: x[1])[0]
-
-            # 策略2: 查找特定图片域名（东方财富网专用图片域名）
-            target_img = soup.find('img', src=lambda s: s and 'np-newspic.dfcfw.com' in s)
-            if target_img:
-                src = target_img.get('src')
-                if validate_image_url(src):
-                    return src
-
-            # 策略3: 查找包含"日历"关键词的图片
-            calendar_imgs = soup.find_all('img', alt=lambda s: s and '日历' in s)
-            if calendar_imgs:
-                for img in calendar_imgs:
-                    src = img.get('src')
-                    if src and validate_image_url(src):
-                        return src
+            src = extract_calendar_image(response.text)
+            if src:
+                return src
 
             print("未找到符合条件的财经日历图片")
             return None
@@ -115,3 +151,115 @@ def get_finance_calendar_image(breakfast_url, max_retries=3, delay_range=(1, 3))
     return fetch_with_retry()
 
 
+_batch_session: Optional[requests.Session] = None
+_batch_session_lock = threading.Lock()
+
+
+def get_batch_session(pool_size=8) -> requests.Session:
+    """批量提取共用的 keep-alive 会话，User-Agent 只生成一次"""
+    global _batch_session
+    with _batch_session_lock:
+        if _batch_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update(DEFAULT_HEADERS)
+            session.headers['User-Agent'] = UserAgent().random
+            _batch_session = install_requests(session)
+        return _batch_session
+
+
+def fetch_calendar_image(breakfast_url, session=None, max_retries=3, timeout=15, raise_on_failure=False):
+    """
+    用共享会话提取单个财经早餐页面的日历图片URL，请求前按主机取令牌
+
+    Args:
+        raise_on_failure: 为 True 时，重试后仍无法取得页面则抛出 RequestException，
+            以便与“页面中没有日历图片”（返回None）区分
+
+    Returns:
+        财经日历图片的URL，若未找到则返回None
+    """
+    session = session or get_batch_session()
+    host = urlparse(breakfast_url).hostname or ''
+    error = None
+    for attempt in range(max_retries + 1):
+        acquire(host)
+        try:
+            response = session.get(breakfast_url, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"请求 {breakfast_url} 异常（第{attempt + 1}次）: {e}")
+            error = e
+            continue
+        if response.status_code != 200:
+            print(f"请求 {breakfast_url} 失败，状态码: {response.status_code}")
+            error = f"状态码 {response.status_code}"
+            continue
+        response.encoding = 'utf-8'
+        return extract_calendar_image(response.text)
+    if raise_on_failure:
+        raise requests.exceptions.RequestException(f"请求 {breakfast_url} 失败: {error}")
+    return None
+
+
+def _save_json(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def extract_calendar_images(date_urls: Dict[str, str], output_path: str, known: Optional[Dict[str, str]] = None,
+                            workers=4, rate_per_host=2.0, flush_every=10) -> Dict[str, Optional[str]]:
+    """
+    并发提取多个财经早餐页面的日历图片URL，边提取边写入结果文件
+
+    结果文件中已有图片链接的日期会被跳过，中断后重新运行只处理剩余日期。
+
+    Args:
+        date_urls: {日期: 财经早餐页面URL}
+        output_path: 结果JSON文件，{日期: 图片URL}
+        known: 已知的 {日期: 图片URL}，直接写入结果并跳过
+        workers: 并发线程数
+        rate_per_host: 每个主机每秒请求数，该主机已设置限速时不覆盖
+        flush_every: 每得到多少个结果写一次文件
+
+    Returns:
+        全部日期的 {日期: 图片URL}，未找到为None
+    """
+    results = {}
+    if os.path.exists(output_path):
+        try:
+            with open(output_path, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"读取 {output_path} 失败，将重新生成: {e}")
+    results.update({k: v for k, v in (known or {}).items() if v})
+
+    pending = {k: url for k, url in date_urls.items() if not results.get(k)}
+    for host in {urlparse(url).hostname or '' for url in pending.values()}:
+        if rate_per_host and get_limiter(host) is None:
+            set_rate_limit(host, rate_per_host)
+
+    print(f"共 {len(date_urls)} 个日期，待提取 {len(pending)} 个")
+    session = get_batch_session(pool_size=max(workers, 1))
+    done = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_calendar_image, url, session): key for key, url in pending.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    print(f"提取 {key} 的日历图片时发生错误: {e}")
+                    results[key] = None
+                done += 1
+                if done % flush_every == 0:
+                    _save_json(output_path, results)
+    finally:
+        _save_json(output_path, results)
+    print(f"提取完成，{sum(1 for k in date_urls if results.get(k))}/{len(date_urls)} 个日期找到日历图片")
+    return {k: results.get(k) for k in date_urls}
@@ -1,13 +1,59 @@
+import os
 import re
 import sys
+import json
+import time
+import asyncio
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+from resource_blocker import install_async as install_resource_blocker
+from fixture_store import install_playwright_async, install_requests
+from async_runner import get_background_loop
+from rate_limiter import acquire, acquire_async, get_limiter, set_rate_limit
 
 
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
 SELECTOR_TO_WAIT = "ul#newsListContent, div.text, li[id^='newsTr']"
 FINANCE_BREAKFAST_KEYWORD = "财经早餐"  # 筛选关键词
 
+# 超时时间（单位：毫秒）
+GOTO_TIMEOUT = 30000  # 页面加载超时（30秒）
+SELECTOR_TIMEOUT = 15000  # 列表元素等待超时（15秒）
+IDLE_TIMEOUT = 10000  # 未等到列表元素时，等待网络空闲的超时（10秒）
+RENDER_CONCURRENCY = 4  # 同时渲染的页面数
+HTTP_TIMEOUT = 10  # 直接请求列表页的超时（秒）
+EASTMONEY_RATE = 0.5  # 列表页每秒请求数（浏览器渲染与直接请求共用），约每2秒一页
+
+# parse_mapping 需要的列表结构，初始HTML中存在时不必启动浏览器
+LIST_CONTENT_XPATH = ("//ul[@id='newsListContent']/li"
+                      "//p[contains(concat(' ', normalize-space(@class), ' '), ' title ')]/a[@href]")
+
+# parse_mapping 使用的预编译 XPath 与日期正则
+def _has_class(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+LIST_ITEMS = etree.XPath("//ul[@id='newsListContent']/li")
+TEXT_DIVS = etree.XPath(f"//div[{_has_class('text')}]")
+FIRST_TEXT_DIV = etree.XPath(f"(.//div[{_has_class('text')}])[1]")
+FIRST_TITLE_P = etree.XPath(f"(.//p[{_has_class('title')}])[1]")
+FIRST_TIME_P = etree.XPath(f"(.//p[{_has_class('time')}])[1]")
+FIRST_LINK = etree.XPath("(.//a[@href])[1]")
+DATE_PATTERN = re.compile(r"(\d{4}年\d{2}月\d{2}日)")
+
+# 未在别处设置时，为列表页请求注册默认限速
+if get_limiter("eastmoney") is None:
+    set_rate_limit("eastmoney", EASTMONEY_RATE)
+
+# 记录每个列表页由哪一层（http / browser）取得
+listpage_tiers_path = os.path.join("cache", "news", "eastmoney_breakfast", "listpage_tiers.json")
+
 
 def ensure_playwright_browsers():
     try:
@@ -21,36 +67,206 @@ def ensure_playwright_browsers():
         print("请手动安装浏览器：python -m playwright install")
         raise
 
-def fetch_rendered_html(url):
-    try:
-        from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-    except ImportError:
-        print("请安装依赖：pip install playwright bs4")
-        raise
+class EmBrowserSession:
+    """
+    东方财富列表页的常驻浏览器会话
 
-    # 延长超时时间（单位：毫秒）
-    GOTO_TIMEOUT = 6000000  # 页面加载超时（1分钟）
-    SELECTOR_TIMEOUT = 6000000  # 元素等待超时（1分钟）
+    浏览器只启动一次，所有列表页共用一个上下文，各自在独立页面中并发渲染；
+    浏览器意外断开时下次渲染前自动重启。需在同一个事件循环中使用。
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        context = browser.new_context(user_agent=USER_AGENT, locale="zh-CN")
-        page = context.new_page()
+    Args:
+        headless: 是否无头模式
+    """
+
+    def __init__(self, headless=True):
+        self.headless = headless
+        self._playwright = None
+        self._browser = None
+        self._context = None
+        self._lock = asyncio.Lock()
+
+    async def _launch(self):
         try:
-            # 延长页面加载超时
-            page.goto(url, wait_until="domcontentloaded", timeout=GOTO_TIMEOUT)
+            return await self._playwright.chromium.launch(headless=self.headless)
+        except Exception as e:
+            if "Executable doesn't exist" not in str(e):
+                raise
+            ensure_playwright_browsers()
+            return await self._playwright.chromium.launch(headless=self.headless)
+
+    async def start(self):
+        async with self._lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
             try:
-                # 延长元素等待超时
-                page.wait_for_selector(SELECTOR_TO_WAIT, timeout=SELECTOR_TIMEOUT)
+                from playwright.async_api import async_playwright
+            except ImportError:
+                print("请安装依赖：pip install playwright bs4")
+                raise
+            if self._playwright is None:
+                self._playwright = await async_playwright().start()
+            self._browser = await self._launch()
+            self._context = await self._browser.new_context(user_agent=USER_AGENT, locale="zh-CN")
+            await install_playwright_async(self._context)
+
+    async def render(self, url, fast_mode=False):
+        """渲染单个列表页并返回HTML"""
+        from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+        await self.start()
+        await acquire_async("eastmoney")
+        page = await self._context.new_page()
+        try:
+            block_stats = await install_resource_blocker(page) if fast_mode else None
+            await page.goto(url, wait_until="domcontentloaded", timeout=GOTO_TIMEOUT)
+            try:
+                await page.wait_for_selector(SELECTOR_TO_WAIT, timeout=SELECTOR_TIMEOUT)
             except PlaywrightTimeoutError:
-                # 网络空闲状态也延长超时
-                page.wait_for_load_state("networkidle", timeout=SELECTOR_TIMEOUT)
-            return page.content()
+                await page.wait_for_load_state("networkidle", timeout=IDLE_TIMEOUT)
+            if block_stats is not None:
+                print(f"快速模式：{block_stats.summary()}")
+            return await page.content()
         finally:
-            context.close()
-            browser.close()
+            try:
+                await page.close()
+            except Exception:
+                pass
+
+    async def render_many(self, urls, concurrency=RENDER_CONCURRENCY, fast_mode=False):
+        """并发渲染多个列表页，返回 {url: HTML 或异常}"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _render(url):
+            async with semaphore:
+                return await self.render(url, fast_mode)
+
+        results = await asyncio.gather(*(_render(url) for url in urls), return_exceptions=True)
+        return dict(zip(urls, results))
+
+    async def close(self):
+        for closable in (self._context, self._browser):
+            if closable is not None:
+                try:
+                    await closable.close()
+                except Exception:
+                    pass
+        self._context = self._browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+_em_session: Optional[EmBrowserSession] = None
+
+
+async def close_em_session():
+    """关闭共享的列表页浏览器会话"""
+    global _em_session
+    if _em_session is not None:
+        await _em_session.close()
+        _em_session = None
+
+
+def _run_in_session(method, *args):
+    """在常驻后台事件循环中调用共享会话的方法，首次调用时创建会话并注册退出清理"""
+    loop = get_background_loop()
+    loop.add_shutdown_hook(close_em_session)
+
+    async def _call():
+        global _em_session
+        if _em_session is None:
+            _em_session = EmBrowserSession()
+        return await getattr(_em_session, method)(*args)
+
+    return loop.run(_call())
+
+
+def fetch_rendered_html(url, fast_mode=False):
+    """
+    渲染列表页并返回HTML，浏览器在多次调用间复用
+
+    Args:
+        url: 列表页链接
+        fast_mode: 快速模式，拦截图片、字体、样式表、媒体和跟踪请求
+    """
+    return _run_in_session("render", url, fast_mode)
+
+
+def fetch_rendered_many(urls: List[str], concurrency=RENDER_CONCURRENCY, fast_mode=False) -> Dict[str, Optional[str]]:
+    """
+    在共享浏览器中并发渲染多个列表页
+
+    Args:
+        urls: 列表页链接
+        concurrency: 同时渲染的页面数
+        fast_mode: 快速模式
+
+    Returns:
+        {url: HTML}，渲染失败的链接值为None
+    """
+    urls = list(dict.fromkeys(urls))
+    results = _run_in_session("render_many", urls, concurrency, fast_mode)
+    html_by_url = {}
+    for url in urls:
+        result = results.get(url)
+        if isinstance(result, BaseException):
+            print(f"渲染 {url} 失败：{result}")
+            result = None
+        html_by_url[url] = result
+    return html_by_url
+
+def _stripped_text(element) -> str:
+    """与 BeautifulSoup 的 get_text(strip=True) 相同：各文本片段去除首尾空白后拼接"""
+    return "".join(t.strip() for t in element.itertext())
+
 
 def parse_mapping(html):
+    """
+    从列表页中提取 {"YYYY年MM月DD日": 财经早餐链接}
+
+    直接用 lxml 解析，只访问 ul#newsListContent 下的列表项（没有时退回全部 div.text），
+    XPath 与日期正则均预编译；结果与 parse_mapping_bs4 相同。
+    """
+    try:
+        tree = lxml_html.fromstring(html)
+    except (etree.ParserError, ValueError):
+        return {}
+    mapping = {}
+
+    candidates = []
+    for li in LIST_ITEMS(tree):
+        div = FIRST_TEXT_DIV(li)
+        candidates.append(div[0] if div else li)
+    if not candidates:
+        candidates = TEXT_DIVS(tree)
+
+    for container in candidates:
+        title_p = FIRST_TITLE_P(container)
+        if not title_p:
+            continue
+        a_tag = FIRST_LINK(title_p[0])
+        if not a_tag:
+            continue
+        a_tag = a_tag[0]
+        if FINANCE_BREAKFAST_KEYWORD not in _stripped_text(a_tag):
+            continue
+
+        href = a_tag.get("href").strip()
+        if not href.startswith(("http://", "https://")):
+            href = "https://finance.eastmoney.com" + href
+
+        time_p = FIRST_TIME_P(container)
+        if not time_p:
+            continue
+        date_match = DATE_PATTERN.search(_stripped_text(time_p[0]))
+        if date_match:
+            mapping.setdefault(date_match.group(1), href)
+
+    return mapping
+
+
+def parse_mapping_bs4(html):
+    """parse_mapping 的原 BeautifulSoup 实现，保留作为等价性检查的参照"""
     soup = BeautifulSoup(html, "lxml")
     mapping = {}
     candidates = []
@@ -96,16 +312,123 @@ def parse_mapping(html):
     return mapping
 
 
-def get_em_listpage_url(url):
+_http_session: Optional[requests.Session] = None
+
+
+def get_http_session() -> requests.Session:
+    """列表页直接请求共用的 keep-alive 会话"""
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=RENDER_CONCURRENCY * 2)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+            "Referer": "https://stock.eastmoney.com/",
+        })
+        _http_session = install_requests(session)
+    return _http_session
+
+
+def has_list_content(html) -> bool:
+    """HTML中是否已有新闻列表（ul#newsListContent 下带链接的 p.title）"""
     try:
-        try:
-            html = fetch_rendered_html(url)
-        except Exception as e:
-            if "Executable doesn't exist" in str(e) or "playwright" in str(e).lower():
-                ensure_playwright_browsers()
-                html = fetch_rendered_html(url)
-            else:
-                raise
+        return bool(lxml_html.fromstring(html).xpath(LIST_CONTENT_XPATH))
+    except (etree.ParserError, ValueError):
+        return False
+
+
+def fetch_listpage_http(url) -> Optional[str]:
+    """直接请求列表页，初始HTML中没有新闻列表或请求失败时返回None"""
+    acquire("eastmoney")
+    try:
+        response = get_http_session().get(url, timeout=HTTP_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        print(f"直接请求 {url} 失败：{e}")
+        return None
+    if response.status_code != 200:
+        return None
+    response.encoding = "utf-8"
+    html = response.text
+    return html if has_list_content(html) else None
+
+
+def record_tiers(tiers: Dict[str, dict]):
+    """把本次各列表页的取得方式合并写入 listpage_tiers.json"""
+    try:
+        with open(listpage_tiers_path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {}
+    entries.update(tiers)
+    os.makedirs(os.path.dirname(listpage_tiers_path), exist_ok=True)
+    tmp_path = listpage_tiers_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, listpage_tiers_path)
+
+
+def fetch_listpages_tiered(urls, concurrency=RENDER_CONCURRENCY, fast_mode=False) -> Dict[str, Optional[str]]:
+    """
+    分层获取列表页HTML：先并发直接请求，初始HTML中缺少新闻列表的页面再交给浏览器渲染
+
+    Args:
+        urls: 列表页链接
+        concurrency: 同时请求/渲染的页面数
+        fast_mode: 浏览器渲染时使用快速模式
+
+    Returns:
+        {url: HTML}，两层都失败的链接值为None
+    """
+    urls = list(dict.fromkeys(urls))
+    tiers = {}
+
+    def _fetch_http(url):
+        start = time.perf_counter()
+        return url, fetch_listpage_http(url), time.perf_counter() - start
+
+    html_by_url = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for url, html, elapsed in executor.map(_fetch_http, urls):
+            html_by_url[url] = html
+            if html is not None:
+                tiers[url] = {"tier": "http", "elapsed_ms": round(elapsed * 1000, 1)}
+
+    fallback = [url for url in urls if html_by_url[url] is None]
+    if fallback:
+        start = time.perf_counter()
+        rendered = fetch_rendered_many(fallback, concurrency, fast_mode)
+        elapsed = (time.perf_counter() - start) / len(fallback)
+        for url in fallback:
+            html_by_url[url] = rendered.get(url)
+            tiers[url] = {"tier": "browser" if rendered.get(url) else "failed",
+                          "elapsed_ms": round(elapsed * 1000, 1)}
+
+    checked_at = datetime.now().isoformat(timespec="seconds")
+    for entry in tiers.values():
+        entry["checked_at"] = checked_at
+    print(f"列表页获取：直接请求 {len(urls) - len(fallback)} 页，浏览器渲染 {len(fallback)} 页")
+    try:
+        record_tiers(tiers)
+    except OSError as e:
+        print(f"记录列表页获取方式失败：{e}")
+    return html_by_url
+
+
+def get_em_listpages(urls, concurrency=RENDER_CONCURRENCY, fast_mode=False):
+    """分层获取并解析多个列表页，返回 {url: {日期: 链接}}，失败的页面为空字典"""
+    return {url: parse_mapping(html) if html else {}
+            for url, html in fetch_listpages_tiered(urls, concurrency, fast_mode).items()}
+
+
+def get_em_listpage_url(url, fast_mode=False):
+    try:
+        html = fetch_listpages_tiered([url], fast_mode=fast_mode)[url]
+        if html is None:
+            raise RuntimeError(f"无法获取列表页 {url}")
         return parse_mapping(html)
     except Exception as e:
         print(f"运行失败：{e}")
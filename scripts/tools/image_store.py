@@ -0,0 +1,207 @@
+import os
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scripts.logging_config import setup_logger
+from fixture_store import install_requests
+from rate_limiter import acquire, get_limiter, set_rate_limit
+
+logger = setup_logger("image_store")
+
+image_store_dir = os.path.join("cache", "images")
+
+CHUNK_SIZE = 64 * 1024
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+
+def guess_extension(url: str, content_type: Optional[str]) -> str:
+    """按 Content-Type（其次URL后缀）确定文件扩展名"""
+    if content_type:
+        ext = mimetypes.guess_extension(content_type.split(";")[0].strip())
+        if ext:
+            return ".jpg" if ext == ".jpe" else ext
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return ext if ext in (".jpg", ".jpeg", ".png", ".gif", ".webp") else ".bin"
+
+
+class ImageStore:
+    """
+    按内容 SHA-256 命名的图片存储
+
+    图片保存在 objects/哈希前两位/哈希.扩展名，相同内容只存一份；SQLite 索引记录
+    URL -> 哈希及 ETag / Last-Modified，用于跳过已下载的URL和条件请求重新验证。
+    下载按块流式写入临时文件并同时计算哈希，内存占用与图片大小无关。
+
+    Args:
+        root: 存储根目录
+        session: requests 会话，默认创建带连接池的会话
+    """
+
+    def __init__(self, root: str = image_store_dir, session: Optional[requests.Session] = None, pool_size: int = 8):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(root, "image_index.db"), check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS images (
+                url TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                path TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                size INTEGER,
+                fetched_at TEXT
+            )
+        """)
+        self.conn.commit()
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"User-Agent": USER_AGENT, "Referer": "https://finance.eastmoney.com/"})
+            install_requests(session)
+        self.session = session
+
+    def close(self):
+        self.conn.close()
+
+    def lookup(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT url, sha256, path, etag, last_modified, content_type, size, fetched_at FROM images WHERE url = ?",
+                (url,)).fetchone()
+        if row is None:
+            return None
+        columns = ["url", "sha256", "path", "etag", "last_modified", "content_type", "size", "fetched_at"]
+        return dict(zip(columns, row))
+
+    def path_for(self, url: str) -> Optional[str]:
+        """URL 对应的本地图片路径，未下载时返回None"""
+        entry = self.lookup(url)
+        return os.path.join(self.root, entry["path"]) if entry else None
+
+    def _record(self, url: str, sha256: str, path: str, response: requests.Response, size: int):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO images(url, sha256, path, etag, last_modified, content_type, size, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, sha256, path, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 response.headers.get("Content-Type"), size, datetime.now().isoformat(timespec="seconds")))
+            self.conn.commit()
+
+    def _touch(self, url: str):
+        with self._lock:
+            self.conn.execute("UPDATE images SET fetched_at = ? WHERE url = ?",
+                              (datetime.now().isoformat(timespec="seconds"), url))
+            self.conn.commit()
+
+    def download(self, url: str, revalidate: bool = False, timeout: int = 30) -> Dict[str, Optional[str]]:
+        """
+        下载单张图片
+
+        Args:
+            url: 图片URL
+            revalidate: 已下载的URL是否用 If-None-Match / If-Modified-Since 重新验证
+            timeout: 请求超时（秒）
+
+        Returns:
+            {"status": cached/not_modified/downloaded/failed, "sha256": 哈希}
+        """
+        entry = self.lookup(url)
+        object_exists = entry is not None and os.path.exists(os.path.join(self.root, entry["path"]))
+        if object_exists and not revalidate:
+            return {"status": "cached", "sha256": entry["sha256"]}
+
+        # 本地文件已丢失时不发条件请求，否则 304 会留下一个没有文件的索引记录
+        headers = {}
+        if object_exists:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        acquire(urlparse(url).hostname or "")
+        try:
+            with self.session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 304 and object_exists:
+                    self._touch(url)
+                    return {"status": "not_modified", "sha256": entry["sha256"]}
+                if response.status_code != 200:
+                    logger.warning(f"下载 {url} 失败，状态码 {response.status_code}")
+                    return {"status": "failed", "sha256": None}
+
+                digest = hashlib.sha256()
+                size = 0
+                fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                            digest.update(chunk)
+                            size += len(chunk)
+                    sha256 = digest.hexdigest()
+                    rel_path = os.path.join("objects", sha256[:2],
+                                            sha256 + guess_extension(url, response.headers.get("Content-Type")))
+                    final_path = os.path.join(self.root, rel_path)
+                    if os.path.exists(final_path):
+                        os.remove(tmp_path)
+                    else:
+                        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                        os.replace(tmp_path, final_path)
+                except Exception:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                    raise
+                self._record(url, sha256, rel_path, response, size)
+                return {"status": "downloaded", "sha256": sha256}
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"下载 {url} 失败: {e}")
+            return {"status": "failed", "sha256": None}
+
+    def download_many(self, urls: Iterable[str], workers: int = 4, revalidate: bool = False,
+                      rate_per_host: Optional[float] = 2.0) -> Dict[str, Optional[str]]:
+        """
+        并发下载多张图片
+
+        Args:
+            urls: 图片URL
+            workers: 并发线程数
+            revalidate: 是否重新验证已下载的URL
+            rate_per_host: 每个主机每秒请求数，该主机已设置限速时不覆盖
+
+        Returns:
+            {url: sha256}，失败为None
+        """
+        urls = [u for u in dict.fromkeys(urls) if u]
+        for host in {urlparse(u).hostname or "" for u in urls}:
+            if rate_per_host and get_limiter(host) is None:
+                set_rate_limit(host, rate_per_host)
+
+        results: Dict[str, Optional[str]] = {}
+        counts: Dict[str, int] = {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(self.download, url, revalidate): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logger.error(f"下载 {url} 时发生错误: {e}")
+                    outcome = {"status": "failed", "sha256": None}
+                results[url] = outcome["sha256"]
+                counts[outcome["status"]] = counts.get(outcome["status"], 0) + 1
+        logger.info(f"图片下载完成: {counts}")
+        return results
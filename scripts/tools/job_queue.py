@@ -0,0 +1,95 @@
+import os
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Sequence, Tuple
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueue:
+    """
+    持久化任务队列（SQLite）的公共部分
+
+    每个任务由 KEY_COLUMNS 唯一确定，记录状态、尝试次数、错误信息与更新时间；
+    领取时状态置为running并累加尝试次数，重启后 reset_interrupted 把中断的任务恢复为pending。
+    子类定义表名、主键列和附加列，并实现各自的 enqueue / claim / mark_done / mark_failed。
+
+    Args:
+        db_path: 数据库路径
+    """
+
+    TABLE = ""
+    KEY_COLUMNS: Tuple[str, ...] = ()
+    #附加列定义，如 "news_count INTEGER"
+    EXTRA_COLUMNS: Tuple[str, ...] = ()
+    #附加索引，如 ("idx_name", "state, date")
+    INDEXES: Tuple[Tuple[str, str], ...] = ()
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        columns = [f"{c} TEXT NOT NULL" for c in self.KEY_COLUMNS] + list(self.EXTRA_COLUMNS) + [
+            "state TEXT NOT NULL DEFAULT 'pending'",
+            "attempts INTEGER NOT NULL DEFAULT 0",
+            "error TEXT",
+            "updated_at TEXT",
+            f"PRIMARY KEY ({', '.join(self.KEY_COLUMNS)})",
+        ]
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.TABLE} ({', '.join(columns)})")
+        for name, indexed in self.INDEXES:
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {self.TABLE}({indexed})")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    @property
+    def _key_clause(self) -> str:
+        return " AND ".join(f"{c}=?" for c in self.KEY_COLUMNS)
+
+    def reset_interrupted(self) -> int:
+        """将上次中断时仍处于running的任务恢复为pending"""
+        cur = self.conn.execute(f"UPDATE {self.TABLE} SET state=? WHERE state=?", (PENDING, RUNNING))
+        self.conn.commit()
+        return cur.rowcount
+
+    def retry_failed(self, max_attempts: int) -> int:
+        """将未超过最大尝试次数的失败任务重新置为pending"""
+        cur = self.conn.execute(
+            f"UPDATE {self.TABLE} SET state=? WHERE state=? AND attempts<?", (PENDING, FAILED, max_attempts))
+        self.conn.commit()
+        return cur.rowcount
+
+    def _claim(self, limit: int, order: str, where: str = "", params: Sequence = (),
+               columns: Sequence[str] = ()) -> List[tuple]:
+        """按 order 领取待执行任务并标记为running，返回 主键列 + columns 组成的元组"""
+        selected = list(self.KEY_COLUMNS) + list(columns)
+        condition = "state=?" + (f" AND {where}" if where else "")
+        rows = self.conn.execute(
+            f"SELECT {', '.join(selected)} FROM {self.TABLE} WHERE {condition} ORDER BY {order} LIMIT ?",
+            (PENDING, *params, limit)).fetchall()
+        now = datetime.now().isoformat()
+        key_len = len(self.KEY_COLUMNS)
+        self.conn.executemany(
+            f"UPDATE {self.TABLE} SET state=?, attempts=attempts+1, updated_at=? WHERE {self._key_clause}",
+            ((RUNNING, now, *row[:key_len]) for row in rows))
+        self.conn.commit()
+        return rows
+
+    def _finish(self, key: Sequence, state: str, **fields):
+        """更新任务状态及附加字段"""
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(["state=?"] + [f"{c}=?" for c in fields])
+        self.conn.execute(
+            f"UPDATE {self.TABLE} SET {assignments} WHERE {self._key_clause}",
+            (state, *fields.values(), *key))
+        self.conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        rows = self.conn.execute(f"SELECT state, COUNT(*) FROM {self.TABLE} GROUP BY state").fetchall()
+        return dict(rows)
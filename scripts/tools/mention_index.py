@@ -0,0 +1,240 @@
+import os
+import re
+import csv
+import json
+import sqlite3
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+from scripts.logging_config import setup_logger
+from news_crawler import iter_news_files, news_article_id
+
+logger = setup_logger("mention_index")
+
+stock_universe_path = os.path.join("cache", "stock_universe.csv")
+mention_index_path = os.path.join("cache", "news", "mention_index.db")
+
+CODE_PATTERN = re.compile(r"(?<!\d)(\d{6})(?!\d)")
+
+
+def normalize_name(name: str) -> str:
+    """统一全角字符并去除空白，如 "万  科Ａ" -> "万科A" """
+    return re.sub(r"\s+", "", unicodedata.normalize("NFKC", name or ""))
+
+
+def load_stock_universe(refresh: bool = False) -> List[Tuple[str, str]]:
+    """
+    获取A股代码与简称列表，优先读取本地缓存
+
+    Args:
+        refresh: 是否强制从实时行情快照重新获取
+
+    Returns:
+        [(代码, 简称)]
+    """
+    if not refresh and os.path.exists(stock_universe_path):
+        with open(stock_universe_path, "r", encoding="utf-8", newline="") as f:
+            return [(row["code"], row["name"]) for row in csv.DictReader(f)]
+
+    import akshare as ak
+    spot = ak.stock_zh_a_spot_em()
+    universe = [(str(code), normalize_name(name)) for code, name in zip(spot["代码"], spot["名称"])]
+
+    os.makedirs(os.path.dirname(stock_universe_path), exist_ok=True)
+    with open(stock_universe_path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["code", "name"])
+        writer.writerows(universe)
+    logger.info(f"已更新A股代码表，共 {len(universe)} 只股票")
+    return universe
+
+
+class MentionMatcher:
+    """
+    多模式匹配文本中出现的股票代码和简称
+
+    代码用正则找出所有6位数字后查表；简称优先使用 pyahocorasick 自动机，
+    未安装时退化为按简称长度切片查哈希表。
+    """
+
+    def __init__(self, universe: Iterable[Tuple[str, str]], min_name_len: int = 2):
+        self.codes = set()
+        self.name_to_code: Dict[str, str] = {}
+        for code, name in universe:
+            self.codes.add(code)
+            name = normalize_name(name)
+            if len(name) >= min_name_len:
+                self.name_to_code[name] = code
+        self.name_lengths = sorted({len(n) for n in self.name_to_code}, reverse=True)
+
+        self.automaton = None
+        if ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for name, code in self.name_to_code.items():
+                self.automaton.add_word(name, code)
+            self.automaton.make_automaton()
+
+    def match(self, text: str) -> set:
+        if not text:
+            return set()
+        text = normalize_name(text)
+        found = {code for code in CODE_PATTERN.findall(text) if code in self.codes}
+        if self.automaton is not None:
+            found.update(code for _, code in self.automaton.iter(text))
+        else:
+            for i in range(len(text)):
+                for length in self.name_lengths:
+                    code = self.name_to_code.get(text[i:i + length])
+                    if code:
+                        found.add(code)
+        return found
+
+
+@lru_cache(maxsize=None)
+def get_default_matcher() -> MentionMatcher:
+    """由本地A股代码表构建并缓存匹配器，进程内只构建一次"""
+    return MentionMatcher(load_stock_universe())
+
+
+class MentionIndex:
+    """
+    股票代码 -> 新闻文章ID 的倒排索引（SQLite）
+
+    Args:
+        db_path: 索引数据库路径
+        matcher: 代码与简称匹配器，默认使用 get_default_matcher()
+    """
+
+    def __init__(self, db_path: str = mention_index_path, matcher: Optional[MentionMatcher] = None):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS mentions (
+                code TEXT NOT NULL,
+                article_id TEXT NOT NULL,
+                PRIMARY KEY (code, article_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS articles (
+                article_id TEXT PRIMARY KEY,
+                ticker TEXT,
+                publish_time TEXT,
+                title TEXT,
+                url TEXT
+            );
+            CREATE TABLE IF NOT EXISTS indexed_files (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL
+            );
+        """)
+        self.conn.commit()
+        self._matcher = matcher
+
+    @property
+    def matcher(self) -> MentionMatcher:
+        if self._matcher is None:
+            self._matcher = get_default_matcher()
+        return self._matcher
+
+    def close(self):
+        self.conn.close()
+
+    def add_articles(self, ticker: str, news_list: List[dict], commit: bool = True) -> int:
+        """
+        将新闻加入索引，返回新增文章数
+
+        已索引的文章不再做代码/简称匹配，但仍为 ticker 补上提及记录（同一篇文章可能由多只股票的搜索得到）。
+        """
+        added = 0
+        for item in news_list:
+            article_id = news_article_id(item)
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO articles(article_id, ticker, publish_time, title, url) VALUES (?, ?, ?, ?, ?)",
+                (article_id, ticker, item.get("publish_time"), item.get("title", ""), item.get("url", "")))
+            if not cur.rowcount:
+                self.conn.execute("INSERT OR IGNORE INTO mentions(code, article_id) VALUES (?, ?)", (ticker, article_id))
+                continue
+            added += 1
+            codes = self.matcher.match(f"{item.get('title', '')}\n{item.get('content', '')}")
+            codes.add(ticker)
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO mentions(code, article_id) VALUES (?, ?)",
+                ((code, article_id) for code in codes))
+        if commit:
+            self.conn.commit()
+        return added
+
+    def update(self, tickers: Optional[List[str]] = None) -> int:
+        """增量索引新闻缓存，只处理新增或修改过的缓存文件，返回新增文章数"""
+        indexed = dict(self.conn.execute("SELECT path, mtime FROM indexed_files"))
+        added = 0
+        for ticker, path in iter_news_files(tickers):
+            mtime = os.path.getmtime(path)
+            if indexed.get(path) == mtime:
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    news_list = json.load(f).get("news", [])
+            except Exception as e:
+                logger.error(f"读取 {path} 失败: {e}")
+                continue
+            added += self.add_articles(ticker, news_list, commit=False)
+            self.conn.execute("INSERT OR REPLACE INTO indexed_files(path, mtime) VALUES (?, ?)", (path, mtime))
+            self.conn.commit()
+        logger.info(f"索引更新完成，新增文章 {added} 篇")
+        return added
+
+    def lookup(self, code: str, since: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        """
+        查询提到某只股票的全部文章
+
+        Args:
+            code: 股票代码
+            since: 只返回该时间之后发布的文章，格式 "YYYY-MM-DD"
+            limit: 最多返回的条数
+
+        Returns:
+            文章列表，按发布时间倒序
+        """
+        sql = ("SELECT a.article_id, a.ticker, a.publish_time, a.title, a.url FROM mentions m "
+               "JOIN articles a ON a.article_id = m.article_id WHERE m.code = ?")
+        params = [code]
+        if since:
+            sql += " AND a.publish_time >= ?"
+            params.append(since)
+        sql += " ORDER BY a.publish_time DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        columns = ["article_id", "ticker", "publish_time", "title", "url"]
+        return [dict(zip(columns, row)) for row in self.conn.execute(sql, params)]
+
+    def article_ids(self, code: str) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT article_id FROM mentions WHERE code = ?", (code,))]
+
+
+def index_news_on_insert(ticker: str, news_list: List[dict], matcher: Optional[MentionMatcher] = None):
+    """新闻写入缓存后同步更新索引，匹配器默认复用进程内缓存的实例；索引尚未建立时不做任何事"""
+    if not os.path.exists(mention_index_path):
+        return
+    index = MentionIndex(matcher=matcher)
+    try:
+        index.add_articles(ticker, news_list)
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    start = datetime.now()
+    mention_index = MentionIndex()
+    mention_index.update()
+    print(mention_index.lookup("601398", limit=10))
+    mention_index.close()
+    print(f"耗时 {datetime.now() - start}")
@@ -0,0 +1,148 @@
+import os
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Iterable, List, Optional
+
+import pandas as pd
+
+from scripts.logging_config import setup_logger
+from rate_limiter import set_rate_limit
+from job_queue import JobQueue, DONE, FAILED
+from news_crawler import get_stock_news
+
+logger = setup_logger("news_backfill")
+
+backfill_db_path = os.path.join("cache", "news", "backfill_queue.db")
+
+
+class BackfillQueue(JobQueue):
+    """
+    持久化的历史新闻回补任务队列（SQLite）
+
+    每个任务为一个(ticker, date)，记录状态、尝试次数与结果，重启后已完成的任务会被跳过。
+    """
+
+    TABLE = "backfill_jobs"
+    KEY_COLUMNS = ("ticker", "date")
+    EXTRA_COLUMNS = ("news_count INTEGER",)
+    INDEXES = (("idx_backfill_state_date", "state, date"),)
+
+    def __init__(self, db_path: str = backfill_db_path):
+        super().__init__(db_path)
+
+    def enqueue(self, tickers: Iterable[str], dates: Iterable[str]) -> int:
+        """批量加入任务，已存在的(ticker, date)保持原状态，返回新增任务数"""
+        dates = list(dates)
+        now = datetime.now().isoformat()
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO backfill_jobs(ticker, date, updated_at) VALUES (?, ?, ?)",
+            ((ticker, d, now) for ticker in tickers for d in dates)
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def claim(self, limit: int = 1) -> List[tuple]:
+        """按日期从新到旧领取待执行任务，并标记为running"""
+        return self._claim(limit, order="date DESC, ticker")
+
+    def mark_done(self, ticker: str, date: str, news_count: int):
+        self._finish((ticker, date), DONE, news_count=news_count, error=None)
+
+    def mark_failed(self, ticker: str, date: str, error: str):
+        self._finish((ticker, date), FAILED, error=error)
+
+
+def backfill_dates(start_date: str, end_date: str) -> List[str]:
+    """生成回补日期列表（仅工作日，格式YYYY-MM-DD）"""
+    return [d.strftime("%Y-%m-%d") for d in pd.bdate_range(start=start_date, end=end_date)]
+
+
+def _fetch_one(ticker: str, date: str, max_news: int) -> int:
+    """获取失败时抛出 NewsFetchError，由调用方记为失败；没有新闻时返回0"""
+    news_list = get_stock_news(ticker, max_news=max_news, date=date, raise_on_failure=True)
+    return len(news_list)
+
+
+def run_backfill(tickers: List[str], start_date: str, end_date: str,
+                 max_news: int = 10, concurrency: int = 4,
+                 source_rates: Optional[dict] = None, max_attempts: int = 3,
+                 db_path: str = backfill_db_path) -> dict:
+    """
+    按股票池和日期区间回补历史新闻
+
+    Args:
+        tickers: 股票代码列表
+        start_date: 开始日期，格式 "YYYY-MM-DD"
+        end_date: 结束日期，格式 "YYYY-MM-DD"
+        max_news: 每个(ticker, date)获取的新闻数量
+        concurrency: 同时执行的任务数
+        source_rates: 各数据源每秒请求数限制，如 {"google": 0.2, "akshare": 1}
+        max_attempts: 单个任务最大尝试次数
+        db_path: 任务队列数据库路径
+
+    Returns:
+        各状态的任务数量统计
+    """
+    for source, rate in (source_rates or {}).items():
+        set_rate_limit(source, rate)
+
+    queue = BackfillQueue(db_path)
+    try:
+        added = queue.enqueue(tickers, backfill_dates(start_date, end_date))
+        resumed = queue.reset_interrupted()
+        retried = queue.retry_failed(max_attempts)
+        logger.info(f"新增任务 {added} 个，恢复中断任务 {resumed} 个，重试失败任务 {retried} 个")
+
+        running = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                # 补足并发槽位，日期新的任务优先
+                free = concurrency - len(running)
+                if free > 0:
+                    for ticker, d in queue.claim(free):
+                        future = executor.submit(_fetch_one, ticker, d, max_news)
+                        running[future] = (ticker, d)
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    ticker, d = running.pop(future)
+                    try:
+                        count = future.result()
+                        queue.mark_done(ticker, d, count)
+                        logger.info(f"完成 {ticker} {d}，新闻 {count} 条")
+                    except Exception as e:
+                        queue.mark_failed(ticker, d, str(e))
+                        logger.error(f"回补 {ticker} {d} 失败: {e}")
+
+        stats = queue.stats()
+        logger.info(f"回补结束: {stats}")
+        return stats
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="历史新闻回补")
+    parser.add_argument("--tickers", required=True, help="股票代码，逗号分隔")
+    parser.add_argument("--start", required=True, help="开始日期 YYYY-MM-DD")
+    parser.add_argument("--end", default=datetime.now().strftime("%Y-%m-%d"), help="结束日期 YYYY-MM-DD")
+    parser.add_argument("--max-news", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--google-rate", type=float, default=0.2, help="Google 每秒请求数")
+    parser.add_argument("--akshare-rate", type=float, default=1.0, help="akshare 每秒请求数")
+    parser.add_argument("--max-attempts", type=int, default=3)
+    args = parser.parse_args()
+
+    run_backfill(
+        tickers=[t.strip() for t in args.tickers.split(",") if t.strip()],
+        start_date=args.start,
+        end_date=args.end,
+        max_news=args.max_news,
+        concurrency=args.concurrency,
+        source_rates={"google": args.google_rate, "akshare": args.akshare_rate},
+        max_attempts=args.max_attempts,
+    )
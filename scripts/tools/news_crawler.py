@@ -2,6 +2,7 @@ import os
 import re
 import sys
 import json
+import hashlib
 from asyncio import timeout
 from datetime import datetime, timedelta
 import time
@@ -10,10 +11,11 @@ from urllib.parse import urlparse
 
 # 导入新的搜索模块
 try:
-    from cache.web_search import google_search_sync, SearchOptions
+    from web_search import google_search_sync, search_many_sync, SearchOptions
 except ImportError:
     print("警告: 无法导入新的搜索模块，将回退到 akshare")
     google_search_sync = None
+    search_many_sync = None
     SearchOptions = None
 
 # 保留 akshare 作为备用
@@ -25,6 +27,39 @@ except ImportError:
     print("警告: akshare 不可用")
     ak = None
 
+from rate_limiter import acquire
+
+class NewsFetchError(RuntimeError):
+    """所有新闻来源都获取失败（区别于正常返回但没有新闻）"""
+
+
+#新闻缓存根目录，按股票代码划分子目录
+NEWS_CACHE_DIR = os.path.join("cache", "news", "stock_news")
+
+#限定搜索的财经新闻站点
+NEWS_SITES=[
+    "site:sina.com.cn",
+    "site:163.com",
+    "site:eastmoney.com",
+    "site:cnstock.com",
+    "site:hexun.com"
+]
+
+def date_range_operators(date:str=None) -> str:
+    """截止日期前7天的 after:/before: 限制，日期为空或格式错误时返回空字符串"""
+    if not date:
+        return ""
+    try:
+        end_date=datetime.strptime(date,"%Y-%m-%d")
+    except ValueError:
+        print(f"日期格式错误: {date}，忽略时间限制")
+        return ""
+    start_date=end_date-timedelta(days=7)
+    return f"after:{start_date.strftime('%Y-%m-%d')} before:{end_date.strftime('%Y-%m-%d')}"
+
+def site_filter() -> str:
+    return f"({' OR '.join(NEWS_SITES)})"
+
 def build_search_query(ticker:str,date:str=None):
     """
     构建针对股票新闻的 Google 搜索查询
@@ -40,25 +75,51 @@ def build_search_query(ticker:str,date:str=None):
     base_query=f"{ticker} 股票 新闻 财经 股市"
 
     #如果有时间限制，要求指定日期之前
-    if date:
-        try:
-            end_date=datetime.strptime(date,"%Y-%m-%d")
-            start_date=end_date-timedelta(days=7)
-            base_query+=f"after:{start_date.strftime('%Y-%m-%d')} before {end_date.strftime('%Y-%m-%d')}"
-        except ValueError:
-            print(f"日期格式错误: {date}，忽略时间限制")
-
-    news_sites=[
-        "site:sina.com.cn",
-        "site:163.com",
-        "site:eastmoney.com",
-        "site:cnstock.com",
-        "site:hexun.com"
-    ]
-
-    query=f"{base_query} ({' OR '.join(news_sites)})"
+    date_operators=date_range_operators(date)
+    if date_operators:
+        base_query+=f" {date_operators}"
+
+    query=f"{base_query} {site_filter()}"
     return query
 
+def news_article_id(news_item:dict) -> str:
+    """根据新闻链接（无链接时用标题）生成稳定的文章ID"""
+    key=news_item.get("url") or news_item.get("title","")
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def iter_news_files(tickers=None):
+    """按股票代码和日期顺序遍历新闻缓存文件，返回(ticker, 文件路径)"""
+    if not os.path.isdir(NEWS_CACHE_DIR):
+        return
+    ticker_dirs=sorted(tickers) if tickers else sorted(os.listdir(NEWS_CACHE_DIR))
+    for ticker in ticker_dirs:
+        ticker_dir=os.path.join(NEWS_CACHE_DIR,ticker)
+        if not os.path.isdir(ticker_dir):
+            continue
+        for name in sorted(os.listdir(ticker_dir)):
+            if name.endswith(".json"):
+                yield ticker, os.path.join(ticker_dir,name)
+
+def iter_cached_news(tickers=None):
+    """
+    逐条遍历新闻缓存，一次只加载一个缓存文件
+
+    Args:
+        tickers: 股票代码列表，None表示全部
+
+    Returns:
+        生成器，产出(ticker, 新闻字典)
+    """
+    for ticker, path in iter_news_files(tickers):
+        try:
+            with open(path,"r",encoding="utf-8") as f:
+                data=json.load(f)
+        except Exception as e:
+            print(f"读取新闻缓存 {path} 失败: {e}")
+            continue
+        for news_item in data.get("news",[]):
+            yield ticker, news_item
+
 def extract_domain(url:str):
     try:
         parsed=urlparse(url)
@@ -125,13 +186,16 @@ def convert_search_results_to_news(search_results,ticker:str) :
         return news_list
 
 
-def get_stock_news_via_akshare(symbol: str, max_news: int = 10) -> list:
-    """使用 akshare 获取股票新闻的原始方法"""
+def get_stock_news_via_akshare(symbol: str, max_news: int = 10, raise_errors: bool = False) -> list:
+    """使用 akshare 获取股票新闻的原始方法，raise_errors 为 True 时获取出错抛出异常而不是返回空列表"""
     if ak is None:
+        if raise_errors:
+            raise NewsFetchError("akshare 不可用")
         return []
 
     try:
         # 获取新闻列表
+        acquire("akshare")
         news_df = ak.stock_news_em(symbol=symbol)
         if news_df is None or len(news_df) == 0:
             print(f"未获取到{symbol}的新闻数据")
@@ -188,28 +252,17 @@ def get_stock_news_via_akshare(symbol: str, max_news: int = 10) -> list:
 
     except Exception as e:
         print(f"akshare 获取新闻数据时出错: {e}")
+        if raise_errors:
+            raise
         return []
 
-def get_stock_news(ticker, max_news: int = 10, date: str = None) -> list:
-    max_news = min(max_news,100)
-
-    cache_date = date if date else datetime.now().strftime('%Y-%m-%d')
-
-    #新闻文件保存路径
-    news_dir=os.path.join("cache", "news", "stock_news",ticker)
-    print(f"新闻保存目录为：{news_dir}")
-
-    try:
-        os.makedirs(news_dir, exist_ok=True)
-        print(f"成功创建或确认目录存在: {news_dir}")
-    except Exception as e:
-        print(f"创建目录失败: {e}")
-        return []
-
-    news_file_path = os.path.join(news_dir, f"{ticker}_news_{cache_date}.json")
-    print(f"新闻文件保存路径为{news_file_path}")
+def read_news_cache(news_file_path: str, date: str = None):
+    """
+    读取新闻缓存文件
 
-    #检查缓存
+    Returns:
+        (缓存的新闻列表, 缓存是否有效)；当日的缓存仅在当日有效，历史日期的缓存始终有效
+    """
     cached_news = []
     cache_valid = False
 
@@ -229,18 +282,61 @@ def get_stock_news(ticker, max_news: int = 10, date: str = None) -> list:
                 with open(news_file_path, "r", encoding="utf-8") as f:
                     data=json.load(f)
                     cached_news=data.get("news",[])
-
-                    if len(cached_news) >= max_news:
-                        print( f"使用缓存的新闻数据: {news_file_path} (缓存数量: {len(cached_news)})")
-                        return cached_news[:max_news]
-                    else:
-                        print(f"缓存的新闻数量({len(cached_news)})不足，需要获取更多新闻")
             else:
                 print(f"缓存文件已过期，将重新获取新闻")
 
         except Exception as e:
             print(f"读取缓存文件失败{e}")
             cached_news=[]
+    return cached_news, cache_valid
+
+def news_cache_file(ticker, date: str = None) -> str:
+    """新闻缓存文件路径"""
+    cache_date = date if date else datetime.now().strftime('%Y-%m-%d')
+    return os.path.join(NEWS_CACHE_DIR, ticker, f"{ticker}_news_{cache_date}.json")
+
+def get_stock_news(ticker, max_news: int = 10, date: str = None, search_response=None,
+                   raise_on_failure: bool = False) -> list:
+    """
+    获取股票新闻，优先读取缓存，其次 Google 搜索，最后回退到 akshare
+
+    Args:
+        ticker: 股票代码
+        max_news: 新闻数量，最多100条
+        date: 截止日期，格式 "YYYY-MM-DD"，None表示当日
+        search_response: 预先获取的 Google 搜索结果（批量搜索时传入），提供时不再单独搜索
+        raise_on_failure: 为 True 时，没有获取到新闻且有来源出错则抛出 NewsFetchError，
+            不写缓存；为 False 时与来源均无新闻一样返回空列表
+
+    Returns:
+        新闻列表
+    """
+    max_news = min(max_news,100)
+
+    cache_date = date if date else datetime.now().strftime('%Y-%m-%d')
+
+    #新闻文件保存路径
+    news_dir=os.path.join(NEWS_CACHE_DIR,ticker)
+    print(f"新闻保存目录为：{news_dir}")
+
+    try:
+        os.makedirs(news_dir, exist_ok=True)
+        print(f"成功创建或确认目录存在: {news_dir}")
+    except Exception as e:
+        print(f"创建目录失败: {e}")
+        return []
+
+    news_file_path = news_cache_file(ticker, date)
+    print(f"新闻文件保存路径为{news_file_path}")
+
+    #检查缓存
+    cached_news, cache_valid = read_news_cache(news_file_path, date)
+    if cache_valid:
+        if len(cached_news) >= max_news:
+            print( f"使用缓存的新闻数据: {news_file_path} (缓存数量: {len(cached_news)})")
+            return cached_news[:max_news]
+        else:
+            print(f"缓存的新闻数量({len(cached_news)})不足，需要获取更多新闻")
     print(f"开始获取{ticker}的新闻")
 
     #计算需要新获取新闻的数量
@@ -249,6 +345,7 @@ def get_stock_news(ticker, max_news: int = 10, date: str = None) -> list:
 
     #优先使用google
     new_news_list=[]
+    fetch_errors=[]
     if google_search_sync and SearchOptions:
         try:
             print("使用Google搜索新闻")
@@ -262,9 +359,15 @@ def get_stock_news(ticker, max_news: int = 10, date: str = None) -> list:
                 locale="zh-CN",
             )
 
-            search_response=google_search_sync(search_query,search_options)
+            if search_response is None:
+                acquire("google")
+                search_response=google_search_sync(search_query,search_options)
 
-            if search_response.results:
+            if search_response.results and not any(result.link for result in search_response.results):
+                # 搜索失败时返回的占位结果没有链接
+                fetch_errors.append(f"google: {search_response.results[0].snippet}")
+                print("Google 搜索失败，尝试回退到 akshare")
+            elif search_response.results:
                 new_news_list=convert_search_results_to_news(search_response.results,ticker)
                 print(f"通过 Google 搜索成功获取到{len(new_news_list)}条新闻")
             else:
@@ -272,10 +375,18 @@ def get_stock_news(ticker, max_news: int = 10, date: str = None) -> list:
 
         except Exception as e:
             print(f"Google 搜索获取新闻时出错: {e}，回退到 akshare")
+            fetch_errors.append(f"google: {e}")
 
     if not new_news_list:
         print("使用akshare获取新闻……")
-        new_news_list = get_stock_news_via_akshare(ticker, fetch_count)
+        try:
+            new_news_list = get_stock_news_via_akshare(ticker, fetch_count, raise_errors=True)
+        except Exception as e:
+            fetch_errors.append(f"akshare: {e}")
+            new_news_list = []
+
+    if raise_on_failure and not new_news_list and fetch_errors:
+        raise NewsFetchError(f"{ticker} {cache_date} 获取新闻失败: {'; '.join(fetch_errors)}")
 
     if cached_news and new_news_list:
         exsting_titles= {news["title"] for news in cached_news}
@@ -311,9 +422,54 @@ def get_stock_news(ticker, max_news: int = 10, date: str = None) -> list:
             with open(news_file_path, "w", encoding="utf-8") as f:
                 json.dump(data_to_save, f, ensure_ascii=False, indent=2)
             print(f"成功保存{len(combined_news)}条新闻到文件: {news_file_path}")
+            try:
+                from mention_index import index_news_on_insert
+                index_news_on_insert(ticker, combined_news)
+            except Exception as e:
+                print(f"更新新闻提及索引失败：{e}")
         except Exception as e:
             print(f"保存新闻至文件出错：{e}")
     return final_news_list
 
-ticker="000300"
-get_stock_news(ticker, max_news=10, date=None)
\ No newline at end of file
+def get_stock_news_batch(tickers, max_news: int = 10, date: str = None, concurrency: int = 4,
+                         pack_queries: bool = True) -> dict:
+    """
+    批量获取多只股票的新闻，缓存不足的股票并发执行 Google 搜索
+
+    Args:
+        tickers: 股票代码列表
+        max_news: 每只股票的新闻数量
+        date: 截止日期，格式 "YYYY-MM-DD"
+        concurrency: 同时进行的搜索数
+        pack_queries: 是否把多只股票合并为一个 OR 查询，再按代码/简称把结果分回各股票
+
+    Returns:
+        {股票代码: 新闻列表}
+    """
+    max_news = min(max_news,100)
+    pending=[]
+    for ticker in tickers:
+        cached_news, cache_valid = read_news_cache(news_cache_file(ticker, date), date)
+        if not (cache_valid and len(cached_news) >= max_news):
+            pending.append(ticker)
+
+    responses={}
+    if len(pending) > 1 and pack_queries and search_many_sync and SearchOptions:
+        from query_planner import search_packed
+        responses=search_packed(pending, max_news, date, concurrency=concurrency)
+    elif pending and search_many_sync and SearchOptions:
+        queries={build_search_query(ticker,date): ticker for ticker in pending}
+        search_options=SearchOptions(limit=max_news*2, timeout=30000, locale="zh-CN")
+        print(f"并发搜索{len(queries)}只股票的新闻")
+        for response in search_many_sync(list(queries), search_options, concurrency=concurrency):
+            # 搜索失败的结果没有链接，交给 get_stock_news 回退到 akshare
+            if not any(result.link for result in response.results):
+                response.results=[]
+            responses[queries[response.query]]=response
+
+    return {ticker: get_stock_news(ticker, max_news, date, search_response=responses.get(ticker))
+            for ticker in tickers}
+
+if __name__ == "__main__":
+    ticker="000300"
+    get_stock_news(ticker, max_news=10, date=None)
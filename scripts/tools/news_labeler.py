@@ -0,0 +1,145 @@
+import os
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence
+
+import pandas as pd
+
+from scripts.logging_config import setup_logger
+from news_crawler import iter_cached_news, news_article_id
+from financial_data import get_price_history
+
+logger = setup_logger("news_labeler")
+
+news_labels_path = os.path.join("cache", "news", "news_labels.csv")
+
+#A股收盘时间，收盘后发布的新闻计入下一个交易日
+MARKET_CLOSE_HOUR = 15
+
+
+def load_news_frame(tickers: Optional[List[str]] = None) -> pd.DataFrame:
+    """将新闻缓存整理为DataFrame，丢弃没有发布时间的新闻"""
+    rows = [
+        {
+            "article_id": news_article_id(item),
+            "ticker": ticker,
+            "title": item.get("title", ""),
+            "publish_time": item.get("publish_time"),
+        }
+        for ticker, item in iter_cached_news(tickers)
+    ]
+    df = pd.DataFrame(rows, columns=["article_id", "ticker", "title", "publish_time"])
+    df["publish_time"] = pd.to_datetime(df["publish_time"], errors="coerce")
+    df = df.dropna(subset=["publish_time"])
+    return df.drop_duplicates(subset=["article_id", "ticker"]).reset_index(drop=True)
+
+
+def effective_dates(publish_times: pd.Series, close_hour: int = MARKET_CLOSE_HOUR) -> pd.Series:
+    """
+    新闻影响的最早自然日：收盘前发布为当天，收盘后发布为次日
+
+    只有日期的发布时间（00:00:00）视为收盘前发布。
+    """
+    day = publish_times.dt.normalize()
+    after_close = publish_times >= day + pd.Timedelta(hours=close_hour)
+    return day + pd.to_timedelta(after_close.astype(int), unit="D")
+
+
+def forward_return_frame(price_frames: Dict[str, pd.DataFrame],
+                         horizons: Sequence[int] = (1, 5, 20)) -> pd.DataFrame:
+    """
+    计算每个交易日的前向收益
+
+    以该交易日（T）的收盘价为基准，fwd_ret_h = close(T+h) / close(T) - 1。
+    新闻对应的 T 是发布时间之后第一个收盘的交易日（见 effective_dates），基准价格晚于发布时间，
+    标签不包含新闻发布前、当天已经发生的价格变动。
+    """
+    frames = []
+    for ticker, df in price_frames.items():
+        if df is None or df.empty:
+            continue
+        frames.append(pd.DataFrame({
+            "ticker": ticker,
+            "session_date": pd.to_datetime(df["date"]),
+            "close": df["close"].astype(float),
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["ticker", "session_date"] + [f"fwd_ret_{h}" for h in horizons])
+
+    prices = pd.concat(frames, ignore_index=True).sort_values(["ticker", "session_date"])
+    grouped = prices.groupby("ticker", sort=False)["close"]
+    for h in horizons:
+        prices[f"fwd_ret_{h}"] = grouped.shift(-h) / prices["close"] - 1
+    return prices.drop(columns=["close"])
+
+
+def fetch_price_frames(news_df: pd.DataFrame, max_horizon: int = 20) -> Dict[str, pd.DataFrame]:
+    """按新闻覆盖的时间范围，为每只股票获取一次价格历史"""
+    price_frames = {}
+    bounds = news_df.groupby("ticker")["publish_time"].agg(["min", "max"])
+    for ticker, row in bounds.iterrows():
+        start = (row["min"] - timedelta(days=10)).strftime("%Y-%m-%d")
+        # 交易日约为自然日的2/3，多取一些保证覆盖最长持有期
+        end = (row["max"] + timedelta(days=max_horizon * 2 + 10)).strftime("%Y-%m-%d")
+        price_frames[ticker] = get_price_history(ticker, start, end)
+    return price_frames
+
+
+def label_news(news_df: Optional[pd.DataFrame] = None,
+               price_frames: Optional[Dict[str, pd.DataFrame]] = None,
+               horizons: Sequence[int] = (1, 5, 20),
+               tickers: Optional[List[str]] = None,
+               save_path: Optional[str] = news_labels_path) -> pd.DataFrame:
+    """
+    为新闻标注前向收益
+
+    Args:
+        news_df: 新闻DataFrame，需包含 article_id、ticker、publish_time，默认从新闻缓存读取
+        price_frames: {股票代码: get_price_history返回的DataFrame}，默认自动获取
+        horizons: 持有期（交易日）
+        tickers: 股票代码列表，仅在自动读取新闻时使用
+        save_path: 结果保存路径，None表示不保存
+
+    Returns:
+        每条新闻一行，包含 session_date（发布时间之后第一个收盘的交易日T）
+        及各持有期收益 fwd_ret_h = close(T+h) / close(T) - 1
+    """
+    if news_df is None:
+        news_df = load_news_frame(tickers)
+    if news_df.empty:
+        logger.warning("没有可标注的新闻")
+        return news_df
+
+    news = news_df.copy()
+    news["publish_time"] = pd.to_datetime(news["publish_time"], errors="coerce")
+    news = news.dropna(subset=["publish_time"])
+    news["effective_date"] = effective_dates(news["publish_time"])
+
+    if price_frames is None:
+        price_frames = fetch_price_frames(news, max(horizons))
+    returns = forward_return_frame(price_frames, horizons)
+
+    # 按生效日期向后做as-of合并：非交易日和收盘后的新闻自动落到下一个交易日
+    news = news.sort_values("effective_date")
+    returns = returns.sort_values("session_date")
+    labeled = pd.merge_asof(
+        news, returns,
+        left_on="effective_date", right_on="session_date",
+        by="ticker", direction="forward",
+    )
+    labeled = labeled.drop(columns=["effective_date"]).sort_values(
+        ["ticker", "publish_time"]).reset_index(drop=True)
+
+    unmatched = labeled["session_date"].isna().sum()
+    if unmatched:
+        logger.warning(f"{unmatched} 条新闻之后没有可用的交易日价格数据")
+    logger.info(f"完成 {len(labeled)} 条新闻的收益标注")
+
+    if save_path:
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        labeled.to_csv(save_path, index=False)
+        logger.info(f"标注结果已保存到 {save_path}")
+    return labeled
+
+
+if __name__ == "__main__":
+    label_news()
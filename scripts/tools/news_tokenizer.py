@@ -0,0 +1,180 @@
+import os
+import glob
+import json
+import sqlite3
+import shutil
+import hashlib
+from multiprocessing import Pool
+from typing import Iterable, List, Optional
+
+try:
+    import jieba
+except ImportError:
+    raise ImportError("请安装 jieba: pip install jieba")
+
+from scripts.logging_config import setup_logger
+from news_crawler import iter_cached_news, news_article_id
+from shard_writer import ShardWriter
+
+logger = setup_logger("news_tokenizer")
+
+token_cache_path = os.path.join("cache", "news", "token_cache.db")
+token_output_dir = os.path.join("cache", "news", "tokens")
+
+
+def content_hash(title: str, content: str) -> str:
+    """标题与正文的内容哈希，内容不变则哈希不变"""
+    return hashlib.sha256(f"{title}\x00{content}".encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """按内容哈希缓存分词结果（SQLite）"""
+
+    def __init__(self, db_path: str = token_cache_path):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS tokens (
+                content_hash TEXT PRIMARY KEY,
+                title_tokens TEXT NOT NULL,
+                content_tokens TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def get_many(self, hashes: List[str]) -> dict:
+        result = {}
+        # SQLite 单条语句的参数个数有限制，分批查询
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT content_hash, title_tokens, content_tokens FROM tokens "
+                f"WHERE content_hash IN ({','.join('?' * len(chunk))})", chunk).fetchall()
+            for h, title_tokens, content_tokens in rows:
+                result[h] = (json.loads(title_tokens), json.loads(content_tokens))
+        return result
+
+    def put_many(self, items: Iterable[tuple]):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tokens(content_hash, title_tokens, content_tokens) VALUES (?, ?, ?)",
+            ((h, json.dumps(t, ensure_ascii=False), json.dumps(c, ensure_ascii=False))
+             for h, t, c in items))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def _init_worker(user_dict: Optional[str]):
+    if user_dict:
+        jieba.load_userdict(user_dict)
+    jieba.initialize()
+
+
+def _segment(job: tuple) -> tuple:
+    h, title, content = job
+    title_tokens = [w for w in jieba.lcut(title) if w.strip()]
+    content_tokens = [w for w in jieba.lcut(content) if w.strip()]
+    return h, title_tokens, content_tokens
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _swap_in_shards(staging_dir: str, output_dir: str, shards: List[dict]):
+    """把暂存目录中的新分片移入输出目录，再删除上一次运行留下的多余分片"""
+    os.makedirs(output_dir, exist_ok=True)
+    for shard in shards:
+        os.replace(os.path.join(staging_dir, shard["file"]), os.path.join(output_dir, shard["file"]))
+    current = {shard["file"] for shard in shards}
+    for path in glob.glob(os.path.join(output_dir, "tokens-*.jsonl*")):
+        if os.path.basename(path) not in current:
+            os.remove(path)
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def tokenize_news(tickers: Optional[List[str]] = None, workers: Optional[int] = None,
+                  shard_size: int = 10000, batch_size: int = 2000,
+                  output_dir: str = token_output_dir, cache_path: str = token_cache_path,
+                  user_dict: Optional[str] = None) -> List[dict]:
+    """
+    对新闻缓存中的标题和正文进行中文分词，结果按分片写入磁盘
+
+    分片先写入 {output_dir}.staging 暂存目录，全部完成后才替换输出目录中的旧分片，
+    中途失败时上一次的输出保持不变。
+
+    Args:
+        tickers: 股票代码列表，None表示全部
+        workers: 分词进程数，默认CPU核数
+        shard_size: 每个输出分片的记录数
+        batch_size: 每批送入进程池的文章数
+        output_dir: 分片输出目录
+        cache_path: 分词缓存数据库路径
+        user_dict: jieba 自定义词典路径
+
+    Returns:
+        分片列表，每项包含文件名与记录数
+    """
+    # 清理上一次中断时留下的暂存分片
+    staging_dir = os.path.normpath(output_dir) + ".staging"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    workers = workers or os.cpu_count() or 1
+    cache = TokenCache(cache_path)
+    writer = ShardWriter(staging_dir, prefix="tokens", max_records=shard_size)
+    cached_hits = 0
+    segmented = 0
+    try:
+        with Pool(processes=workers, initializer=_init_worker, initargs=(user_dict,)) as pool:
+            for batch in _batched(iter_cached_news(tickers), batch_size):
+                records = []
+                for ticker, item in batch:
+                    title = item.get("title", "")
+                    content = item.get("content", "")
+                    records.append((ticker, item, content_hash(title, content), title, content))
+
+                known = cache.get_many(list({r[2] for r in records}))
+                cached_hits += sum(1 for r in records if r[2] in known)
+
+                # 同一批内重复的文章只分词一次
+                jobs = {}
+                for _, _, h, title, content in records:
+                    if h not in known and h not in jobs:
+                        jobs[h] = (h, title, content)
+                if jobs:
+                    results = pool.map(_segment, jobs.values(),
+                                       chunksize=max(1, len(jobs) // (workers * 4)))
+                    cache.put_many(results)
+                    segmented += len(results)
+                    for h, title_tokens, content_tokens in results:
+                        known[h] = (title_tokens, content_tokens)
+
+                for ticker, item, h, _, _ in records:
+                    title_tokens, content_tokens = known[h]
+                    writer.write({
+                        "article_id": news_article_id(item),
+                        "ticker": ticker,
+                        "publish_time": item.get("publish_time"),
+                        "content_hash": h,
+                        "title_tokens": title_tokens,
+                        "content_tokens": content_tokens,
+                    })
+    finally:
+        shards = writer.close()
+        cache.close()
+    _swap_in_shards(staging_dir, output_dir, shards)
+
+    logger.info(f"分词完成：新分词 {segmented} 篇，命中缓存 {cached_hits} 篇，输出分片 {len(shards)} 个")
+    return shards
+
+
+if __name__ == "__main__":
+    tokenize_news()
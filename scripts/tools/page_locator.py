@@ -0,0 +1,206 @@
+import os
+import json
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from scripts.logging_config import setup_logger
+from trading_calendar import get_trading_calendar
+
+logger = setup_logger("page_locator")
+
+page_bounds_path = os.path.join("cache", "news", "eastmoney_breakfast", "page_bounds.json")
+
+ITEMS_PER_PAGE = 20
+MAX_PROBES = 8
+#单页抓取失败时的重试次数
+FETCH_RETRIES = 1
+
+#定位结果：找到；确认没有；有页面抓取失败；抓取次数用完仍未确认
+FOUND = "found"
+MISSING = "missing"
+FAILED = "failed"
+UNKNOWN = "unknown"
+
+
+class PageLocator:
+    """
+    根据已抓取列表页的日期范围，估算某日财经早餐所在的列表页
+
+    列表页第1页最新，某日所在页由“比它新的文章数”（rank）决定：页码 = rank // 20 + 1。
+    每抓取一页，就把该页最新、最旧日期及其 rank 记入 page_bounds.json，同时记下当时
+    索引中最新的日期（head）。之后有新文章发布时，用索引中 head 之后新增的日期数平移
+    旧记录的 rank，因此记录长期有效。
+
+    估算时在相邻两个已知日期之间按交易日数线性插值，没有已知日期时按距最新日期的交易日数推算；
+    抓取结果不含目标日期时缩小页码区间，再用新记录重新估算，直到找到或区间为空。
+    页面能取到但没有列表项时视为超出最后一页；抓取失败时重试，仍失败则放弃定位，不缩小区间。
+
+    Args:
+        index: BreakfastIndex，用于确定最新日期和新增文章数
+        path: 页码日期范围缓存路径
+    """
+
+    def __init__(self, index, path: str = page_bounds_path):
+        self.index = index
+        self.path = path
+        self.pages: Dict[str, dict] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.pages = json.load(f).get("pages", {})
+            except Exception as e:
+                logger.warning(f"读取 {path} 失败: {e}")
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"updated_at": datetime.now().isoformat(), "pages": self.pages},
+                      f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _published_between(self, after: date, until: date) -> int:
+        """索引中 (after, until] 内有财经早餐的日期数"""
+        after_iso, until_iso = after.isoformat(), until.isoformat()
+        return sum(1 for d, entry in self.index.entries.items()
+                   if after_iso < d <= until_iso and entry.get("page_url"))
+
+    def anchors(self, head: date) -> List[Tuple[date, int]]:
+        """已知日期及其相对当前 head 的 rank，按日期从新到旧排列"""
+        points = {head: 0}
+        for page, bounds in self.pages.items():
+            shift = self._published_between(date.fromisoformat(bounds["head"]), head)
+            first_rank = (int(page) - 1) * ITEMS_PER_PAGE + shift
+            points[date.fromisoformat(bounds["newest"])] = first_rank
+            points[date.fromisoformat(bounds["oldest"])] = first_rank + bounds["count"] - 1
+        return sorted(points.items(), reverse=True)
+
+    def estimate_rank(self, day: date, head: date) -> int:
+        """估算比 day 更新的文章数"""
+        if day >= head:
+            return 0
+        calendar = get_trading_calendar()
+
+        def gap(older: date, newer: date) -> int:
+            return max(calendar.count_sessions(older, newer) - 1, 0)
+
+        newer = older = None
+        for anchor_date, rank in self.anchors(head):
+            if anchor_date >= day:
+                newer = (anchor_date, rank)
+            elif older is None:
+                older = (anchor_date, rank)
+        if newer[0] == day:
+            return newer[1]
+        if older is None:
+            return newer[1] + gap(day, newer[0])
+        span = gap(older[0], newer[0])
+        if span == 0:
+            return newer[1]
+        return round(newer[1] + (older[1] - newer[1]) * gap(day, newer[0]) / span)
+
+    def estimate_page(self, day: date, head: date) -> int:
+        return self.estimate_rank(day, head) // ITEMS_PER_PAGE + 1
+
+    def record(self, page: int, dates: List[date]):
+        """记录一页的日期范围；head 取合并该页后索引中的最新日期"""
+        self.pages[str(page)] = {
+            "newest": max(dates).isoformat(),
+            "oldest": min(dates).isoformat(),
+            "count": len(dates),
+            "head": self.index.newest_date().isoformat(),
+            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+    def _fetch_page(self, page: int, retries: int = FETCH_RETRIES) -> Optional[Dict[str, str]]:
+        """抓取并解析第 page 页；页面为空（超出最后一页）时返回空字典，抓取失败时返回None"""
+        from eastmoney_breakfast import em_list_page_url
+        from get_em_listpage_url import fetch_listpages_tiered, parse_mapping
+
+        url = em_list_page_url(page)
+        for attempt in range(retries + 1):
+            try:
+                html = fetch_listpages_tiered([url]).get(url)
+            except Exception as e:
+                logger.warning(f"抓取第 {page} 页失败: {e}")
+                html = None
+            if html is not None:
+                return parse_mapping(html)
+            logger.warning(f"第 {page} 页抓取失败（第 {attempt + 1} 次）")
+        return None
+
+    @staticmethod
+    def _confirms_missing(day: date, ranges: Dict[int, Optional[Tuple[date, date]]]) -> bool:
+        """
+        已抓取的页面能否证明 day 没有财经早餐
+
+        day 落在某一页的日期范围内，或落在相邻两页之间（后一页为空时即早于最后一页）才算确认。
+
+        Args:
+            ranges: {页码: (最旧日期, 最新日期)}，超出最后一页的空页为None
+        """
+        for page, bounds in ranges.items():
+            if bounds is None:
+                continue
+            oldest, newest = bounds
+            if oldest <= day <= newest:
+                return True
+            if day < oldest and page + 1 in ranges:
+                following = ranges[page + 1]
+                if following is None or following[1] < day:
+                    return True
+        return False
+
+    def locate(self, day: date, max_probes: int = MAX_PROBES) -> Tuple[Dict[str, str], str]:
+        """
+        抓取可能包含 day 的列表页，直到找到该日或确认该日不在任何页中
+
+        抓取到的日期都会合并到索引（调用方负责保存索引，状态为 FAILED 时不应保存）。
+
+        Returns:
+            (所有抓取页的 {"YYYY年MM月DD日": 链接}, 定位结果)，定位结果为 FOUND、MISSING、FAILED 或 UNKNOWN；
+            只有 MISSING 表示已确认该日没有财经早餐
+        """
+        from eastmoney_breakfast import parse_cn_date
+
+        target = day.strftime("%Y年%m月%d日")
+        date_and_urls: Dict[str, str] = {}
+        ranges: Dict[int, Optional[Tuple[date, date]]] = {}
+        low, high = 1, None
+        for probe in range(max_probes):
+            if high is not None and low > high:
+                break
+            head = self.index.newest_date()
+            page = self.estimate_page(day, head) if head else 1
+            page = max(page, low) if high is None else min(max(page, low), high)
+
+            mapping = self._fetch_page(page)
+            if mapping is None:
+                # 抓取失败不能说明该页不存在，放弃定位而不缩小区间
+                logger.error(f"定位 {day} 时第 {page} 页抓取失败，停止定位")
+                return date_and_urls, FAILED
+            logger.info(f"第 {probe + 1} 次定位 {day}：抓取第 {page} 页，解析到 {len(mapping)} 条")
+            if not mapping:
+                # 页面没有列表项，已超出最后一页，缩小上界
+                ranges[page] = None
+                high = page - 1
+                if page == 1:
+                    break
+                continue
+            date_and_urls.update(mapping)
+            self.index.merge(mapping)
+            dates = [parse_cn_date(d) for d in mapping]
+            ranges[page] = (min(dates), max(dates))
+            self.record(page, dates)
+            self.save()
+
+            if day > max(dates):
+                high = page - 1
+            elif day < min(dates):
+                low = page + 1
+            else:
+                break
+
+        if target in date_and_urls:
+            return date_and_urls, FOUND
+        return date_and_urls, MISSING if self._confirms_missing(day, ranges) else UNKNOWN
@@ -0,0 +1,160 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from scripts.logging_config import setup_logger
+from news_crawler import build_search_query, date_range_operators, site_filter
+from mention_index import MentionMatcher, load_stock_universe, normalize_name
+from web_search import SearchOptions, SearchResponse, search_many_sync
+
+logger = setup_logger("query_planner")
+
+#Google 查询最多计入32个词（OR、site: 等运算符也计入），总长度不超过2048个字符
+MAX_QUERY_WORDS = 32
+MAX_QUERY_CHARS = 2048
+MAX_TICKERS_PER_QUERY = 8
+PACKED_KEYWORDS = "股票 新闻"
+
+
+@dataclass
+class PackedQuery:
+    """合并了多只股票的一个搜索查询"""
+    query: str
+    tickers: List[str]
+
+
+def load_stock_names() -> Dict[str, str]:
+    """股票代码 -> 简称，代码表不可用时返回空字典（只按代码匹配）"""
+    try:
+        return dict(load_stock_universe())
+    except Exception as e:
+        logger.warning(f"加载A股代码表失败，只按代码匹配: {e}")
+        return {}
+
+
+def ticker_terms(ticker: str, names: Dict[str, str], use_names: bool = True) -> List[str]:
+    """股票在 OR 查询中的检索词：代码，以及加引号的简称（避免 *ST 中的 * 被当作通配符）"""
+    terms = [ticker]
+    name = normalize_name(names.get(ticker, ""))
+    if use_names and name:
+        terms.append(f'"{name}"')
+    return terms
+
+
+def build_packed_query(terms: List[str], date: str = None) -> str:
+    parts = [f"({' OR '.join(terms)})", PACKED_KEYWORDS, date_range_operators(date), site_filter()]
+    return " ".join(p for p in parts if p)
+
+
+def pack_tickers(tickers: List[str], date: str = None, names: Optional[Dict[str, str]] = None,
+                 use_names: bool = True, max_words: int = MAX_QUERY_WORDS, max_chars: int = MAX_QUERY_CHARS,
+                 max_tickers: int = MAX_TICKERS_PER_QUERY) -> List[PackedQuery]:
+    """
+    按 Google 的查询词数和长度限制，把股票依次装入尽量少的 OR 查询
+
+    Args:
+        tickers: 股票代码列表
+        date: 截止日期，格式 "YYYY-MM-DD"
+        names: 股票代码 -> 简称
+        use_names: 是否同时检索简称
+        max_words: 单个查询的最大词数
+        max_chars: 单个查询的最大字符数
+        max_tickers: 单个查询最多包含的股票数
+
+    Returns:
+        查询计划列表
+    """
+    names = names or {}
+    plans: List[PackedQuery] = []
+    group: List[str] = []
+    terms: List[str] = []
+    for ticker in dict.fromkeys(tickers):
+        new_terms = terms + ticker_terms(ticker, names, use_names)
+        query = build_packed_query(new_terms, date)
+        if group and (len(group) >= max_tickers or len(query.split()) > max_words or len(query) > max_chars):
+            plans.append(PackedQuery(build_packed_query(terms, date), group))
+            group, new_terms = [], ticker_terms(ticker, names, use_names)
+        group.append(ticker)
+        terms = new_terms
+    if group:
+        plans.append(PackedQuery(build_packed_query(terms, date), group))
+    return plans
+
+
+def demultiplex(results, tickers: List[str], names: Dict[str, str], quota: Optional[int] = None) -> Dict[str, list]:
+    """
+    按标题和摘要中出现的代码或简称，把合并查询的结果分回各股票
+
+    同时提到多只股票的结果分给每一只；没有提到任何一只的结果被丢弃。
+
+    Args:
+        results: SearchResult 列表
+        tickers: 该查询包含的股票
+        names: 股票代码 -> 简称
+        quota: 每只股票最多保留的结果数
+
+    Returns:
+        {股票代码: SearchResult 列表}
+    """
+    matcher = MentionMatcher([(t, names.get(t, "")) for t in tickers])
+    assigned: Dict[str, list] = {t: [] for t in tickers}
+    for result in results:
+        if not result.link:
+            continue
+        for ticker in matcher.match(f"{result.title}\n{result.snippet}"):
+            if quota is None or len(assigned[ticker]) < quota:
+                assigned[ticker].append(result)
+    return assigned
+
+
+def search_packed(tickers: List[str], max_news: int = 10, date: str = None, concurrency: int = 4,
+                  min_results: Optional[int] = None, names: Optional[Dict[str, str]] = None) -> Dict[str, SearchResponse]:
+    """
+    用合并查询批量搜索多只股票的新闻
+
+    先按查询计划并发执行合并查询并分配结果，分到的结果少于 min_results 的股票
+    再单独补充搜索一次。
+
+    Args:
+        tickers: 股票代码列表
+        max_news: 每只股票的新闻数量，每只股票最多保留 2*max_news 条搜索结果
+        date: 截止日期，格式 "YYYY-MM-DD"
+        concurrency: 同时进行的搜索数
+        min_results: 低于该数量时补充搜索，默认 max_news 的一半
+        names: 股票代码 -> 简称，默认读取本地A股代码表
+
+    Returns:
+        {股票代码: SearchResponse}，可直接传给 get_stock_news 的 search_response
+    """
+    quota = max_news * 2
+    min_results = max(1, max_news // 2) if min_results is None else min_results
+    names = load_stock_names() if names is None else names
+
+    plans = pack_tickers(tickers, date, names)
+    plan_by_query = {plan.query: plan for plan in plans}
+    largest_group = max(len(plan.tickers) for plan in plans)
+    packed_options = SearchOptions(limit=min(quota * largest_group, 100), timeout=30000, locale="zh-CN")
+
+    assigned: Dict[str, list] = {t: [] for t in tickers}
+    queries_used: Dict[str, str] = {}
+    logger.info(f"{len(tickers)} 只股票合并为 {len(plans)} 个查询")
+    for response in search_many_sync(list(plan_by_query), packed_options, concurrency=concurrency):
+        plan = plan_by_query[response.query]
+        for ticker, results in demultiplex(response.results, plan.tickers, names, quota).items():
+            assigned[ticker].extend(results)
+            queries_used[ticker] = plan.query
+
+    followups = {build_search_query(t, date): t for t in tickers if len(assigned[t]) < min_results}
+    if followups:
+        logger.info(f"{len(followups)} 只股票结果不足 {min_results} 条，单独补充搜索")
+        single_options = SearchOptions(limit=quota, timeout=30000, locale="zh-CN")
+        for response in search_many_sync(list(followups), single_options, concurrency=concurrency):
+            ticker = followups[response.query]
+            seen_links = {r.link for r in assigned[ticker]}
+            for result in response.results:
+                if result.link and result.link not in seen_links and len(assigned[ticker]) < quota:
+                    seen_links.add(result.link)
+                    assigned[ticker].append(result)
+            queries_used[ticker] = response.query
+
+    logger.info(f"{len(tickers)} 只股票共执行 {len(plans) + len(followups)} 次搜索")
+    return {t: SearchResponse(query=queries_used.get(t, ""), results=assigned[t]) for t in tickers}
@@ -0,0 +1,80 @@
+import time
+import asyncio
+import threading
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限速器
+
+    Args:
+        rate: 每秒补充的令牌数（即平均请求速率）
+        capacity: 桶容量（允许的突发请求数），默认与rate相同且不小于1
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError(f"rate 必须大于0: {rate}")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        阻塞直到取得令牌
+
+        Returns:
+            本次等待的秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+            waited += wait_time
+
+
+#按来源（数据源名称或主机名）注册的限速器
+_limiters: Dict[str, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def set_rate_limit(key: str, rate: Optional[float], capacity: Optional[float] = None):
+    """为指定来源设置限速，rate为None或0时取消限速"""
+    with _registry_lock:
+        if not rate:
+            _limiters.pop(key, None)
+        else:
+            _limiters[key] = TokenBucket(rate, capacity)
+
+
+def get_limiter(key: str) -> Optional[TokenBucket]:
+    with _registry_lock:
+        return _limiters.get(key)
+
+
+def acquire(key: str, tokens: float = 1.0) -> float:
+    """按来源取令牌，未设置限速的来源直接放行"""
+    limiter = get_limiter(key)
+    if limiter is None:
+        return 0.0
+    return limiter.acquire(tokens)
+
+
+async def acquire_async(key: str, tokens: float = 1.0) -> float:
+    """协程中使用的 acquire：在线程池中等待令牌，不阻塞事件循环"""
+    if get_limiter(key) is None:
+        return 0.0
+    return await asyncio.get_running_loop().run_in_executor(None, acquire, key, tokens)
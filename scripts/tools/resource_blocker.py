@@ -0,0 +1,96 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+
+#快速模式默认拦截的资源类型（只解析DOM文本和链接，不需要这些资源）
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+#常见统计、广告与跟踪域名，匹配自身及其子域名
+BLOCKED_HOSTS = frozenset({
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "doubleclick.net",
+    "adservice.google.com",
+    "hm.baidu.com",
+    "cnzz.com",
+    "umeng.com",
+    "mediav.com",
+    "tanx.com",
+    "cpro.baidustatic.com",
+})
+
+#被拦截请求拿不到真实大小，按资源类型的典型大小估算节省的流量
+ESTIMATED_BYTES = {
+    "image": 40 * 1024,
+    "media": 500 * 1024,
+    "font": 50 * 1024,
+    "stylesheet": 30 * 1024,
+    "script": 60 * 1024,
+}
+DEFAULT_ESTIMATED_BYTES = 10 * 1024
+
+
+@dataclass
+class BlockStats:
+    """单个页面的拦截统计"""
+    blocked_requests: int = 0
+    allowed_requests: int = 0
+    bytes_saved: int = 0   # 估算值
+    by_type: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, resource_type: str, blocked: bool):
+        if not blocked:
+            self.allowed_requests += 1
+            return
+        self.blocked_requests += 1
+        self.bytes_saved += ESTIMATED_BYTES.get(resource_type, DEFAULT_ESTIMATED_BYTES)
+        self.by_type[resource_type] = self.by_type.get(resource_type, 0) + 1
+
+    def summary(self) -> str:
+        return (f"拦截 {self.blocked_requests} 个请求（{self.by_type}），"
+                f"放行 {self.allowed_requests} 个，约节省 {self.bytes_saved / 1024:.0f}KB")
+
+
+def host_blocked(host: str, hosts: Iterable[str]) -> bool:
+    host = (host or "").lower()
+    return any(host == h or host.endswith("." + h) for h in hosts)
+
+
+def should_block(url: str, resource_type: str,
+                 resource_types: Iterable[str] = BLOCKED_RESOURCE_TYPES,
+                 hosts: Iterable[str] = BLOCKED_HOSTS) -> bool:
+    """判断请求是否应被拦截：主文档始终放行"""
+    if resource_type == "document":
+        return False
+    if resource_type in resource_types:
+        return True
+    return host_blocked(urlparse(url).hostname, hosts)
+
+
+async def install_async(page, resource_types: Optional[Iterable[str]] = None,
+                        hosts: Optional[Iterable[str]] = None) -> BlockStats:
+    """
+    为 async API 的页面安装请求拦截
+
+    未拦截的请求调用 route.fallback()，交给后注册的其它路由处理器继续处理。
+
+    Returns:
+        该页面的拦截统计，随页面加载实时更新
+    """
+    resource_types = frozenset(resource_types) if resource_types is not None else BLOCKED_RESOURCE_TYPES
+    hosts = frozenset(hosts) if hosts is not None else BLOCKED_HOSTS
+    stats = BlockStats()
+
+    async def handler(route):
+        request = route.request
+        blocked = should_block(request.url, request.resource_type, resource_types, hosts)
+        stats.record(request.resource_type, blocked)
+        if blocked:
+            await route.abort()
+        else:
+            await route.fallback()
+
+    await page.route("**/*", handler)
+    return stats
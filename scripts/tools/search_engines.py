@@ -0,0 +1,423 @@
+import os
+import json
+import asyncio
+import logging
+import re
+import datetime
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from web_search import (
+    EXTRACT_RESULTS_JS, GOOGLE_DOMAINS, RESULTS_CONTAINER_SELECTOR, SORRY_PATTERNS,
+    BrowserPool, SearchBlockedError, SearchCache, SearchOptions, SearchResponse, SearchResult,
+    build_results_url, close_browser_pools, failed_response, get_browser_pool,
+    split_date_operators,
+)
+from resource_blocker import install_async as install_resource_blocker
+from async_runner import get_background_loop
+
+logger = logging.getLogger(__name__)
+
+ENGINE_STATS_PATH = os.path.join("cache", "search", "engine_stats.json")
+
+# 跳转页正文中的目标地址（部分跳转以200页面加脚本/meta刷新的方式返回）
+REDIRECT_BODY_PATTERN = re.compile(r"""(?:location\.replace\(|URL=)["']?(https?://[^"')]+)""")
+
+# 按选择器提取结果的通用脚本，参数为 [最大结果数, {item, title, link, snippet, landingAttrs}]
+# landingAttrs 中的属性（在条目或其子元素上）带有真实落地页地址时，优先于链接的 href
+SELECTOR_EXTRACT_JS = """
+([maxResults, profile]) => {
+    const results = [];
+    const seenUrls = new Set();
+    for (const item of document.querySelectorAll(profile.item)) {
+        if (results.length >= maxResults) break;
+        const titleElement = item.querySelector(profile.title);
+        const linkElement = item.querySelector(profile.link);
+        if (!titleElement || !linkElement) continue;
+        let link = linkElement.href;
+        for (const attr of profile.landingAttrs || []) {
+            const holder = item.hasAttribute(attr) ? item : item.querySelector(`[${attr}]`);
+            const landing = holder ? holder.getAttribute(attr) : "";
+            if (landing && landing.startsWith('http') && !landing.includes('nourl.')) {
+                link = landing;
+                break;
+            }
+        }
+        if (!link || !link.startsWith('http') || seenUrls.has(link)) continue;
+        seenUrls.add(link);
+        const snippetElement = profile.snippet ? item.querySelector(profile.snippet) : null;
+        results.push({
+            title: (titleElement.textContent || "").trim(),
+            link: link,
+            snippet: snippetElement ? (snippetElement.textContent || "").trim() : ""
+        });
+    }
+    return results;
+}
+"""
+
+
+@dataclass
+class EngineProfile:
+    """
+    单个搜索引擎的结果页配置
+
+    Args:
+        name: 引擎名
+        build_url: (查询, 结果数, 语言) -> 结果页URL
+        container: 结果容器选择器，出现后再提取
+        blocked_patterns: 出现在URL中即视为人机验证的片段
+        selectors: 结果条目的 item/title/link/snippet 选择器
+        extract_js: 自定义提取脚本（参数为最大结果数），设置后忽略 selectors
+        landing_attrs: 带有真实落地页地址的属性，按顺序取第一个有效值
+        redirect_patterns: 结果链接中含有这些片段时视为跳转链接，返回前解析出真实地址
+    """
+    name: str
+    build_url: Callable[[str, int, str], str]
+    container: str
+    blocked_patterns: List[str] = field(default_factory=list)
+    selectors: Dict[str, str] = field(default_factory=dict)
+    extract_js: Optional[str] = None
+    landing_attrs: List[str] = field(default_factory=list)
+    redirect_patterns: List[str] = field(default_factory=list)
+
+    def is_blocked(self, url: str) -> bool:
+        return any(pattern in url for pattern in self.blocked_patterns)
+
+    def is_redirect(self, url: str) -> bool:
+        return any(pattern in url for pattern in self.redirect_patterns)
+
+    async def extract(self, page, limit: int) -> List[dict]:
+        if self.extract_js:
+            return await page.evaluate(self.extract_js, limit)
+        return await page.evaluate(SELECTOR_EXTRACT_JS, [limit, {**self.selectors, "landingAttrs": self.landing_attrs}])
+
+
+async def resolve_redirect(context, url: str, timeout: int = 10000) -> Optional[str]:
+    """用上下文的请求接口（共享Cookie）访问跳转链接但不跟随，返回目标地址，失败时返回None"""
+    try:
+        response = await context.request.get(url, max_redirects=0, timeout=timeout)
+        location = response.headers.get("location")
+        if not location and response.ok:
+            match = REDIRECT_BODY_PATTERN.search(await response.text())
+            location = match.group(1) if match else None
+        await response.dispose()
+    except Exception as e:
+        logger.debug(f"解析跳转链接 {url} 失败: {e}")
+        return None
+    return location if location and location.startswith("http") else None
+
+
+async def resolve_result_links(profile: EngineProfile, context, items: List[dict],
+                               timeout: int = 10000) -> List[dict]:
+    """把结果中的跳转链接替换为真实地址，无法解析的结果被丢弃，避免以跳转域名作为来源"""
+    pending = [item for item in items if profile.is_redirect(item.get("link") or "")]
+    if not pending:
+        return items
+    targets = await asyncio.gather(*(resolve_redirect(context, item["link"], timeout) for item in pending))
+    resolved = {id(item): target for item, target in zip(pending, targets)}
+    results = []
+    for item in items:
+        if id(item) not in resolved:
+            results.append(item)
+        elif resolved[id(item)]:
+            results.append({**item, "link": resolved[id(item)]})
+    if len(results) < len(items):
+        logger.warning(f"引擎 {profile.name} 有 {len(items) - len(results)} 条跳转链接无法解析，已丢弃")
+    return results
+
+
+def _google_url(query: str, limit: int, locale: str) -> str:
+    return build_results_url(GOOGLE_DOMAINS[0], query, limit, locale)
+
+
+def _epoch_days(day: datetime.date) -> int:
+    return (day - datetime.date(1970, 1, 1)).days
+
+
+def _bing_url(query: str, limit: int, locale: str) -> str:
+    """after:/before: 转换为 Bing 的 ex1:"ez5_起始天_结束天" 自定义日期范围（自1970-01-01起的天数）"""
+    q, dates = split_date_operators(query)
+    params = {"q": q, "count": min(max(limit, 10), 50), "setlang": locale}
+    if dates:
+        start = _epoch_days(dates["after"]) if "after" in dates else 0
+        end = _epoch_days(dates.get("before", datetime.date.today()))
+        params["filters"] = f'ex1:"ez5_{start}_{end}"'
+    return f"https://www.bing.com/search?{urlencode(params)}"
+
+
+def _baidu_url(query: str, limit: int, locale: str) -> str:
+    """after:/before: 转换为百度的 gpc=stf=起始时间戳,结束时间戳|stftype=2"""
+    q, dates = split_date_operators(query)
+    params = {"wd": q, "rn": min(max(limit, 10), 50)}
+    if dates:
+        start = datetime.datetime.combine(dates.get("after", datetime.date(1970, 1, 2)), datetime.time())
+        end = datetime.datetime.combine(dates.get("before", datetime.date.today()), datetime.time())
+        params["gpc"] = f"stf={int(start.timestamp())},{int(end.timestamp())}|stftype=2"
+    return f"https://www.baidu.com/s?{urlencode(params)}"
+
+
+ENGINE_PROFILES: Dict[str, EngineProfile] = {
+    "google": EngineProfile(
+        name="google",
+        build_url=_google_url,
+        container=RESULTS_CONTAINER_SELECTOR,
+        blocked_patterns=SORRY_PATTERNS,
+        extract_js=EXTRACT_RESULTS_JS,
+    ),
+    "bing": EngineProfile(
+        name="bing",
+        build_url=_bing_url,
+        container="#b_results",
+        blocked_patterns=["bing.com/ck/captcha", "captcha"],
+        selectors={"item": "#b_results > li.b_algo", "title": "h2", "link": "h2 a",
+                   "snippet": ".b_caption p, .b_lineclamp2, .b_algoSlug"},
+    ),
+    # 百度结果链接为 baidu.com/link 跳转地址：优先读取条目的 mu / data-landurl 属性，其余链接再解析跳转
+    "baidu": EngineProfile(
+        name="baidu",
+        build_url=_baidu_url,
+        container="#content_left",
+        blocked_patterns=["wappass.baidu.com", "captcha"],
+        selectors={"item": "#content_left .c-container", "title": "h3", "link": "h3 a",
+                   "snippet": ".c-abstract, [class*='content-right'], .c-span-last"},
+        landing_attrs=["mu", "data-landurl"],
+        redirect_patterns=["baidu.com/link?", "baidu.com/baidu.php?"],
+    ),
+}
+
+
+class EngineStats:
+    """
+    各引擎的竞速胜率与耗时统计，持久化为JSON，用于决定默认的引擎顺序
+
+    读写都在锁内进行，可由多个并发的竞速共用同一实例（见 get_engine_stats）。
+
+    Args:
+        path: 统计文件路径
+        alpha: 耗时指数移动平均的权重
+    """
+
+    def __init__(self, path: str = ENGINE_STATS_PATH, alpha: float = 0.3):
+        self.path = path
+        self.alpha = alpha
+        self.engines: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.engines = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def _entry(self, name: str) -> dict:
+        return self.engines.setdefault(name, {"attempts": 0, "wins": 0, "failures": 0, "latency": None})
+
+    def record(self, name: str, won: bool = False, failed: bool = False, latency: Optional[float] = None):
+        with self._lock:
+            entry = self._entry(name)
+            entry["attempts"] += 1
+            entry["wins"] += int(won)
+            entry["failures"] += int(failed)
+            if latency is not None:
+                entry["latency"] = latency if entry["latency"] is None else \
+                    self.alpha * latency + (1 - self.alpha) * entry["latency"]
+
+    def score(self, name: str) -> float:
+        """平滑胜率 / 平均耗时，未出现过的引擎按中等胜率、5秒耗时估计"""
+        with self._lock:
+            entry = dict(self.engines.get(name, {}))
+        win_rate = (entry.get("wins", 0) + 1) / (entry.get("attempts", 0) + 2)
+        latency = entry.get("latency") or 5.0
+        return win_rate / max(latency, 0.5)
+
+    def rank(self, names: List[str]) -> List[str]:
+        """按得分从高到低排序，得分相同时保持传入顺序"""
+        return sorted(names, key=lambda n: -self.score(n))
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.engines, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+#按统计文件路径共享的 EngineStats 实例
+_engine_stats: Dict[str, EngineStats] = {}
+_engine_stats_lock = threading.Lock()
+
+
+def get_engine_stats(path: str = ENGINE_STATS_PATH) -> EngineStats:
+    """获取与统计文件对应的共享 EngineStats，首次调用时从文件读取"""
+    with _engine_stats_lock:
+        if path not in _engine_stats:
+            _engine_stats[path] = EngineStats(path)
+        return _engine_stats[path]
+
+
+def good_results(items: List[dict], limit: int) -> List[dict]:
+    """保留有标题和 http 链接的结果，按链接去重"""
+    seen, results = set(), []
+    for r in items:
+        link = r.get("link") or ""
+        if not r.get("title") or not link.startswith("http") or link in seen:
+            continue
+        seen.add(link)
+        results.append(r)
+    return results[:limit]
+
+
+async def run_engine(profile: EngineProfile, query: str, limit: int, pool: BrowserPool,
+                     locale: str = "zh-CN", timeout: int = 60000, fast_mode: bool = False) -> List[dict]:
+    """在浏览器池借出的上下文中打开某个引擎的结果页并提取结果，遇到人机验证时抛出 SearchBlockedError"""
+    async with pool.lease() as lease:
+        page = await lease.new_page()
+        try:
+            if fast_mode:
+                await install_resource_blocker(page)
+            await page.goto(profile.build_url(query, limit, locale), wait_until="domcontentloaded", timeout=timeout)
+            if profile.is_blocked(page.url):
+                raise SearchBlockedError(page.url)
+            await page.wait_for_selector(profile.container, timeout=timeout)
+            items = await profile.extract(page, limit)
+            return await resolve_result_links(profile, lease.context, items, min(timeout, 10000))
+        finally:
+            await lease.close_page(page)
+
+
+async def race_search(query: str, options: Optional[SearchOptions] = None, engines: Optional[List[str]] = None,
+                      deadline: Optional[float] = None, stagger: float = 0.5, pool: Optional[BrowserPool] = None,
+                      stats: Optional[EngineStats] = None) -> SearchResponse:
+    """
+    在多个搜索引擎上竞速执行同一查询
+
+    按历史胜率与耗时排序，依次间隔 stagger 秒启动各引擎；任一引擎先拿到 limit 条有效结果即返回，
+    其余引擎被取消。到达时限或全部引擎结束仍无引擎凑够时，返回条数最多的一组结果。
+    被人机验证拦截的引擎直接判负，不会进入有头模式等待人工处理。
+
+    Args:
+        query: 搜索查询，after:/before: 日期会转换为各引擎的日期范围参数
+        options: 搜索选项
+        engines: 参与竞速的引擎，默认取 options.engines 或全部引擎
+        deadline: 总时限（秒），默认取 options.race_deadline
+        stagger: 相邻两个引擎的启动间隔（秒）
+        pool: 浏览器池，默认使用当前事件循环的默认池
+        stats: 引擎统计，默认使用 cache/search/engine_stats.json 对应的共享实例
+
+    Returns:
+        胜出引擎的搜索响应
+    """
+    if options is None:
+        options = SearchOptions()
+    limit = options.limit or 10
+    locale = options.locale or "zh-CN"
+    deadline = deadline or options.race_deadline or 30.0
+    timeout = min(options.timeout or 60000, int(deadline * 1000))
+
+    names = list(engines or options.engines or ENGINE_PROFILES)
+    unknown = [n for n in names if n not in ENGINE_PROFILES]
+    if unknown:
+        raise ValueError(f"未知的搜索引擎: {unknown}，可选: {list(ENGINE_PROFILES)}")
+
+    cache = SearchCache(options.cache_dir or "./cache/search") if options.use_cache else None
+    if cache is not None:
+        cached_response = cache.get(query, locale, limit)
+        if cached_response is not None:
+            logger.info(f"命中搜索缓存 {query}（{len(cached_response.results)} 条结果）")
+            return cached_response
+
+    stats = stats or get_engine_stats()
+    order = stats.rank(names)
+
+    own_pool = None
+    if pool is None:
+        if options.use_pool is None or options.use_pool:
+            pool = get_browser_pool(options.state_file or "./browser-state.json", locale)
+        else:
+            own_pool = pool = BrowserPool(size=1, contexts_per_browser=len(order),
+                                          state_file=options.state_file or "./browser-state.json", locale=locale)
+
+    loop = asyncio.get_running_loop()
+    started = set()
+
+    async def _run(rank: int, name: str) -> Tuple[str, Optional[List[dict]], float, Optional[Exception]]:
+        await asyncio.sleep(rank * stagger)
+        started.add(name)
+        start = loop.time()
+        try:
+            items = await run_engine(ENGINE_PROFILES[name], query, limit, pool, locale, timeout,
+                                     options.fast_mode or False)
+            return name, good_results(items, limit), loop.time() - start, None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return name, None, loop.time() - start, e
+
+    tasks = [asyncio.ensure_future(_run(rank, name)) for rank, name in enumerate(order)]
+    finished: Dict[str, Tuple[Optional[List[dict]], float, Optional[Exception]]] = {}
+    winner = None
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=deadline):
+            name, items, latency, error = await next_done
+            finished[name] = (items, latency, error)
+            if error is not None:
+                logger.warning(f"引擎 {name} 搜索失败（{latency:.1f}s）: {error}")
+                continue
+            logger.info(f"引擎 {name} 返回 {len(items)} 条有效结果（{latency:.1f}s）")
+            if len(items) >= limit:
+                winner = name
+                break
+    except asyncio.TimeoutError:
+        logger.warning(f"多引擎竞速超过时限 {deadline}s，已完成: {list(finished)}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if own_pool is not None:
+            await own_pool.close()
+
+    if winner is None:
+        candidates = [n for n in order if n in finished and finished[n][0]]
+        if candidates:
+            winner = max(candidates, key=lambda n: len(finished[n][0]))
+
+    for name in order:
+        if name not in started:
+            continue
+        items, latency, error = finished.get(name, (None, None, None))
+        stats.record(name,
+                     won=name == winner and items is not None and len(items) >= limit,
+                     failed=error is not None,
+                     latency=latency if error is None else None)
+    try:
+        stats.save()
+    except OSError as e:
+        logger.warning(f"保存引擎统计失败: {e}")
+
+    if winner is None:
+        errors = "; ".join(f"{n}: {finished[n][2]}" for n in finished if finished[n][2] is not None)
+        return failed_response(query, errors or f"{deadline}s 内没有引擎返回结果")
+
+    logger.info(f"多引擎竞速由 {winner} 胜出，顺序 {order}")
+    response = SearchResponse(query=query, results=[
+        SearchResult(title=r["title"], link=r["link"], snippet=r.get("snippet", ""))
+        for r in finished[winner][0]
+    ])
+    if cache is not None:
+        try:
+            cache.put(response, locale, limit, options.cache_ttl)
+        except Exception as e:
+            logger.warning(f"写入搜索缓存失败: {e}")
+    return response
+
+
+def race_search_sync(query: str, options: Optional[SearchOptions] = None,
+                     engines: Optional[List[str]] = None, deadline: Optional[float] = None) -> SearchResponse:
+    """同步版本的多引擎竞速搜索，在常驻后台事件循环中执行"""
+    loop = get_background_loop()
+    loop.add_shutdown_hook(close_browser_pools)
+    return loop.run(race_search(query, options, engines, deadline))
@@ -0,0 +1,135 @@
+import os
+import json
+import hashlib
+from typing import List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+SHARD_FORMATS = ("jsonl", "jsonl.zst", "parquet")
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ShardWriter:
+    """
+    按记录数或文件大小切分的分片写入器
+
+    数据先写入 .tmp 临时文件，分片写满或关闭时再原子重命名，避免留下不完整的分片。
+
+    Args:
+        output_dir: 分片输出目录
+        prefix: 分片文件名前缀，文件名形如 {prefix}-00000.jsonl
+        max_records: 每个分片的最大记录数
+        max_bytes: 每个分片的最大字节数（压缩格式按已写出的压缩字节近似计算），None表示不限制
+        fmt: 分片格式，可选 "jsonl"、"jsonl.zst"（需要 zstandard）、"parquet"（需要 pyarrow）
+        parquet_row_group: parquet 每个行组的记录数
+    """
+
+    def __init__(self, output_dir: str, prefix: str = "shard", max_records: Optional[int] = 10000,
+                 max_bytes: Optional[int] = None, fmt: str = "jsonl", parquet_row_group: int = 2000):
+        if fmt not in SHARD_FORMATS:
+            raise ValueError(f"不支持的分片格式: {fmt}，可选 {SHARD_FORMATS}")
+        if fmt == "jsonl.zst" and zstandard is None:
+            raise ImportError("请安装 zstandard: pip install zstandard")
+        if fmt == "parquet" and pa is None:
+            raise ImportError("请安装 pyarrow: pip install pyarrow")
+
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.parquet_row_group = parquet_row_group
+        self.shards: List[dict] = []
+        self._raw = None
+        self._file = None
+        self._parquet_writer = None
+        self._rows: List[dict] = []
+        self._path: Optional[str] = None
+        self._count = 0
+
+    def _open(self):
+        name = f"{self.prefix}-{len(self.shards):05d}.{self.fmt}"
+        self._path = os.path.join(self.output_dir, name)
+        self._raw = open(self._path + ".tmp", "wb")
+        if self.fmt == "jsonl.zst":
+            self._file = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        elif self.fmt == "jsonl":
+            self._file = self._raw
+        self._count = 0
+
+    def _flush_parquet(self):
+        if not self._rows:
+            return
+        # 同一分片内沿用第一个行组的schema
+        schema = self._parquet_writer.schema if self._parquet_writer is not None else None
+        table = pa.Table.from_pylist(self._rows, schema=schema)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self._raw, table.schema)
+        self._parquet_writer.write_table(table)
+        self._rows = []
+
+    def _finish(self):
+        if self._raw is None:
+            return
+        if self.fmt == "parquet":
+            self._flush_parquet()
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+                self._parquet_writer = None
+        elif self.fmt == "jsonl.zst":
+            self._file.close()
+        self._raw.close()
+        os.replace(self._path + ".tmp", self._path)
+        self.shards.append({
+            "file": os.path.basename(self._path),
+            "count": self._count,
+            "bytes": os.path.getsize(self._path),
+            "sha256": file_sha256(self._path),
+        })
+        self._raw = None
+        self._file = None
+
+    def write(self, record: dict):
+        if self._raw is None:
+            self._open()
+        if self.fmt == "parquet":
+            self._rows.append(record)
+            if len(self._rows) >= self.parquet_row_group:
+                self._flush_parquet()
+        else:
+            self._file.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._count += 1
+
+        if self.max_records and self._count >= self.max_records:
+            self._finish()
+        elif self.max_bytes and (self.fmt != "parquet" or not self._rows) and self._raw.tell() >= self.max_bytes:
+            self._finish()
+
+    def close(self) -> List[dict]:
+        """关闭当前分片，返回所有分片的文件名、记录数、字节数与SHA-256"""
+        self._finish()
+        return self.shards
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,204 @@
+import os
+import json
+from bisect import bisect_left
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+
+from scripts.logging_config import setup_logger
+
+logger = setup_logger("trading_calendar")
+
+#随代码发布的节假日数据（只列工作日休市），覆盖范围之外按“周一至周五为交易日”推算
+TRADING_HOLIDAYS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "a_share_holidays.json")
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_date(value) -> date:
+    """date / datetime / pandas.Timestamp / numpy.datetime64 / "YYYY-MM-DD" 统一转为 date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10])
+    if isinstance(value, np.datetime64):
+        return date.fromordinal(int(value.astype("datetime64[D]").astype(np.int64)) + EPOCH_ORDINAL)
+    raise TypeError(f"无法识别的日期: {value!r}")
+
+
+def _is_weekday(ordinal: int) -> bool:
+    return (ordinal - 1) % 7 < 5   # 0001-01-01 是周一
+
+
+def _dt64(ordinals):
+    """日期序号（标量或数组）转为 datetime64[D]"""
+    return (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]")
+
+
+def _ordinals_of(dt64) -> np.ndarray:
+    return np.asarray(dt64, dtype="datetime64[D]").astype(np.int64) + EPOCH_ORDINAL
+
+
+class TradingCalendar:
+    """
+    A股交易日历
+
+    构建时把覆盖范围内的交易日转换为有序的日期序号数组，并建立按日期偏移索引的交易日标记：
+    is_session 为 O(1)，count_sessions / nth_session / prev_session / next_session 为 O(log n)。
+    带 _many 后缀的方法接受日期数组（列表、numpy 数组、pandas 序列），返回 numpy 数组。
+
+    “第几个交易日”以覆盖起点之后的第一个交易日为0，起点之前为负数。超出覆盖范围的日期
+    只排除周末（首次发生时记录警告），不会因缺少数据而失败。
+
+    Args:
+        start: 节假日数据的覆盖起点
+        end: 节假日数据的覆盖终点
+        holidays: 工作日休市日期
+    """
+
+    def __init__(self, start, end, holidays: Iterable):
+        self.start = to_date(start)
+        self.end = to_date(end)
+        self._first = self.start.toordinal()
+        self._last = self.end.toordinal()
+        closed = {to_date(h).toordinal() for h in holidays}
+
+        self._mask = bytearray(self._last - self._first + 1)
+        self._sessions = []
+        for ordinal in range(self._first, self._last + 1):
+            if _is_weekday(ordinal) and ordinal not in closed:
+                self._mask[ordinal - self._first] = 1
+                self._sessions.append(ordinal)
+        self._session_array = np.asarray(self._sessions, dtype=np.int64)
+        self._mask_array = np.frombuffer(bytes(self._mask), dtype=np.uint8).astype(bool)
+        self._warned = False
+
+    @classmethod
+    def from_file(cls, path: str = TRADING_HOLIDAYS_PATH) -> "TradingCalendar":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["start"], data["end"], data["holidays"])
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def covers(self, value) -> bool:
+        return self.start <= to_date(value) <= self.end
+
+    def _extrapolating(self):
+        if not self._warned:
+            self._warned = True
+            logger.warning(f"日期超出交易日历覆盖范围 {self.start} ~ {self.end}，超出部分只排除周末，"
+                           f"请在 {TRADING_HOLIDAYS_PATH} 中补充节假日")
+
+    def _rank(self, ordinal: int) -> int:
+        """早于该日期的交易日个数（以覆盖起点为0）"""
+        if ordinal < self._first:
+            self._extrapolating()
+            return -int(np.busday_count(_dt64(ordinal), _dt64(self._first)))
+        if ordinal > self._last + 1:
+            self._extrapolating()
+            return len(self._sessions) + int(np.busday_count(_dt64(self._last + 1), _dt64(ordinal)))
+        return bisect_left(self._sessions, ordinal)
+
+    def _nth(self, rank: int) -> int:
+        if 0 <= rank < len(self._sessions):
+            return self._sessions[rank]
+        self._extrapolating()
+        if rank < 0:
+            return int(_ordinals_of(np.busday_offset(_dt64(self._first), rank, roll="forward")))
+        return int(_ordinals_of(np.busday_offset(_dt64(self._last + 1), rank - len(self._sessions), roll="forward")))
+
+    def is_session(self, value) -> bool:
+        ordinal = to_date(value).toordinal()
+        if self._first <= ordinal <= self._last:
+            return bool(self._mask[ordinal - self._first])
+        self._extrapolating()
+        return _is_weekday(ordinal)
+
+    def count_sessions(self, start, end) -> int:
+        """[start, end] 闭区间内的交易日个数"""
+        count = self._rank(to_date(end).toordinal() + 1) - self._rank(to_date(start).toordinal())
+        return max(count, 0)
+
+    def nth_session(self, n: int, start=None) -> date:
+        """从 start（含）起的第 n 个交易日，n 从0计；start 为空时从覆盖起点算"""
+        base = self._rank(to_date(start).toordinal()) if start is not None else 0
+        return date.fromordinal(self._nth(base + n))
+
+    def prev_session(self, value, inclusive: bool = False) -> date:
+        """上一个交易日；inclusive 为 True 且当天是交易日时返回当天"""
+        ordinal = to_date(value).toordinal()
+        return date.fromordinal(self._nth(self._rank(ordinal + 1 if inclusive else ordinal) - 1))
+
+    def next_session(self, value, inclusive: bool = False) -> date:
+        """下一个交易日；inclusive 为 True 且当天是交易日时返回当天"""
+        ordinal = to_date(value).toordinal()
+        return date.fromordinal(self._nth(self._rank(ordinal if inclusive else ordinal + 1)))
+
+    # ---- 向量化版本 ----
+
+    @staticmethod
+    def _ordinals(values) -> np.ndarray:
+        if isinstance(values, np.ndarray) or hasattr(values, "dtype"):
+            return _ordinals_of(np.asarray(values).astype("datetime64[D]"))
+        return np.asarray([to_date(v).toordinal() for v in values], dtype=np.int64)
+
+    def _rank_many(self, ordinals: np.ndarray) -> np.ndarray:
+        ranks = np.searchsorted(self._session_array, ordinals, side="left").astype(np.int64)
+        before = ordinals < self._first
+        after = ordinals > self._last + 1
+        if before.any() or after.any():
+            self._extrapolating()
+        if before.any():
+            ranks[before] = -np.busday_count(_dt64(ordinals[before]), _dt64(self._first))
+        if after.any():
+            ranks[after] = len(self._sessions) + np.busday_count(_dt64(self._last + 1), _dt64(ordinals[after]))
+        return ranks
+
+    def _nth_many(self, ranks: np.ndarray) -> np.ndarray:
+        ordinals = np.empty_like(ranks)
+        inside = (ranks >= 0) & (ranks < len(self._sessions))
+        ordinals[inside] = self._session_array[ranks[inside]]
+        before = ranks < 0
+        after = ranks >= len(self._sessions)
+        if before.any() or after.any():
+            self._extrapolating()
+        if before.any():
+            ordinals[before] = _ordinals_of(np.busday_offset(_dt64(self._first), ranks[before], roll="forward"))
+        if after.any():
+            ordinals[after] = _ordinals_of(np.busday_offset(
+                _dt64(self._last + 1), ranks[after] - len(self._sessions), roll="forward"))
+        return ordinals
+
+    def is_session_many(self, values) -> np.ndarray:
+        ordinals = self._ordinals(values)
+        inside = (ordinals >= self._first) & (ordinals <= self._last)
+        result = np.empty(len(ordinals), dtype=bool)
+        result[inside] = self._mask_array[ordinals[inside] - self._first]
+        if not inside.all():
+            self._extrapolating()
+            result[~inside] = np.is_busday(_dt64(ordinals[~inside]))
+        return result
+
+    def count_sessions_many(self, starts, ends) -> np.ndarray:
+        counts = self._rank_many(self._ordinals(ends) + 1) - self._rank_many(self._ordinals(starts))
+        return np.maximum(counts, 0)
+
+    def prev_session_many(self, values, inclusive: bool = False) -> np.ndarray:
+        ordinals = self._ordinals(values)
+        return _dt64(self._nth_many(self._rank_many(ordinals + 1 if inclusive else ordinals) - 1))
+
+    def next_session_many(self, values, inclusive: bool = False) -> np.ndarray:
+        ordinals = self._ordinals(values)
+        return _dt64(self._nth_many(self._rank_many(ordinals if inclusive else ordinals + 1)))
+
+
+@lru_cache(maxsize=None)
+def get_trading_calendar(path: str = TRADING_HOLIDAYS_PATH) -> TradingCalendar:
+    """加载并缓存交易日历，进程内只构建一次"""
+    return TradingCalendar.from_file(path)
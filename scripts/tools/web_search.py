@@ -2,12 +2,17 @@ import os
 import asyncio
 import json
 import time
+import random
+import math
+import re
+import hashlib
+import tempfile
 import datetime
 import logging
-from dataclasses import dataclass, field
-from typing import Optional,List
-
-from sympy import limit
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from urllib.parse import urlencode
+from typing import Optional,List,Dict,Tuple,Iterable,AsyncIterator
 
 try:
     from playwright.async_api import async_playwright,Browser,BrowserContext,Page
@@ -15,6 +20,10 @@ except ImportError:
     raise ImportError(
         "请安装 playwright: pip install playwright && playwright install chromium")
 
+from resource_blocker import install_async as install_resource_blocker
+from async_runner import BackgroundLoop, get_background_loop, shutdown_background_loop
+from fixture_store import install_playwright_async
+
 logger=logging.getLogger(__name__)
 
 @dataclass
@@ -24,6 +33,14 @@ class SearchOptions:
     state_file: Optional[str] = "./browser-state.json"
     no_save_state: Optional[bool] = False
     locale: Optional[str] = "zh-CN"
+    use_pool: Optional[bool] = True   # 默认从浏览器池借用上下文，False时每次启动新浏览器
+    use_cache: Optional[bool] = True   # 是否使用本地搜索结果缓存
+    cache_ttl: Optional[int] = 6 * 3600   # 缓存有效期（秒），before:日期早于今天的查询永不过期
+    cache_dir: Optional[str] = "./cache/search"
+    fast_mode: Optional[bool] = False   # 快速模式：拦截图片、字体、样式表、媒体和跟踪请求
+    direct: Optional[bool] = True   # 直接打开结果页URL，不经过首页输入；被拦截时回退到首页输入
+    engines: Optional[List[str]] = None   # 多引擎竞速，如 ["google", "bing", "baidu"]；为空时只用 Google
+    race_deadline: Optional[float] = 30.0   # 多引擎竞速的总时限（秒）
 
 @dataclass
 class SearchResult:
@@ -53,6 +70,198 @@ class SavedState:
     fingerprint: Optional[FingerprintConfig] = None
     google_domain: Optional[str] = None
 
+class SearchBlockedError(Exception):
+    """无头模式下遇到人机验证"""
+
+#google域名
+GOOGLE_DOMAINS=[
+    "https://www.google.com",
+    "https://www.google.co.uk",
+    "https://www.google.ca",
+    "https://www.google.com.au"
+]
+
+# 设备配置映射
+DEVICE_CONFIGS = {
+    "Desktop Chrome": {
+        "viewport": {"width": 1920, "height": 1080},
+        "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    },
+    "Desktop Firefox": {
+        "viewport": {"width": 1920, "height": 1080},
+        "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0"
+    }
+}
+
+LAUNCH_ARGS=[
+    "--disable-blink-features=AutomationControlled",
+    "--disable-features=IsolateOrigins,site-per-process",
+    "--disable-web-security",
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",
+    "--no-first-run",
+    "--disable-gpu",
+    "--hide-scrollbars",
+    "--mute-audio",
+]
+
+#反检测
+STEALTH_SCRIPT="""
+    Object.defineProperty(navigator, 'webdriver', {get: () => false});
+    Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
+    Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en', 'zh-CN']});
+    window.chrome = {runtime: {}, loadTimes: function(){}, csi: function(){}, app: {}};
+"""
+
+SORRY_PATTERNS = ["google.com/sorry", "recaptcha", "captcha", "unusual traffic"]
+
+# 结果页容器，直接访问结果页时只等待它出现
+RESULTS_CONTAINER_SELECTOR = "#search, #rso"
+
+# 查询中的日期限制，如 after:2024-01-01、before:2024-01-08
+DATE_OPERATOR_PATTERN = re.compile(r"(after|before):?\s*(\d{4})-(\d{2})-(\d{2})")
+
+def is_blocked_url(url:str) -> bool:
+    """是否为人机验证页面"""
+    return any(pattern in url for pattern in SORRY_PATTERNS)
+
+# 翻页时最多抓取的结果页数，以及同时打开的结果页数
+MAX_RESULT_PAGES = 10
+PAGE_CONCURRENCY = 3
+
+def split_date_operators(query:str) -> Tuple[str, Dict[str, datetime.date]]:
+    """
+    拆出查询中的 after:/before: 日期
+
+    Returns:
+        (去掉日期限制后的查询, {"after": 日期, "before": 日期})
+    """
+    dates = {}
+
+    def _take_date(match):
+        dates[match.group(1)] = datetime.date(int(match.group(2)), int(match.group(3)), int(match.group(4)))
+        return " "
+
+    return " ".join(DATE_OPERATOR_PATTERN.sub(_take_date, query).split()), dates
+
+def build_results_url(domain:str, query:str, limit:int, locale:str, start:int=0) -> str:
+    """
+    构建 Google 结果页URL
+
+    查询中的 after:/before: 日期转换为 tbs=cdr 日期范围参数。
+
+    Args:
+        domain: Google 域名，如 https://www.google.com
+        query: 搜索查询
+        limit: 结果数量（num 参数，最大100）
+        locale: 界面语言（hl 参数）
+        start: 结果偏移（翻页时使用）
+    """
+    q, dates = split_date_operators(query)
+    params = {"q": q, "num": min(max(limit, 10), 100), "hl": locale}
+    if dates:
+        tbs = ["cdr:1"]
+        for operator, key in (("after", "cd_min"), ("before", "cd_max")):
+            if operator in dates:
+                day = dates[operator]
+                tbs.append(f"{key}:{day.month}/{day.day}/{day.year}")
+        params["tbs"] = ",".join(tbs)
+    if start:
+        params["start"] = start
+    return f"{domain.rstrip('/')}/search?{urlencode(params)}"
+
+# 提取搜索结果的脚本，参数为最大结果数
+EXTRACT_RESULTS_JS = """
+(maxResults) => {
+    const results = [];
+    const seenUrls = new Set();
+
+    // 定义选择器组合
+    const selectorSets = [
+        { container: '#search div[data-hveid]', title: 'h3', snippet: '.VwiC3b' },
+        { container: '#rso div[data-hveid]', title: 'h3', snippet: '[data-sncf="1"]' },
+        { container: '.g', title: 'h3', snippet: 'div[style*="webkit-line-clamp"]' },
+        { container: 'div[jscontroller][data-hveid]', title: 'h3', snippet: 'div[role="text"]' }
+    ];
+
+    // 备用摘要选择器
+    const alternativeSnippetSelectors = [
+        '.VwiC3b', '[data-sncf="1"]', 'div[style*="webkit-line-clamp"]', 'div[role="text"]'
+    ];
+
+    // 尝试每组选择器
+    for (const selectors of selectorSets) {
+        if (results.length >= maxResults) break;
+
+        const containers = document.querySelectorAll(selectors.container);
+
+        for (const container of containers) {
+            if (results.length >= maxResults) break;
+
+            const titleElement = container.querySelector(selectors.title);
+            if (!titleElement) continue;
+
+            const title = (titleElement.textContent || "").trim();
+
+            // 查找链接
+            let link = '';
+            const linkInTitle = titleElement.querySelector('a');
+            if (linkInTitle) {
+                link = linkInTitle.href;
+            } else {
+                let current = titleElement;
+                while (current && current.tagName !== 'A') {
+                    current = current.parentElement;
+                }
+                if (current && current instanceof HTMLAnchorElement) {
+                    link = current.href;
+                } else {
+                    const containerLink = container.querySelector('a');
+                    if (containerLink) {
+                        link = containerLink.href;
+                    }
+                }
+            }
+
+            // 过滤无效链接
+            if (!link || !link.startsWith('http') || seenUrls.has(link)) continue;
+
+            // 查找摘要
+            let snippet = '';
+            const snippetElement = container.querySelector(selectors.snippet);
+            if (snippetElement) {
+                snippet = (snippetElement.textContent || "").trim();
+            } else {
+                for (const altSelector of alternativeSnippetSelectors) {
+                    const element = container.querySelector(altSelector);
+                    if (element) {
+                        snippet = (element.textContent || "").trim();
+                        break;
+                    }
+                }
+
+                if (!snippet) {
+                    const textNodes = Array.from(container.querySelectorAll('div')).filter(el =>
+                        !el.querySelector('h3') && (el.textContent || "").trim().length > 20
+                    );
+                    if (textNodes.length > 0) {
+                        snippet = (textNodes[0].textContent || "").trim();
+                    }
+                }
+            }
+
+            if (title && link) {
+                results.push({ title, link, snippet });
+                seenUrls.add(link);
+            }
+        }
+    }
+
+    return results.slice(0, maxResults);
+}
+"""
+
 def get_host_machine_config(user_locale:Optional[str]=None) -> FingerprintConfig:
     #获取系统区域设置
     system_locale=user_locale or os.environ.get("LANG","zh_CN")
@@ -77,35 +286,60 @@ def get_host_machine_config(user_locale:Optional[str]=None) -> FingerprintConfig
         forced_colors=forced_colors,
     )
 
-async def search(query:str,options:Optional[SearchOptions]=None,existing_browser:Optional[Browser]=None) -> SearchResponse:
+def fingerprint_file_path(state_file:str) -> str:
+    """指纹配置文件路径"""
+    return state_file.replace(".json", "-fingerprint.json")
+
+def write_json_atomic(path:str, data, indent:Optional[int]=None):
+    """先写同目录下的临时文件再 os.replace，读取方不会读到半个文件"""
+    directory=os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path=tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+#每个事件循环、每个状态文件各一把锁，池中多个上下文的状态写入依次进行
+_state_locks:Dict[tuple, asyncio.Lock]={}
+
+def _state_lock(state_file:str) -> asyncio.Lock:
+    loop=asyncio.get_running_loop()
+    for key in [k for k in _state_locks if k[0].is_closed()]:
+        _state_locks.pop(key)
+    key=(loop, state_file)
+    if key not in _state_locks:
+        _state_locks[key]=asyncio.Lock()
+    return _state_locks[key]
+
+async def save_storage_state(context:BrowserContext, state_file:str, fingerprint_data:Optional[dict]=None):
     """
-       执行浏览器搜索并返回结构化结果
+    保存浏览器状态（以及指纹配置）
 
-       Args:
-           query: 搜索查询字符串
-           options: 搜索选项
-           existing_browser: 可选的现有浏览器实例
-
-       Returns:
-           搜索响应对象
-       """
-    if options is None:
-        options = SearchOptions()
-
-    #default
-    limit=options.limit or 10
-    timeout=options.timeout or 60000
-    state_file=options.state_file or "./browser-state.json"
-    no_save_state=options.no_save_state or False
-    locale=options.locale or "zh_CN"
+    同一状态文件的写入由锁串行化，并以临时文件替换的方式写入。
+    """
+    async with _state_lock(state_file):
+        state=await context.storage_state()
+        write_json_atomic(state_file, state)
+        if fingerprint_data is not None:
+            write_json_atomic(fingerprint_file_path(state_file), fingerprint_data, indent=2)
 
-    logger.info(f"正在初始化浏览器搜索 {query}")
+def load_saved_state(state_file:str) -> Tuple[Optional[str], SavedState]:
+    """
+    读取浏览器状态文件与指纹配置
 
-    #检查状态文件
+    Returns:
+        (可用于 storage_state 的状态文件路径或None, 已保存的指纹与域名)
+    """
     storage_state=None
     saved_state=SavedState()
-    #指纹配置文件路径
-    fingerprint_file = state_file.replace(".json", "-fingerprint.json")
+    fingerprint_file = fingerprint_file_path(state_file)
 
     if os.path.exists(state_file):
         logger.info(f"发现浏览器状态文件：{state_file}")
@@ -126,291 +360,569 @@ async def search(query:str,options:Optional[SearchOptions]=None,existing_browser
     else:
         logger.info(f"未找到浏览器状态文件：{state_file}")
 
-    #google域名
-    google_domains=[
-        "https://www.google.com",
-        "https://www.google.co.uk",
-        "https://www.google.ca",
-        "https://www.google.com.au"
-    ]
-
-    # 设备配置映射
-    device_configs = {
-            "Desktop Chrome": {
-                "viewport": {"width": 1920, "height": 1080},
-                "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-            },
-            "Desktop Firefox": {
-                "viewport": {"width": 1920, "height": 1080},
-                "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:120.0) Gecko/20100101 Firefox/120.0"
-            }
+    return storage_state, saved_state
+
+async def new_search_context(browser:Browser, saved_state:SavedState, locale:str, storage_state:Optional[str]=None) -> BrowserContext:
+    """按保存的指纹创建带反检测脚本的浏览器上下文"""
+    #获取设备配置
+    if saved_state.fingerprint:
+        device_name = saved_state.fingerprint.device_name
+    else:
+        device_name = "Desktop Chrome"
+
+    device_config = DEVICE_CONFIGS.get(
+        device_name, DEVICE_CONFIGS["Desktop Chrome"])
+
+    # 创建浏览器上下文
+    context_options = {
+        "viewport": device_config["viewport"],
+        "user_agent": device_config["user_agent"],
+        "locale": locale,
+        "timezone_id": "Asia/Shanghai"
+    }
+
+    if storage_state and os.path.exists(storage_state):
+        context_options["storage_state"] = storage_state
+
+    context = await browser.new_context(**context_options)
+    await context.add_init_script(STEALTH_SCRIPT)
+    await install_playwright_async(context)
+    return context
+
+BEFORE_DATE_PATTERN = re.compile(r"before:?\s*(\d{4}-\d{2}-\d{2})")
+
+def normalize_query(query:str) -> str:
+    """规范化查询：去掉首尾空白并合并连续空白；不改大小写，Google 只把大写的 OR/AND 当作运算符"""
+    return " ".join(query.split())
+
+class SearchCache:
+    """
+    按(规范化查询, 语言, 结果数)缓存搜索结果的磁盘缓存
+
+    每条缓存一个JSON文件，先写临时文件再 os.replace，多个进程同时读写也不会读到半个文件。
+    查询中带有早于今天的 before: 日期时，结果不会再变化，缓存永不过期。
+
+    Args:
+        cache_dir: 缓存目录
+    """
+
+    def __init__(self, cache_dir:str="./cache/search"):
+        self.cache_dir=cache_dir
+
+    def _path(self, query:str, locale:str, limit:int) -> str:
+        key=json.dumps([normalize_query(query), locale, limit], ensure_ascii=False)
+        digest=hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    @staticmethod
+    def expires_at(query:str, ttl:Optional[int]) -> Optional[float]:
+        """计算过期时间戳，None表示永不过期"""
+        match=BEFORE_DATE_PATTERN.search(query)
+        if match and match.group(1) < datetime.date.today().isoformat():
+            return None
+        return time.time() + (ttl or 0)
+
+    def get(self, query:str, locale:str, limit:int) -> Optional[SearchResponse]:
+        path=self._path(query, locale, limit)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry=json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at") is not None and entry["expires_at"] < time.time():
+            return None
+        return SearchResponse(
+            query=query,
+            results=[SearchResult(**r) for r in entry.get("results", [])]
+        )
+
+    def put(self, response:SearchResponse, locale:str, limit:int, ttl:Optional[int]):
+        path=self._path(response.query, locale, limit)
+        entry={
+            "query": response.query,
+            "locale": locale,
+            "limit": limit,
+            "created_at": time.time(),
+            "expires_at": self.expires_at(response.query, ttl),
+            "results": [{"title": r.title, "link": r.link, "snippet": r.snippet} for r in response.results],
         }
+        write_json_atomic(path, entry)
+
+def failed_response(query:str, error) -> SearchResponse:
+    """搜索失败时返回的响应"""
+    return SearchResponse(
+        query=query,
+        results=[SearchResult(
+            title="搜索失败",
+            link="",
+            snippet=f"无法完成搜索，错误信息: {str(error)}"
+        )]
+    )
 
-    async def perform_search(headless: bool=True):
-        browser_was_provided= existing_browser is not None
-        browser=existing_browser
+async def page_js_heap_bytes(page:Page) -> int:
+    """读取页面JS堆占用（Chromium），失败时返回0"""
+    try:
+        return int(await page.evaluate(
+            "() => (performance.memory && performance.memory.usedJSHeapSize) || 0"))
+    except Exception:
+        return 0
 
-        if not browser_was_provided:
-            #启动新的浏览器
-            async with async_playwright() as p:
-                browser=await p.chromium.launch(
-                    headless=headless,
-                    args=[
-                        "--disable-blink-features=AutomationControlled",
-                        "--disable-features=IsolateOrigins,site-per-process",
-                        "--disable-web-security",
-                        "--no-sandbox",
-                        "--disable-setuid-sandbox",
-                        "--disable-dev-shm-usage",
-                        "--no-first-run",
-                        "--disable-gpu",
-                        "--hide-scrollbars",
-                        "--mute-audio",
-                    ]
-                )
-                return await _perform_search_with_browser(browser, browser_was_provided, headless)
-        else:
-            return await _perform_search_with_browser(browser, browser_was_provided, headless)
 
-    async def _perform_search_with_browser(browser: Browser,browser_was_provided: bool,headless: bool=True):
-        """使用给定的浏览器搜索"""
+class _PooledBrowser:
+    """池中的单个浏览器及其使用统计"""
+
+    def __init__(self, browser:Browser):
+        self.browser=browser
+        self.pages_served=0
+        self.peak_memory=0
+        self.open_contexts=0
+        self.retiring=False
+
+
+class ContextLease:
+    """从浏览器池借出的上下文，归还时统计页面数与内存"""
+
+    def __init__(self, pooled:_PooledBrowser, context:BrowserContext):
+        self.pooled=pooled
+        self.context=context
+        self.pages=0
+        self.memory=0
+
+    async def new_page(self) -> Page:
+        page=await self.context.new_page()
+        self.pages+=1
+        return page
+
+    async def close_page(self, page:Page):
+        self.memory=max(self.memory, await page_js_heap_bytes(page))
         try:
-            #获取设备配置
-            if saved_state.fingerprint:
-                device_name = saved_state.fingerprint.device_name
-            else:
-                device_name = "Desktop Chrome"
+            await page.close()
+        except Exception:
+            pass
 
-            device_config = device_configs.get(
-                device_name, device_configs["Desktop Chrome"])
 
-            # 创建浏览器上下文
-            context_options = {
-                "viewport": device_config["viewport"],
-                "user_agent": device_config["user_agent"],
-                "locale": locale,
-                "timezone_id": "Asia/Shanghai"
-            }
+class BrowserPool:
+    """
+    常驻的浏览器池
+
+    维持 size 个已启动的浏览器，每个浏览器预先创建 contexts_per_browser 个加载了
+    browser-state.json 的上下文，搜索时借出上下文、用完归还。浏览器累计打开的页面数
+    超过 max_pages_per_browser 或页面JS堆超过 max_memory_mb 后，等其上下文全部归还再关闭并替换。
+    替换失败时池容量减一，并在空闲队列中放回占位项，之后的 acquire 取到占位项时重新启动浏览器，
+    仍失败则把错误抛给调用方，不会一直等待。
+
+    Args:
+        size: 浏览器数量
+        contexts_per_browser: 每个浏览器的上下文数量
+        max_pages_per_browser: 单个浏览器回收前最多打开的页面数
+        max_memory_mb: 页面JS堆上限（MB），超过后回收该浏览器
+        state_file: 浏览器状态文件
+        locale: 上下文语言
+        headless: 是否无头模式
+    """
 
-            if storage_state and os.path.exists(storage_state):
-                context_options["storage_state"] = storage_state
+    def __init__(self, size:int=2, contexts_per_browser:int=2, max_pages_per_browser:int=50,
+                 max_memory_mb:int=512, state_file:str="./browser-state.json",
+                 locale:str="zh-CN", headless:bool=True):
+        self.size=size
+        self.contexts_per_browser=contexts_per_browser
+        self.max_pages_per_browser=max_pages_per_browser
+        self.max_memory_bytes=max_memory_mb*1024*1024
+        self.state_file=state_file
+        self.locale=locale
+        self.headless=headless
+        self._playwright=None
+        self._idle:Optional[asyncio.Queue]=None
+        self._browsers:List[_PooledBrowser]=[]
+        self._start_lock=asyncio.Lock()
+        self._closed=False
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self):
+        async with self._start_lock:
+            if self.started:
+                return
+            self._playwright=await async_playwright().start()
+            self._idle=asyncio.Queue()
+            for _ in range(self.size):
+                await self._launch()
+            logger.info(f"浏览器池已启动：{self.size} 个浏览器，每个 {self.contexts_per_browser} 个上下文")
+
+    async def _launch(self):
+        """启动一个浏览器及其全部上下文；任一步失败时关闭该浏览器，不放入池中"""
+        browser=await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        contexts=[]
+        try:
+            storage_state, saved_state=load_saved_state(self.state_file)
+            for _ in range(self.contexts_per_browser):
+                contexts.append(await new_search_context(browser, saved_state, self.locale, storage_state))
+        except BaseException:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+            raise
+        pooled=_PooledBrowser(browser)
+        pooled.open_contexts=len(contexts)
+        self._browsers.append(pooled)
+        for context in contexts:
+            self._idle.put_nowait((pooled, context))
+
+    async def _retire_context(self, pooled:_PooledBrowser, context:BrowserContext):
+        try:
+            await context.close()
+        except Exception:
+            pass
+        pooled.open_contexts-=1
+        if pooled.open_contexts>0:
+            return
+        # 该浏览器的上下文已全部归还，关闭并补充新浏览器
+        if pooled in self._browsers:
+            self._browsers.remove(pooled)
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+        logger.info(f"回收浏览器（页面数 {pooled.pages_served}，JS堆峰值 {pooled.peak_memory/1024/1024:.0f}MB）")
+        if not self._closed:
+            try:
+                await self._launch()
+            except Exception as e:
+                logger.error(f"补充浏览器失败: {e}")
+                self.size-=1
+                self._idle.put_nowait((None, None))
+                raise
+
+    async def acquire(self) -> ContextLease:
+        await self.start()
+        while True:
+            pooled, context=await self._idle.get()
+            if pooled is None:
+                # 之前补充浏览器失败留下的占位项：重新启动，仍失败则放回占位项并抛出
+                try:
+                    await self._launch()
+                except Exception:
+                    self._idle.put_nowait((None, None))
+                    raise
+                self.size+=1
+                continue
+            if pooled.retiring or not pooled.browser.is_connected():
+                await self._retire_context(pooled, context)
+                continue
+            return ContextLease(pooled, context)
+
+    async def release(self, lease:ContextLease):
+        pooled=lease.pooled
+        pooled.pages_served+=lease.pages
+        pooled.peak_memory=max(pooled.peak_memory, lease.memory)
+        if pooled.pages_served>=self.max_pages_per_browser or lease.memory>=self.max_memory_bytes:
+            pooled.retiring=True
+        if self._closed or pooled.retiring or not pooled.browser.is_connected():
+            try:
+                await self._retire_context(pooled, lease.context)
+            except Exception:
+                # 搜索本身已完成；补充失败已记录，由之后的 acquire 重试或报错
+                pass
+        else:
+            self._idle.put_nowait((pooled, lease.context))
 
-            context = await browser.new_context(**context_options)
+    @asynccontextmanager
+    async def lease(self):
+        """借用一个上下文：async with pool.lease() as lease: page = await lease.new_page()"""
+        context_lease=await self.acquire()
+        try:
+            yield context_lease
+        finally:
+            await self.release(context_lease)
 
-            #反检测
-            await context.add_init_script("""
-                       Object.defineProperty(navigator, 'webdriver', {get: () => false});
-                       Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
-                       Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en', 'zh-CN']});
-                       window.chrome = {runtime: {}, loadTimes: function(){}, csi: function(){}, app: {}};
-                   """)
+    async def close(self):
+        self._closed=True
+        for pooled in list(self._browsers):
+            try:
+                await pooled.browser.close()
+            except Exception:
+                pass
+        self._browsers=[]
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright=None
+
+
+#每个事件循环各自的默认浏览器池
+_default_pools:Dict[tuple, BrowserPool]={}
+
+def get_browser_pool(state_file:str="./browser-state.json", locale:str="zh-CN") -> BrowserPool:
+    """获取当前事件循环下，与状态文件和语言对应的默认浏览器池"""
+    loop=asyncio.get_running_loop()
+    for key in [k for k in _default_pools if k[0].is_closed()]:
+        _default_pools.pop(key)
+    key=(loop, state_file, locale)
+    if key not in _default_pools:
+        _default_pools[key]=BrowserPool(state_file=state_file, locale=locale)
+    return _default_pools[key]
+
+async def close_browser_pools():
+    """关闭当前事件循环下的全部默认浏览器池"""
+    loop=asyncio.get_running_loop()
+    for key in [k for k in _default_pools if k[0] is loop]:
+        await _default_pools.pop(key).close()
+
+async def search(query:str,options:Optional[SearchOptions]=None,existing_browser:Optional[Browser]=None,pool:Optional[BrowserPool]=None) -> SearchResponse:
+    """
+       执行浏览器搜索并返回结构化结果
 
-            page = await context.new_page()
+       Args:
+           query: 搜索查询字符串
+           options: 搜索选项
+           existing_browser: 可选的现有浏览器实例
+           pool: 可选的浏览器池，未提供时使用默认池（options.use_pool为False时不使用）
 
-            # 选择 Google 域名
-            if saved_state.google_domain:
-                selected_domain = saved_state.google_domain
-            else:
-                import random
-                selected_domain = random.choice(google_domains)
-                saved_state.google_domain = selected_domain
+       Returns:
+           搜索响应对象
+       """
+    if options is None:
+        options = SearchOptions()
 
-            logger.info(f"访问 Google 搜索页面: {selected_domain}")
+    #指定了多个引擎时改为竞速搜索，不会进入有头模式等待人工验证
+    if options.engines:
+        from search_engines import race_search
+        return await race_search(query, options, pool=pool)
 
-            # 访问 Google
-            await page.goto(selected_domain, timeout=timeout)
+    #default
+    limit=options.limit or 10
+    timeout=options.timeout or 60000
+    state_file=options.state_file or "./browser-state.json"
+    no_save_state=options.no_save_state or False
+    locale=options.locale or "zh_CN"
+    use_pool=options.use_pool if options.use_pool is not None else True
+    fast_mode=options.fast_mode or False
+    direct=options.direct if options.direct is not None else True
+
+    #命中缓存时不启动浏览器
+    cache=SearchCache(options.cache_dir or "./cache/search") if options.use_cache else None
+    if cache is not None:
+        cached_response=cache.get(query, locale, limit)
+        if cached_response is not None:
+            logger.info(f"命中搜索缓存 {query}（{len(cached_response.results)} 条结果）")
+            return cached_response
 
-            # 检查是否遇到人机验证
-            current_url = page.url
-            sorry_patterns = ["google.com/sorry",
-                              "recaptcha", "captcha", "unusual traffic"]
-            is_blocked = any(
-                pattern in current_url for pattern in sorry_patterns)
+    logger.info(f"正在初始化浏览器搜索 {query}")
 
-            if is_blocked and headless:
-                logger.warning("检测到人机验证，切换到有头模式")
+    #检查状态文件
+    storage_state, saved_state = load_saved_state(state_file)
+
+    async def perform_search(headless: bool=True):
+        try:
+            if existing_browser is not None:
+                return await _perform_search_with_browser(existing_browser, True, headless)
+            if headless and use_pool:
+                browser_pool = pool or get_browser_pool(state_file, locale)
+                return await _perform_search_with_pool(browser_pool)
+
+            #启动新的浏览器
+            async with async_playwright() as p:
+                browser=await p.chromium.launch(headless=headless, args=LAUNCH_ARGS)
+                return await _perform_search_with_browser(browser, False, headless)
+        except SearchBlockedError:
+            logger.warning("检测到人机验证，切换到有头模式")
+            return await perform_search(headless=False)
+
+    async def _perform_search_with_pool(browser_pool: BrowserPool):
+        """从浏览器池借用上下文搜索"""
+        async with browser_pool.lease() as lease:
+            page = await lease.new_page()
+            try:
+                return await _search_on_page(lease.context, page, headless=True)
+            finally:
+                await lease.close_page(page)
+
+    async def _perform_search_with_browser(browser: Browser,browser_was_provided: bool,headless: bool=True):
+        """使用给定的浏览器搜索"""
+        context = await new_search_context(browser, saved_state, locale, storage_state)
+        try:
+            page = await context.new_page()
+            return await _search_on_page(context, page, headless)
+        finally:
+            # 清理资源
+            try:
                 await context.close()
                 if not browser_was_provided:
                     await browser.close()
-                return await perform_search(headless=False)
-            elif is_blocked:
-                logger.warning("检测到人机验证，请手动完成")
-                await page.wait_for_load_state(state="networkidle", timeout=timeout * 2)
-
-            # 查找搜索框
-            search_selectors = [
-                "textarea[name='q']",
-                "input[name='q']",
-                "textarea[title='Search']",
-                "input[title='Search']"
-            ]
+            except:
+                pass
 
-            search_input = None
-            for selector in search_selectors:
-                try:
-                    search_input = await page.wait_for_selector(selector, timeout=5000)
-                    if search_input:
-                        logger.info(f"找到搜索框: {selector}")
-                        break
-                except:
-                    continue
-
-            if not search_input:
-                raise Exception("无法找到搜索框")
-
-            # 输入搜索查询
-            await search_input.click()
-            await page.keyboard.type(query, delay=50)
-            await page.keyboard.press("Enter")
-
-            # 等待搜索结果
-            await page.wait_for_load_state("networkidle", timeout=timeout)
-
-            # 等待搜索结果元素
-            result_selectors = ["#search", "#rso",
-                                ".g", "[data-sokoban-container]"]
-            results_found = False
-
-            for selector in result_selectors:
+    async def _open_results_directly(page: Page, selected_domain: str) -> bool:
+        """直接打开结果页并等待结果容器，遇到人机验证时抛出 SearchBlockedError，未找到容器时返回False"""
+        results_url = build_results_url(selected_domain, query, limit, locale)
+        logger.info(f"直接访问搜索结果页: {results_url}")
+        await page.goto(results_url, wait_until="domcontentloaded", timeout=timeout)
+        if is_blocked_url(page.url):
+            raise SearchBlockedError(page.url)
+        try:
+            await page.wait_for_selector(RESULTS_CONTAINER_SELECTOR, timeout=timeout)
+            return True
+        except Exception:
+            if is_blocked_url(page.url):
+                raise SearchBlockedError(page.url)
+            logger.warning("结果页未出现结果容器，回退到首页输入方式")
+            return False
+
+    async def _open_results_interactively(page: Page, selected_domain: str, headless: bool=True):
+        """打开 Google 首页，在搜索框输入查询并等待结果"""
+        logger.info(f"访问 Google 搜索页面: {selected_domain}")
+
+        # 访问 Google
+        await page.goto(selected_domain, timeout=timeout)
+
+        # 检查是否遇到人机验证
+        current_url = page.url
+        is_blocked = is_blocked_url(current_url)
+
+        if is_blocked and headless:
+            raise SearchBlockedError(current_url)
+        elif is_blocked:
+            logger.warning("检测到人机验证，请手动完成")
+            await page.wait_for_load_state(state="networkidle", timeout=timeout * 2)
+
+        # 查找搜索框
+        search_selectors = [
+            "textarea[name='q']",
+            "input[name='q']",
+            "textarea[title='Search']",
+            "input[title='Search']"
+        ]
+
+        search_input = None
+        for selector in search_selectors:
+            try:
+                search_input = await page.wait_for_selector(selector, timeout=5000)
+                if search_input:
+                    logger.info(f"找到搜索框: {selector}")
+                    break
+            except:
+                continue
+
+        if not search_input:
+            raise Exception("无法找到搜索框")
+
+        # 输入搜索查询
+        await search_input.click()
+        await page.keyboard.type(query, delay=50)
+        await page.keyboard.press("Enter")
+
+        # 等待搜索结果
+        await page.wait_for_load_state("networkidle", timeout=timeout)
+
+        # 等待搜索结果元素
+        result_selectors = ["#search", "#rso",
+                            ".g", "[data-sokoban-container]"]
+        results_found = False
+
+        for selector in result_selectors:
+            try:
+                await page.wait_for_selector(selector, timeout=10000)
+                results_found = True
+                logger.info(f"找到搜索结果: {selector}")
+                break
+            except:
+                continue
+
+        if not results_found:
+            logger.warning("未找到搜索结果元素")
+
+    async def _fetch_more_pages(context: BrowserContext, selected_domain: str, first_results: list) -> list:
+        """
+        在同一上下文中并发打开后续结果页，按链接去重合并，凑够 limit 条后取消其余页面
+
+        以第一页的实际条数作为每页条数计算所需页数。
+        """
+        per_page = len(first_results)
+        extra_pages = min(math.ceil((limit - per_page) / per_page), MAX_RESULT_PAGES - 1)
+        seen_links = {r['link'] for r in first_results}
+        page_results = {}
+        semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+        async def _fetch_page(page_no: int):
+            async with semaphore:
+                extra_page = await context.new_page()
                 try:
-                    await page.wait_for_selector(selector, timeout=10000)
-                    results_found = True
-                    logger.info(f"找到搜索结果: {selector}")
+                    if fast_mode:
+                        await install_resource_blocker(extra_page)
+                    url = build_results_url(selected_domain, query, per_page, locale, start=page_no * per_page)
+                    await extra_page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+                    if is_blocked_url(extra_page.url):
+                        logger.warning(f"第 {page_no + 1} 页遇到人机验证，跳过")
+                        return page_no, []
+                    await extra_page.wait_for_selector(RESULTS_CONTAINER_SELECTOR, timeout=timeout)
+                    return page_no, await extra_page.evaluate(EXTRACT_RESULTS_JS, 100)
+                except Exception as e:
+                    logger.warning(f"获取第 {page_no + 1} 页结果失败: {e}")
+                    return page_no, []
+                finally:
+                    try:
+                        await extra_page.close()
+                    except Exception:
+                        pass
+
+        tasks = [asyncio.ensure_future(_fetch_page(n)) for n in range(1, extra_pages + 1)]
+        unique_links = set(seen_links)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                page_no, page_items = await next_done
+                page_results[page_no] = page_items
+                unique_links.update(r['link'] for r in page_items)
+                if len(unique_links) >= limit:
                     break
-                except:
-                    continue
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        # 按页码顺序合并，保持结果排名
+        merged = list(first_results)
+        for page_no in sorted(page_results):
+            for r in page_results[page_no]:
+                if r['link'] not in seen_links:
+                    seen_links.add(r['link'])
+                    merged.append(r)
+        logger.info(f"翻页抓取 {len(page_results)} 页，合并后 {len(merged)} 条结果")
+        return merged[:limit]
+
+    async def _search_on_page(context: BrowserContext, page: Page, headless: bool=True):
+        """在给定页面上完成一次搜索，无头模式遇到人机验证时抛出 SearchBlockedError"""
+        try:
+            block_stats = await install_resource_blocker(page) if fast_mode else None
 
-            if not results_found:
-                logger.warning("未找到搜索结果元素")
+            # 选择 Google 域名
+            if saved_state.google_domain:
+                selected_domain = saved_state.google_domain
+            else:
+                selected_domain = random.choice(GOOGLE_DOMAINS)
+                saved_state.google_domain = selected_domain
+
+            opened = False
+            if direct and headless:
+                opened = await _open_results_directly(page, selected_domain)
+            if not opened:
+                await _open_results_interactively(page, selected_domain, headless)
 
             # 提取搜索结果
-            results = await page.evaluate(f"""
-               () => {{
-                   const results = [];
-                   const maxResults = {limit};
-                   const seenUrls = new Set();
-
-                   // 定义选择器组合
-                   const selectorSets = [
-                       {{ container: '#search div[data-hveid]', title: 'h3', snippet: '.VwiC3b' }},
-                       {{ container: '#rso div[data-hveid]', title: 'h3', snippet: '[data-sncf="1"]' }},
-                       {{ container: '.g', title: 'h3', snippet: 'div[style*="webkit-line-clamp"]' }},
-                       {{ container: 'div[jscontroller][data-hveid]', title: 'h3', snippet: 'div[role="text"]' }}
-                   ];
-
-                   // 备用摘要选择器
-                   const alternativeSnippetSelectors = [
-                       '.VwiC3b', '[data-sncf="1"]', 'div[style*="webkit-line-clamp"]', 'div[role="text"]'
-                   ];
-
-                   // 尝试每组选择器
-                   for (const selectors of selectorSets) {{
-                       if (results.length >= maxResults) break;
-
-                       const containers = document.querySelectorAll(selectors.container);
-
-                       for (const container of containers) {{
-                           if (results.length >= maxResults) break;
-
-                           const titleElement = container.querySelector(selectors.title);
-                           if (!titleElement) continue;
-
-                           const title = (titleElement.textContent || "").trim();
-
-                           // 查找链接
-                           let link = '';
-                           const linkInTitle = titleElement.querySelector('a');
-                           if (linkInTitle) {{
-                               link = linkInTitle.href;
-                           }} else {{
-                               let current = titleElement;
-                               while (current && current.tagName !== 'A') {{
-                                   current = current.parentElement;
-                               }}
-                               if (current && current instanceof HTMLAnchorElement) {{
-                                   link = current.href;
-                               }} else {{
-                                   const containerLink = container.querySelector('a');
-                                   if (containerLink) {{
-                                       link = containerLink.href;
-                                   }}
-                               }}
-                           }}
-
-                           // 过滤无效链接
-                           if (!link || !link.startsWith('http') || seenUrls.has(link)) continue;
-
-                           // 查找摘要
-                           let snippet = '';
-                           const snippetElement = container.querySelector(selectors.snippet);
-                           if (snippetElement) {{
-                               snippet = (snippetElement.textContent || "").trim();
-                           }} else {{
-                               for (const altSelector of alternativeSnippetSelectors) {{
-                                   const element = container.querySelector(altSelector);
-                                   if (element) {{
-                                       snippet = (element.textContent || "").trim();
-                                       break;
-                                   }}
-                               }}
-
-                               if (!snippet) {{
-                                   const textNodes = Array.from(container.querySelectorAll('div')).filter(el =>
-                                       !el.querySelector('h3') && (el.textContent || "").trim().length > 20
-                                   );
-                                   if (textNodes.length > 0) {{
-                                       snippet = (textNodes[0].textContent || "").trim();
-                                   }}
-                               }}
-                           }}
-
-                           if (title && link) {{
-                               results.push({{ title, link, snippet }});
-                               seenUrls.add(link);
-                           }}
-                       }}
-                   }}
-
-                   return results.slice(0, maxResults);
-               }}
-           """)
+            results = await page.evaluate(EXTRACT_RESULTS_JS, limit)
+
+            # 第一页不够时并发抓取后续结果页
+            if headless and results and len(results) < limit:
+                results = await _fetch_more_pages(context, selected_domain, results)
 
             logger.info(f"成功获取到 {len(results)} 条搜索结果")
+            if block_stats is not None:
+                logger.info(f"快速模式：{block_stats.summary()}")
 
             # 保存浏览器状态
             if not no_save_state:
-                try:
-                    os.makedirs(os.path.dirname(state_file), exist_ok=True)
-                    await context.storage_state(path=state_file)
-
-                    # 保存指纹配置
-                    if not saved_state.fingerprint:
-                        saved_state.fingerprint = get_host_machine_config(
-                            locale)
-
-                    fingerprint_data = {
-                        'fingerprint': {
-                            'device_name': saved_state.fingerprint.device_name,
-                            'locale': saved_state.fingerprint.locale,
-                            'timezone_id': saved_state.fingerprint.timezone_id,
-                            'color_scheme': saved_state.fingerprint.color_scheme,
-                            'reduced_motion': saved_state.fingerprint.reduced_motion,
-                            'forced_colors': saved_state.fingerprint.forced_colors
-                        },
-                        'google_domain': saved_state.google_domain
-                    }
-
-                    with open(fingerprint_file, 'w', encoding='utf-8') as f:
-                        json.dump(fingerprint_data, f,
-                                  ensure_ascii=False, indent=2)
-
-                    logger.info("浏览器状态保存成功")
-                except Exception as e:
-                    logger.error(f"保存浏览器状态时出错: {e}")
-
-            await context.close()
-            if not browser_was_provided:
-                await browser.close()
+                await _save_state(context)
 
             # 转换结果格式
             search_results = [
@@ -421,40 +933,143 @@ async def search(query:str,options:Optional[SearchOptions]=None,existing_browser
 
             return SearchResponse(query=query, results=search_results)
 
+        except SearchBlockedError:
+            raise
         except Exception as e:
             logger.error(f"搜索过程中发生错误: {e}")
 
             # 尝试保存状态即使出错
             try:
                 if not no_save_state:
-                    await context.storage_state(path=state_file)
-            except:
-                pass
-
-            # 清理资源
-            try:
-                await context.close()
-                if not browser_was_provided:
-                    await browser.close()
+                    await save_storage_state(context, state_file)
             except:
                 pass
 
             # 返回错误结果
-            return SearchResponse(
-                query=query,
-                results=[SearchResult(
-                    title="搜索失败",
-                    link="",
-                    snippet=f"无法完成搜索，错误信息: {str(e)}"
-                )]
-            )
+            return failed_response(query, e)
+
+    async def _save_state(context: BrowserContext):
+        try:
+            # 保存指纹配置
+            if not saved_state.fingerprint:
+                saved_state.fingerprint = get_host_machine_config(
+                    locale)
+
+            fingerprint_data = {
+                'fingerprint': {
+                    'device_name': saved_state.fingerprint.device_name,
+                    'locale': saved_state.fingerprint.locale,
+                    'timezone_id': saved_state.fingerprint.timezone_id,
+                    'color_scheme': saved_state.fingerprint.color_scheme,
+                    'reduced_motion': saved_state.fingerprint.reduced_motion,
+                    'forced_colors': saved_state.fingerprint.forced_colors
+                },
+                'google_domain': saved_state.google_domain
+            }
+
+            await save_storage_state(context, state_file, fingerprint_data)
+
+            logger.info("浏览器状态保存成功")
+        except Exception as e:
+            logger.error(f"保存浏览器状态时出错: {e}")
 
     # 首先尝试无头模式
-    return await perform_search(headless=True)
+    response = await perform_search(headless=True)
+
+    # 只缓存成功的结果
+    if cache is not None and any(r.link for r in response.results):
+        try:
+            cache.put(response, locale, limit, options.cache_ttl)
+        except Exception as e:
+            logger.warning(f"写入搜索缓存失败: {e}")
+    return response
+
+
+async def search_many(queries:Iterable[str],options:Optional[SearchOptions]=None,concurrency:int=4,pool:Optional[BrowserPool]=None) -> AsyncIterator[SearchResponse]:
+    """
+    并发执行多个搜索，按完成顺序逐个返回结果
+
+    未提供浏览器池时，在一个浏览器内为每个并发槽位各建一个上下文；
+    单个查询出错只影响该查询，返回"搜索失败"结果。
+
+    Args:
+        queries: 搜索查询列表
+        options: 搜索选项，所有查询共用
+        concurrency: 同时进行的搜索数
+        pool: 可选的浏览器池
+
+    Returns:
+        异步生成器，产出 SearchResponse
+    """
+    queries=list(queries)
+    if not queries:
+        return
+    if options is None:
+        options = SearchOptions()
+
+    own_pool=None
+    if pool is None and (options.use_pool if options.use_pool is not None else True):
+        own_pool=BrowserPool(size=1, contexts_per_browser=concurrency,
+                             state_file=options.state_file or "./browser-state.json",
+                             locale=options.locale or "zh-CN")
+        pool=own_pool
+
+    semaphore=asyncio.Semaphore(concurrency)
+
+    async def _run(query:str) -> SearchResponse:
+        async with semaphore:
+            try:
+                return await search(query, options, pool=pool)
+            except Exception as e:
+                logger.error(f"查询 {query} 失败: {e}")
+                return failed_response(query, e)
+
+    tasks=[asyncio.ensure_future(_run(q)) for q in queries]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if own_pool is not None:
+            await own_pool.close()
+
+
+def _background_loop() -> BackgroundLoop:
+    """同步接口共用的后台事件循环，退出时关闭其中的浏览器池"""
+    loop = get_background_loop()
+    loop.add_shutdown_hook(close_browser_pools)
+    return loop
+
+
+def search_many_sync(queries:Iterable[str],options:Optional[SearchOptions]=None,concurrency:int=4) -> List[SearchResponse]:
+    """
+    同步版本的批量搜索，按完成顺序返回全部结果
+
+    在常驻的后台事件循环中执行，共用默认浏览器池。
+    """
+    if options is None:
+        options = SearchOptions()
+
+    async def _collect():
+        pool = None
+        if options.use_pool is None or options.use_pool:
+            pool = get_browser_pool(options.state_file or "./browser-state.json", options.locale or "zh-CN")
+        return [response async for response in search_many(queries, options, concurrency, pool=pool)]
+
+    return _background_loop().run(_collect())
 
 
 def google_search_sync(query: str,options: Optional[SearchOptions] = None) -> SearchResponse:
     """
     同步版本的 Google 搜索函数
+
+    协程提交到常驻的后台事件循环执行，浏览器池跨调用复用；可被多个线程同时调用。
     """
-    return asyncio.run(search(query, options))
\ No newline at end of file
+    return _background_loop().run(search(query, options))
+
+
+def shutdown_search():
+    """关闭浏览器池并停止后台事件循环（进程退出时也会自动执行）"""
+    shutdown_background_loop()
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 工具模块之间以平铺方式互相导入（from rate_limiter import ...），scripts.logging_config 需要仓库根目录
+for path in (ROOT, os.path.join(ROOT, "scripts", "tools")):
+    if path in sys.path:
+        sys.path.remove(path)
+    sys.path.insert(0, path)
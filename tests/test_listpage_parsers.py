@@ -0,0 +1,68 @@
+import os
+import glob
+
+import pytest
+
+from get_em_listpage_url import parse_mapping, parse_mapping_bs4
+
+LISTPAGE_FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "listpages")
+FIXTURES = sorted(glob.glob(os.path.join(LISTPAGE_FIXTURE_DIR, "*.html")))
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join(LISTPAGE_FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def test_fixtures_present():
+    assert FIXTURES
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+def test_lxml_parser_matches_bs4(path):
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+    assert parse_mapping(html) == parse_mapping_bs4(html)
+
+
+def test_only_breakfast_items_in_list():
+    # 非财经早餐的条目和列表外的 div.text 都不收录
+    assert parse_mapping(read_fixture("normal.html")) == {
+        "2024年05月17日": "https://finance.eastmoney.com/a/202405172080374501.html",
+        "2024年05月16日": "https://finance.eastmoney.com/a/202405162079261032.html",
+        "2024年05月15日": "http://finance.eastmoney.com/a/202405152078133210.html",
+    }
+
+
+def test_relative_href():
+    mapping = parse_mapping(read_fixture("relative_href.html"))
+    assert mapping["2024年03月08日"] == "https://finance.eastmoney.com/a/202403082006591234.html"
+    assert mapping["2024年03月07日"] == "https://finance.eastmoney.com/a/202403072005470987.html"
+    assert mapping["2024年03月06日"] == "https://finance.eastmoney.com/a/202403062004350123.html"
+
+
+def test_missing_time():
+    # 没有 p.time、时间中没有日期或链接缺少 href 的条目被跳过；li 下没有 div.text 时直接用 li
+    assert parse_mapping(read_fixture("missing_time.html")) == {
+        "2024年02月08日": "https://finance.eastmoney.com/a/202402081985003333.html",
+    }
+
+
+def test_duplicate_dates_keep_first():
+    mapping = parse_mapping(read_fixture("duplicate_dates.html"))
+    assert mapping == {
+        "2023年12月29日": "https://finance.eastmoney.com/a/202312292947000001.html",
+        "2023年12月28日": "https://finance.eastmoney.com/a/202312282946000003.html",
+    }
+
+
+def test_page_without_news_list():
+    # 没有 ul#newsListContent 时退回全部 div.text
+    assert parse_mapping(read_fixture("no_list.html")) == {
+        "2023年06月15日": "https://finance.eastmoney.com/a/202306152745000001.html",
+        "2023年06月14日": "https://finance.eastmoney.com/a/202306142744000003.html",
+    }
+
+
+def test_empty_page():
+    assert parse_mapping("") == parse_mapping_bs4("") == {}